@@ -0,0 +1,250 @@
+"""
+Benchmarks reproducibles de las rutas críticas del servicio con extractos sintéticos.
+
+Mide, sin red y sin PDFs reales:
+- extraccion_pagina: Extracción de una página de movimientos con `MotorExtraccion`.
+- process_pdf: Extracción completa de un extracto de varios tamaños.
+- agregacion: Estadísticas de los movimientos de todas las páginas (`agregar_movimientos`).
+- fill_excel: Llenado en memoria de la plantilla SIVICOF para lotes de varios tamaños.
+- upload: Petición completa a `POST /upload/` para lotes de varios tamaños.
+
+Los resultados se escriben en JSON para compararlos entre versiones. Mientras
+corren los benchmarks, la salida de `process_pdf` y del servidor se envía a
+stderr, de modo que stdout solo contiene el JSON.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.run_benchmarks --salida bench.json
+    python -m benchmarks.run_benchmarks --rapido
+
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.synthetic_statements import generar_extracto
+
+
+def _medir(funcion, repeticiones):
+    """
+    Ejecuta `funcion` varias veces y retorna las estadísticas de duración.
+
+    Args:
+        funcion: Función sin argumentos a medir.
+        repeticiones (int): Número de ejecuciones.
+
+    Returns:
+        dict: Mediana, mínimo y máximo en segundos.
+    """
+    duraciones = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - inicio)
+    return {
+        "mediana_s": statistics.median(duraciones),
+        "min_s": min(duraciones),
+        "max_s": max(duraciones),
+        "repeticiones": repeticiones,
+    }
+
+
+def _escribir_extracto(directorio, paginas, semilla):
+    ruta = os.path.join(directorio, f"extracto-{paginas}p-{semilla}.pdf")
+    with open(ruta, "wb") as archivo:
+        archivo.write(generar_extracto(paginas, semilla))
+    return ruta
+
+
+def benchmark_extraccion_pagina(directorio, paginas, repeticiones):
+    from src.util.extraction_engine import MotorExtraccion
+
+    ruta = _escribir_extracto(directorio, paginas, 0)
+
+    def extraer():
+        with MotorExtraccion(ruta) as motor:
+            for pagina in range(2, paginas + 1):
+                motor.extraer(pagina, ['0,70,600,610'], ['90,280,350,410,500'])
+                motor.liberar_pagina(pagina)
+
+    resultado = _medir(extraer, repeticiones)
+    resultado["por_pagina_s"] = resultado["mediana_s"] / max(paginas - 1, 1)
+    return [{"benchmark": "extraccion_pagina", "parametros": {"paginas": paginas}, **resultado}]
+
+
+def benchmark_process_pdf(directorio, tamanos, repeticiones):
+    from src.util.process_pdf import process_pdf
+
+    resultados = []
+    for paginas in tamanos:
+        ruta = _escribir_extracto(directorio, paginas, 0)
+        resultado = _medir(lambda: process_pdf(pdf_path=ruta), repeticiones)
+        resultado["por_pagina_s"] = resultado["mediana_s"] / paginas
+        resultados.append({"benchmark": "process_pdf", "parametros": {"paginas": paginas}, **resultado})
+    return resultados
+
+
+def benchmark_agregacion(directorio, tamanos, repeticiones):
+    from src.util.extraction_engine import MotorExtraccion
+    from src.util.process_pdf import agregar_movimientos
+
+    ruta = _escribir_extracto(directorio, 2, 0)
+    with MotorExtraccion(ruta) as motor:
+        df_pagina_1 = motor.extraer(1, ['0,70,600,430'], ['90,280,350,410,500'])[0].df
+        df_pagina = motor.extraer(2, ['0,70,600,610'], ['90,280,350,410,500'])[0].df
+
+    resultados = []
+    for paginas in tamanos:
+        tablas = [df_pagina.copy() for _ in range(paginas - 1)]
+        resultado = _medir(lambda: agregar_movimientos(df_pagina_1, iter(tablas)), repeticiones)
+        resultado["por_pagina_s"] = resultado["mediana_s"] / paginas
+        resultados.append({"benchmark": "agregacion", "parametros": {"paginas": paginas}, **resultado})
+    return resultados
+
+
+def benchmark_fill_excel(tamanos, repeticiones):
+    from src.util.fill_excel import fill_excel_en_memoria, cargar_plantilla
+
+    cargar_plantilla()
+    datos = {
+        "SALDO ANTERIOR": "$ 126,602,667.28",
+        "TOTAL ABONOS": "$ 216,800,621.05",
+        "TOTAL CARGOS": "$ 232,509,777.02",
+        "SALDO ACTUAL": "$ 110,893,511.31",
+        "Valor de movimiento maximo en el mes en pesos": "4,766,306.77",
+    }
+    resultados = []
+    for lote in tamanos:
+        results = [{"filename": f"extracto-{i}.pdf", "data": datos} for i in range(lote)]
+        resultado = _medir(lambda: fill_excel_en_memoria(results), repeticiones)
+        resultado["por_fila_s"] = resultado["mediana_s"] / lote
+        resultados.append({"benchmark": "fill_excel", "parametros": {"lote": lote}, **resultado})
+    return resultados
+
+
+def benchmark_upload(tamanos, paginas, repeticiones):
+    from fastapi.testclient import TestClient
+    import main
+
+    resultados = []
+    semilla = 1000
+    with TestClient(main.app) as cliente:
+        for lote in tamanos:
+            duraciones = []
+            for _ in range(repeticiones):
+                # Semillas nuevas en cada repetición para no medir aciertos de la caché
+                archivos = []
+                for i in range(lote):
+                    semilla += 1
+                    archivos.append(("files", (f"extracto-{i}.pdf", generar_extracto(paginas, semilla),
+                                               "application/pdf")))
+                inicio = time.perf_counter()
+                respuesta = cliente.post("/upload/", files=archivos)
+                duraciones.append(time.perf_counter() - inicio)
+                respuesta.raise_for_status()
+            resultados.append({
+                "benchmark": "upload",
+                "parametros": {"lote": lote, "paginas": paginas},
+                "mediana_s": statistics.median(duraciones),
+                "min_s": min(duraciones),
+                "max_s": max(duraciones),
+                "repeticiones": repeticiones,
+                "archivos_por_s": lote / statistics.median(duraciones),
+            })
+    return resultados
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def ejecutar(rapido=False, repeticiones=3):
+    """
+    Ejecuta todos los benchmarks.
+
+    Args:
+        rapido (bool): Si es True, usa tamaños pequeños (útil en CI).
+        repeticiones (int): Ejecuciones de cada medición.
+
+    Returns:
+        dict: Metadatos del entorno y lista de resultados.
+    """
+    if rapido:
+        paginas_extraccion, tamanos_pdf, tamanos_agregacion = 3, [1, 3], [10, 50]
+        lotes_excel, lotes_upload = [1, 10], [1, 3]
+    else:
+        paginas_extraccion, tamanos_pdf, tamanos_agregacion = 10, [1, 5, 20], [10, 100, 300]
+        lotes_excel, lotes_upload = [1, 10, 100], [1, 5, 10]
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="bench-") as directorio:
+        resultados += benchmark_extraccion_pagina(directorio, paginas_extraccion, repeticiones)
+        resultados += benchmark_process_pdf(directorio, tamanos_pdf, repeticiones)
+        resultados += benchmark_agregacion(directorio, tamanos_agregacion, repeticiones)
+        resultados += benchmark_fill_excel(lotes_excel, repeticiones)
+        resultados += benchmark_upload(lotes_upload, 2, repeticiones)
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "resultados": resultados,
+    }
+
+
+@contextlib.contextmanager
+def _stdout_a_stderr():
+    """
+    Envía a stderr todo lo que se escriba en stdout dentro del bloque.
+
+    Se redirige el descriptor 1 y no solo `sys.stdout`, para que también
+    queden por fuera del reporte los mensajes de los workers del pool.
+    """
+    sys.stdout.flush()
+    original = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(original, 1)
+        os.close(original)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de extracción, agregación, Excel y /upload/.")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados (por defecto, stdout).")
+    parser.add_argument("--rapido", action="store_true", help="Usar tamaños pequeños.")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    # La caché en disco y el almacén de extractos se aíslan para que las mediciones no dependan
+    # de ejecuciones anteriores ni dejen extractos sintéticos en los datos reales
+    os.environ.setdefault("CACHE_DIRECTORIO", tempfile.mkdtemp(prefix="bench-cache-"))
+    os.environ.setdefault("EXTRACTOS_DB", os.path.join(tempfile.mkdtemp(prefix="bench-extractos-"),
+                                                       "extractos.sqlite3"))
+
+    with _stdout_a_stderr():
+        reporte = ejecutar(rapido=args.rapido, repeticiones=args.repeticiones)
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto)
+        print(f"Resultados guardados en '{args.salida}'.", file=sys.stderr)
+    else:
+        print(texto)
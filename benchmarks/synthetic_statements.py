@@ -0,0 +1,143 @@
+"""
+Generador de extractos sintéticos con el formato de Bancolombia que espera `process_pdf`.
+
+Los extractos reales de los clientes no se pueden guardar en el repositorio, así
+que los benchmarks usan PDFs generados aquí: una página 1 con el encabezado, la
+tabla de resumen (área '0,500,600,450') y los primeros movimientos (área
+'0,70,600,430'), y N-1 páginas adicionales de movimientos (área '0,70,600,610').
+Las columnas de texto caen en los mismos intervalos que las columnas
+configuradas en `process_pdf`.
+
+El PDF se escribe a mano (texto con la fuente Helvetica estándar), sin
+dependencias adicionales. Con la misma semilla se obtiene el mismo PDF.
+
+Uso:
+    python -m benchmarks.synthetic_statements extracto.pdf --paginas 10 --semilla 1
+
+"""
+
+import argparse
+import random
+
+ALTO_PAGINA = 792
+ANCHO_PAGINA = 612
+ALTO_FILA = 12
+
+# Posición x del texto de cada columna de movimientos (límites: 90, 280, 350, 410, 500)
+X_FECHA, X_DESCRIPCION, X_SUCURSAL, X_DCTO, X_VALOR, X_SALDO = 20, 100, 290, 360, 420, 510
+
+DESCRIPCIONES = [
+    "PAGO PROVEEDOR", "TRANSFERENCIA RECIBIDA", "ABONO INTERESES AHORROS",
+    "PAGO NOMINA", "IMPTO GOBIERNO 4X1000", "CONSIGNACION CORRESPONSAL",
+    "PAGO PSE", "COMISION MANEJO", "TRASLADO ENTRE CUENTAS",
+]
+
+
+def _texto(x, y, texto, tamano=8):
+    """Retorna el operador PDF que dibuja `texto` en (x, y)."""
+    texto = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"BT /F1 {tamano} Tf {x:.1f} {y:.1f} Td ({texto}) Tj ET\n"
+
+
+def _formato(valor):
+    return f"{valor:,.2f}"
+
+
+def _pdf(contenidos):
+    """
+    Arma un PDF mínimo con una página por cada flujo de contenido.
+
+    Args:
+        contenidos (list): Lista de strings con los operadores de cada página.
+
+    Returns:
+        bytes: El archivo PDF.
+    """
+    objetos = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    paginas = []
+    for contenido in contenidos:
+        datos = contenido.encode("latin-1")
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(datos) + datos + b"\nendstream")
+        objetos.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                        "/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                        % (ANCHO_PAGINA, ALTO_PAGINA, len(objetos))).encode())
+        paginas.append(len(objetos))
+    objetos[1] = ("<< /Type /Pages /Kids [%s] /Count %d >>"
+                  % (" ".join(f"{p} 0 R" for p in paginas), len(paginas))).encode()
+
+    salida = bytearray(b"%PDF-1.4\n")
+    posiciones = []
+    for numero, objeto in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+def _movimientos(aleatorio, y_superior, y_inferior, saldo, totales):
+    """Dibuja el encabezado y las filas de movimientos entre dos coordenadas y."""
+    contenido = (_texto(X_FECHA, y_superior, "FECHA") + _texto(X_DESCRIPCION, y_superior, "DESCRIPCION")
+                 + _texto(X_SUCURSAL, y_superior, "SUCURSAL") + _texto(X_DCTO, y_superior, "DCTO.")
+                 + _texto(X_VALOR, y_superior, "VALOR") + _texto(X_SALDO, y_superior, "SALDO"))
+    y = y_superior - ALTO_FILA
+    while y > y_inferior:
+        valor = round(aleatorio.uniform(-5_000_000, 5_000_000), 2)
+        saldo += valor
+        totales["abonos" if valor >= 0 else "cargos"] += abs(valor)
+        contenido += (_texto(X_FECHA, y, f"{aleatorio.randint(1, 28)}/01")
+                      + _texto(X_DESCRIPCION, y, f"{aleatorio.choice(DESCRIPCIONES)} {aleatorio.randint(1, 999)}")
+                      + _texto(X_VALOR, y, _formato(valor))
+                      + _texto(X_SALDO, y, _formato(saldo)))
+        y -= ALTO_FILA
+    return contenido, saldo
+
+
+def generar_extracto(paginas=1, semilla=0):
+    """
+    Genera un extracto sintético.
+
+    Args:
+        paginas (int): Número de páginas del extracto (mínimo 1).
+        semilla (int): Semilla del generador aleatorio; la misma semilla da el mismo PDF.
+
+    Returns:
+        bytes: El archivo PDF.
+    """
+    aleatorio = random.Random(semilla)
+    saldo_anterior = round(aleatorio.uniform(10_000_000, 500_000_000), 2)
+    totales = {"abonos": 0.0, "cargos": 0.0}
+
+    movimientos_1, saldo = _movimientos(aleatorio, 420, 80, saldo_anterior, totales)
+    otras_paginas = []
+    for _ in range(max(paginas, 1) - 1):
+        contenido, saldo = _movimientos(aleatorio, 600, 80, saldo, totales)
+        otras_paginas.append(contenido)
+
+    pagina_1 = (_texto(20, 720, "BANCOLOMBIA", 14) + _texto(20, 700, "ESTADO DE CUENTA")
+                + _texto(300, 700, "CUENTA DE AHORROS")
+                + _texto(20, 685, f"NUMERO {aleatorio.randint(100, 999)}-{aleatorio.randint(100000, 999999)}-"
+                                  f"{aleatorio.randint(10, 99)}")
+                + _texto(300, 685, "DESDE: 2025/01/01 HASTA: 2025/01/31")
+                + _texto(20, 490, "RESUMEN"))
+    resumen = [("SALDO ANTERIOR", saldo_anterior), ("TOTAL ABONOS", totales["abonos"]),
+               ("TOTAL CARGOS", totales["cargos"]), ("SALDO ACTUAL", saldo)]
+    for indice, (etiqueta, valor) in enumerate(resumen):
+        y = 480 - 8 * indice
+        pagina_1 += _texto(20, y, etiqueta) + _texto(200, y, f"$ {_formato(valor)}")
+    return _pdf([pagina_1 + movimientos_1] + otras_paginas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un extracto sintético de Bancolombia.")
+    parser.add_argument("salida", help="Ruta del PDF a generar.")
+    parser.add_argument("--paginas", type=int, default=1)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    with open(args.salida, "wb") as archivo:
+        archivo.write(generar_extracto(args.paginas, args.semilla))
+    print(f"Extracto de {args.paginas} páginas escrito en '{args.salida}'.")
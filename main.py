@@ -1,18 +1,50 @@
-from fastapi import FastAPI, File, UploadFile, Request
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+import time
+_inicio_importacion = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, Request, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
 from typing import List
-import shutil
-import os
-from src.util.process_pdf import process_pdf
-from src.util.fill_excel import fill_excel
-from src.routes import test_routes
+import asyncio
+import json
+from src.util.executor import iniciar_pool, cerrar_pool, arrancar_workers
+from src.util.warmup import PRECARGA, precargar_en_segundo_plano, registrar_importacion
+import src.controllers.pdf_controller as pdf_controller
+from src.util.metrics import registro
+from src.util.fill_excel import cargar_plantilla
+from src.util.layouts import cargar_layouts
+from src.util.admission import control_admision, PeticionRechazada, FiltroSubidas
+from src.routes import test_routes, stats_routes, job_routes, metrics_routes, statement_routes
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los formatos se validan al arrancar: un archivo inválido impide iniciar el servicio
+    cargar_layouts()
+    iniciar_pool()
+    await job_routes.gestor_trabajos.iniciar()
+    if PRECARGA:
+        # Se ejecuta en segundo plano: el servicio queda listo sin esperar la precarga
+        app.state.precarga = asyncio.create_task(precargar_en_segundo_plano(arrancar_workers))
+    else:
+        cargar_plantilla()
+    yield
+    await job_routes.gestor_trabajos.detener()
+    cerrar_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+# Los lotes que no se van a admitir se rechazan antes de recibirlos
+app.add_middleware(FiltroSubidas, rutas={"/upload/": "detail", "/jobs/": "error"})
 
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
 app.include_router(test_routes.test_router, prefix="/test", tags=["test"])
+app.include_router(stats_routes.stats_router, prefix="/stats", tags=["stats"])
+app.include_router(job_routes.job_router, prefix="/jobs", tags=["jobs"])
+app.include_router(metrics_routes.metrics_router, tags=["metrics"])
+app.include_router(statement_routes.statement_router, prefix="/extractos", tags=["extractos"])
 
 app.title = "Asistente RENOBO para diligenciamiento SIVICOF"
 app.version = "0.0.1"
@@ -23,50 +55,142 @@ templates = Jinja2Templates(directory="templates")
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/upload/")
-async def upload_files(files: List[UploadFile] = File(...)):
-    results = []
-    temp_dir = "temp_pdf"
-    os.makedirs(temp_dir, exist_ok=True)
+async def _procesar_lote(files, tiempos, tiempos_archivos):
+    """
+    Procesa los archivos de una petición en paralelo y genera su Excel.
+
+    Args:
+        files (list): Archivos subidos.
+        tiempos (dict): Se llena con la duración de cada etapa de la petición.
+        tiempos_archivos (list): Un diccionario por archivo para la duración de sus etapas.
+
+    Yields:
+        tuple: (índice, resultado) de cada archivo en cuanto termina y, al final,
+               (None, excel_id) con el Excel generado con los resultados en el orden original.
+    """
+    async def procesar(indice):
+        # El archivo se pasa sin leer: se copia por bloques al directorio temporal privado
+        file = files[indice]
+        return indice, await pdf_controller.procesar_archivo(file.filename, file, tiempos_archivos[indice])
+
+    results = [None] * len(files)
+    tareas = [asyncio.create_task(procesar(indice)) for indice in range(len(files))]
+    try:
+        with registro.tramo("extraccion_lote", tiempos):
+            for siguiente in asyncio.as_completed(tareas):
+                indice, resultado = await siguiente
+                results[indice] = resultado
+                yield indice, resultado
+    finally:
+        # Si el cliente se desconecta a mitad del lote, no se sigue procesando para nadie
+        for tarea in tareas:
+            tarea.cancel()
+
+    # Llenar el Excel con los resultados procesados
+    with registro.tramo("excel", tiempos):
+        excel_id = await pdf_controller.generar_excel(results, tiempos=tiempos)
+    print("Excel generado en memoria con id:", excel_id)
+    yield None, excel_id
+
+
+def _desglose_tiempos(tiempos, tiempos_archivos):
+    """Desglose en milisegundos de la petición y de cada archivo."""
+    return {
+        "peticion": {etapa: round(s * 1000, 2) for etapa, s in tiempos.items()},
+        "archivos": [{etapa: round(s * 1000, 2) for etapa, s in t.items()} for t in tiempos_archivos],
+    }
+
+
+class _RespuestaLote(StreamingResponse):
+    """
+    Respuesta en streaming de un lote que siempre ejecuta `al_terminar` al acabar.
 
-    for file in files:
-        file_path = os.path.join(temp_dir, file.filename)
+    El generador del lote solo empieza cuando Starlette lo recorre: si la
+    respuesta se cancela o falla antes (el cliente se desconecta, falla el
+    envío de los encabezados), su `finally` nunca se ejecuta.
+    """
+
+    def __init__(self, contenido, al_terminar, **kwargs):
+        super().__init__(contenido, **kwargs)
+        self.al_terminar = al_terminar
+
+    async def __call__(self, scope, receive, send):
         try:
-            # Guardar archivo temporal
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            await super().__call__(scope, receive, send)
+        finally:
+            self.al_terminar()
+
+
+@app.post("/upload/")
+async def upload_files(request: Request, files: List[UploadFile] = File(...), timings: bool = False,
+                       stream: bool = False):
+    tiempos = {}
+    tiempos_archivos = [{} for _ in files]
+
+    # Se pide cupo antes de procesar los archivos; el número y el tamaño los da el multipart
+    # ya recibido (el tamaño anunciado y la cola ya se revisaron en `FiltroSubidas`)
+    tamano = sum(file.size or 0 for file in files)
+    try:
+        await control_admision.reservar(len(files), tamano, tiempos)
+    except PeticionRechazada as e:
+        headers = {"Retry-After": str(e.reintentar)} if e.reintentar else None
+        raise HTTPException(status_code=e.codigo, detail=str(e), headers=headers)
 
-            # Procesar PDF
-            data = process_pdf(pdf_path=file_path)
-            results.append({"filename": file.filename, "data": data})
+    liberado = False
 
-        except Exception as e:
-            results.append({"filename": file.filename, "error": str(e)})
-        
+    def liberar():
+        # Se llama desde varios puntos (fin del lote, fin de la respuesta); solo el primero cuenta
+        nonlocal liberado
+        if not liberado:
+            liberado = True
+            control_admision.liberar(len(files), tamano)
+
+    async def lote():
+        try:
+            with registro.tramo("upload", tiempos):
+                async for indice, valor in _procesar_lote(files, tiempos, tiempos_archivos):
+                    yield indice, valor
         finally:
-            # Eliminar archivo temporal si existe
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            liberar()
 
-    # Llenar el Excel con los resultados procesados
-    fill_excel(results)
-    output_excel = fill_excel(results)
-    print("Excel generado en:", output_excel)
+    # Modo streaming: una línea JSON por archivo en cuanto termina y una línea final con el Excel
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def lineas():
+            try:
+                async for indice, valor in lote():
+                    if indice is None:
+                        final = {"evento": "fin", "excel_id": valor}
+                        if timings:
+                            final["timings"] = _desglose_tiempos(tiempos, tiempos_archivos)
+                        yield json.dumps(final, ensure_ascii=False) + "\n"
+                    else:
+                        yield json.dumps({"evento": "archivo", "indice": indice, **valor}, ensure_ascii=False) + "\n"
+            except Exception as e:
+                # El código de estado ya se envió: el error va en la línea final
+                yield json.dumps({"evento": "fin", "excel_id": None, "error": str(e)}, ensure_ascii=False) + "\n"
 
-    # Eliminar directorio temporal solo si está vacío
-    if os.path.exists(temp_dir) and not os.listdir(temp_dir):
-        os.rmdir(temp_dir)
+        return _RespuestaLote(lineas(), al_terminar=liberar, media_type="application/x-ndjson",
+                              headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    return JSONResponse(content={"results": results})
+    results = [None] * len(files)
+    try:
+        async for indice, valor in lote():
+            if indice is None:
+                excel_id = valor
+            else:
+                results[indice] = valor
+    finally:
+        liberar()
+
+    content = {"results": results, "excel_id": excel_id}
+    if timings:
+        content["timings"] = _desglose_tiempos(tiempos, tiempos_archivos)
+    return JSONResponse(content=content)
 
 
 @app.get("/download-excel/")
-async def download_excel():
-    file_path = os.path.abspath("src/template_excel/Inf SIVICOF_PLANTILLA.xlsx")
-    if os.path.exists(file_path):
-        return FileResponse(
-            path=file_path,
-            filename="resultado.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    return JSONResponse(content={"error": f"El archivo Excel no existe en {file_path}. Primero procesa un PDF."}, status_code=404)
\ No newline at end of file
+async def download_excel(excel_id: str = ""):
+    return pdf_controller.respuesta_excel(excel_id)
+
+
+registrar_importacion(time.perf_counter() - _inicio_importacion)
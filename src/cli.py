@@ -0,0 +1,217 @@
+"""
+Procesamiento por lotes desde la línea de comandos, sin pasar por el servidor HTTP.
+
+Procesa todos los PDFs de un directorio (incluidos sus subdirectorios) o de un
+archivo ZIP en un pool de procesos y escribe un solo Excel SIVICOF, guardado
+una sola vez al final.
+
+Cada archivo terminado se anota en un manifiesto (un JSON por línea, junto al
+Excel de salida). Si la ejecución se interrumpe, al volver a lanzarla se
+reutilizan los resultados del manifiesto de los archivos que no cambiaron
+(mismo nombre y mismo SHA-256) y solo se procesan los pendientes y los que
+fallaron.
+
+Cada archivo extraído también se guarda, con todos sus movimientos, en el
+almacén de extractos (ver `statement_store`; `EXTRACTOS_DB` vacío lo
+desactiva), para consultarlo luego desde `/extractos/`. Los archivos reanudados
+del manifiesto ya quedaron guardados en la ejecución anterior.
+
+Uso (desde la raíz del repositorio):
+    python -m src.cli extractos/ --salida sivicof.xlsx
+    python -m src.cli extractos.zip --salida sivicof.xlsx --workers 4
+
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.util.executor import PDF_MAX_TAREAS_POR_WORKER
+from src.util.fill_excel import fill_excel
+from src.util.statement_store import almacen_extractos
+
+
+def listar_pdfs(entrada, directorio_temporal):
+    """
+    Retorna los PDFs de un directorio o de un ZIP, ordenados por nombre.
+
+    Los PDFs de un ZIP se extraen en `directorio_temporal`.
+
+    Args:
+        entrada (str): Ruta de un directorio o de un archivo ZIP.
+        directorio_temporal (str): Directorio donde extraer los PDFs del ZIP.
+
+    Returns:
+        list: Tuplas (nombre relativo, ruta en disco).
+    """
+    pdfs = []
+    if zipfile.is_zipfile(entrada):
+        with zipfile.ZipFile(entrada) as archivo_zip:
+            for indice, miembro in enumerate(archivo_zip.infolist()):
+                if miembro.is_dir() or not miembro.filename.lower().endswith(".pdf"):
+                    continue
+                # Nombre propio en disco: los nombres del ZIP pueden traer rutas arbitrarias
+                ruta = os.path.join(directorio_temporal, f"{indice}.pdf")
+                with archivo_zip.open(miembro) as origen, open(ruta, "wb") as destino:
+                    shutil.copyfileobj(origen, destino)
+                pdfs.append((miembro.filename, ruta))
+    elif os.path.isdir(entrada):
+        for raiz, _, archivos in os.walk(entrada):
+            for archivo in archivos:
+                if archivo.lower().endswith(".pdf"):
+                    ruta = os.path.join(raiz, archivo)
+                    pdfs.append((os.path.relpath(ruta, entrada), ruta))
+    else:
+        raise ValueError(f"'{entrada}' no es un directorio ni un archivo ZIP.")
+    return sorted(pdfs)
+
+
+def sha256_archivo(ruta):
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques."""
+    resumen = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def cargar_manifiesto(ruta_manifiesto):
+    """
+    Lee los resultados exitosos de una ejecución anterior.
+
+    Args:
+        ruta_manifiesto (str): Ruta del manifiesto.
+
+    Returns:
+        dict: (nombre, sha256) -> resultado {"filename", "data"}.
+    """
+    terminados = {}
+    if not os.path.exists(ruta_manifiesto):
+        return terminados
+    with open(ruta_manifiesto, encoding="utf-8") as archivo:
+        for linea in archivo:
+            try:
+                entrada = json.loads(linea)
+            except json.JSONDecodeError:
+                # La última línea puede quedar incompleta si la ejecución se cortó
+                continue
+            resultado = entrada["resultado"]
+            if resultado.get("data") and "error" not in resultado["data"]:
+                terminados[(entrada["archivo"], entrada["sha256"])] = resultado
+    return terminados
+
+
+def _procesar(ruta, con_movimientos=False):
+    """Punto de entrada ejecutado dentro de cada proceso del pool."""
+    from src.util.process_pdf import process_pdf
+
+    info = {}
+    datos = process_pdf(pdf_path=ruta, info=info, con_movimientos=con_movimientos)
+    return datos, {llave: info[llave] for llave in ("layout", "identificacion", "movimientos", "contadores")
+                   if llave in info}
+
+
+def procesar_lote(entrada, salida, ruta_manifiesto=None, workers=None):
+    """
+    Procesa un directorio o ZIP de PDFs y escribe el Excel SIVICOF del lote.
+
+    Args:
+        entrada (str): Ruta de un directorio o de un archivo ZIP.
+        salida (str): Ruta del Excel de salida.
+        ruta_manifiesto (str): Ruta del manifiesto. Si es None, se usa `<salida>.manifiesto.jsonl`.
+        workers (int): Procesos del pool (por defecto, el número de CPUs).
+
+    Returns:
+        dict: Resumen de la ejecución (archivos, reanudados, fallidos, páginas, segundos).
+    """
+    inicio = time.perf_counter()
+    ruta_manifiesto = ruta_manifiesto or f"{salida}.manifiesto.jsonl"
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    terminados = cargar_manifiesto(ruta_manifiesto)
+    directorio_temporal = tempfile.mkdtemp(prefix="sivicof-lote-")
+    try:
+        pdfs = listar_pdfs(entrada, directorio_temporal)
+        resultados = {}
+        pendientes = []
+        for nombre, ruta in pdfs:
+            huella = sha256_archivo(ruta)
+            if (nombre, huella) in terminados:
+                resultados[nombre] = terminados[(nombre, huella)]
+            else:
+                pendientes.append((nombre, ruta, huella))
+        print(f"{len(pdfs)} PDFs encontrados: {len(resultados)} ya procesados, {len(pendientes)} pendientes.")
+
+        paginas = 0
+        fallidos = 0
+        with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=PDF_MAX_TAREAS_POR_WORKER) as pool, \
+                open(ruta_manifiesto, "a", encoding="utf-8") as manifiesto:
+            futuros = {pool.submit(_procesar, ruta, almacen_extractos.habilitado): (nombre, huella)
+                       for nombre, ruta, huella in pendientes}
+            for completados, futuro in enumerate(as_completed(futuros), start=1):
+                nombre, huella = futuros[futuro]
+                info = {}
+                try:
+                    datos, info = futuro.result()
+                    paginas += info.get("contadores", {}).get("paginas", 0)
+                    resultado = {"filename": nombre, "data": datos}
+                except Exception as e:
+                    resultado = {"filename": nombre, "error": str(e)}
+                exitoso = bool(resultado.get("data")) and "error" not in resultado["data"]
+                fallidos += not exitoso
+                if exitoso:
+                    try:
+                        almacen_extractos.guardar(huella, nombre, datos, info)
+                    except Exception as e:
+                        print(f"No se pudo guardar '{nombre}' en el almacén de extractos: {e}")
+                resultados[nombre] = resultado
+                # Se escribe y se vacía cada línea para poder reanudar tras una interrupción
+                manifiesto.write(json.dumps({"archivo": nombre, "sha256": huella, "resultado": resultado},
+                                            ensure_ascii=False) + "\n")
+                manifiesto.flush()
+                print(f"[{completados}/{len(pendientes)}] {nombre}: {'ok' if exitoso else 'error'}")
+
+        # Un solo guardado del libro, con las filas en el orden de los archivos
+        fill_excel([resultados[nombre] for nombre, _ in pdfs], ruta_salida=salida)
+    finally:
+        shutil.rmtree(directorio_temporal, ignore_errors=True)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "archivos": len(pdfs),
+        "reanudados": len(pdfs) - len(pendientes),
+        "procesados": len(pendientes),
+        "fallidos": fallidos,
+        "paginas": paginas,
+        "segundos": segundos,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa un directorio o ZIP de extractos y genera el Excel SIVICOF.")
+    parser.add_argument("entrada", help="Directorio o archivo ZIP con los PDFs.")
+    parser.add_argument("--salida", default="sivicof.xlsx", help="Excel de salida (por defecto 'sivicof.xlsx').")
+    parser.add_argument("--manifiesto", help="Manifiesto para reanudar (por defecto '<salida>.manifiesto.jsonl').")
+    parser.add_argument("--workers", type=int, help="Procesos del pool (por defecto, el número de CPUs).")
+    args = parser.parse_args()
+
+    try:
+        resumen = procesar_lote(args.entrada, args.salida, args.manifiesto, args.workers)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    segundos = resumen["segundos"]
+    print(f"\n{resumen['archivos']} archivos ({resumen['reanudados']} reanudados del manifiesto, "
+          f"{resumen['procesados']} procesados, {resumen['fallidos']} con error) en {segundos:.1f} s.")
+    if resumen["procesados"]:
+        print(f"Rendimiento: {resumen['procesados'] / segundos:.2f} archivos/s, "
+              f"{resumen['paginas'] / segundos:.2f} páginas/s.")
+    print(f"Excel generado en '{args.salida}'.")
+    sys.exit(1 if resumen["fallidos"] else 0)
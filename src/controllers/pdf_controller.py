@@ -0,0 +1,184 @@
+import hashlib
+import os
+import tempfile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from src.util.executor import procesar_pdf_en_pool
+from src.util.fill_excel import fill_excel_en_memoria
+from src.util.cache import cache_extracciones
+from src.util.workbook_store import almacen_libros
+from src.util.statement_store import almacen_extractos
+from src.util.metrics import registro
+
+TAMANO_BLOQUE_DESCARGA = 64 * 1024
+TAMANO_BLOQUE_SUBIDA = 1024 * 1024
+
+# Mensajes para las etapas en que `process_pdf` termina sin datos (ver `info["fallo"]`)
+MOTIVOS_FALLO = {
+    "lectura_pdf": "No se pudo leer el archivo PDF.",
+}
+
+
+def _motivo_sin_datos(info):
+    """Mensaje de error de una extracción que no devolvió datos, según la etapa que falló."""
+    fallo = info.get("fallo")
+    if fallo is None:
+        return "No se pudo extraer información del PDF."
+    return MOTIVOS_FALLO.get(fallo, f"La extracción falló en la etapa '{fallo}'.")
+
+
+async def _guardado_en_almacen(hash_pdf):
+    """Indica si un PDF ya está en el almacén de extractos (o si no hace falta guardarlo)."""
+    if not almacen_extractos.habilitado:
+        return True
+    try:
+        return await run_in_threadpool(almacen_extractos.existe, hash_pdf)
+    except Exception as e:
+        # Sin poder consultar el almacén, se responde desde la caché igual que antes
+        print(f"No se pudo consultar el almacén de extractos: {e}")
+        return True
+
+
+def _nombre_seguro(filename):
+    """Nombre del archivo sin directorios, para usarlo dentro del directorio temporal."""
+    nombre = os.path.basename(filename or "")
+    return nombre if nombre not in ("", ".", "..") else "extracto.pdf"
+
+
+async def _escribir_pdf(archivo, ruta):
+    """
+    Copia un archivo subido a disco por bloques y calcula su SHA-256 en la misma pasada.
+
+    Args:
+        archivo (UploadFile): El archivo subido.
+        ruta (str): Ruta de destino.
+
+    Returns:
+        str: El SHA-256 hexadecimal del contenido.
+    """
+    resumen = hashlib.sha256()
+    with open(ruta, "wb") as destino:
+        while bloque := await archivo.read(TAMANO_BLOQUE_SUBIDA):
+            resumen.update(bloque)
+            destino.write(bloque)
+    return resumen.hexdigest()
+
+
+async def procesar_archivo(filename, contenido, tiempos=None):
+    """
+    Procesa un PDF subido: consulta la caché y, si no está, lo extrae en el pool de procesos.
+
+    Cada extracción exitosa se guarda, con todos sus movimientos, en el almacén
+    de extractos. La caché no guarda los movimientos: un acierto de caché que no
+    está en el almacén (por ejemplo, extraído antes de habilitarlo) se extrae de
+    nuevo para guardarlo.
+
+    Los workers leen el PDF desde disco, así que se escribe una sola vez en un
+    directorio temporal privado de esta llamada (nombres repetidos entre
+    peticiones no chocan), que se elimina al terminar. Un `UploadFile` se copia
+    por bloques sin cargarlo completo en memoria.
+
+    Args:
+        filename (str): Nombre original del archivo.
+        contenido (bytes | UploadFile): Contenido del PDF, o el archivo subido sin leer.
+        tiempos (dict): Si se indica, se llena con la duración en segundos de cada
+                        etapa del procesamiento de este archivo.
+
+    Returns:
+        dict: {"filename", "data"} si se procesó, o {"filename", "error"} si falló o la
+              extracción no devolvió datos.
+    """
+    if tiempos is None:
+        tiempos = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="sivicof-") as directorio:
+            file_path = os.path.join(directorio, _nombre_seguro(filename))
+            if isinstance(contenido, (bytes, bytearray)):
+                hash_pdf = hashlib.sha256(contenido).hexdigest()
+            else:
+                with registro.tramo("escritura_temporal", tiempos):
+                    hash_pdf = await _escribir_pdf(contenido, file_path)
+
+            # Un PDF idéntico ya procesado se responde desde la caché
+            with registro.tramo("cache_consulta", tiempos):
+                clave = cache_extracciones.clave_de_hash(hash_pdf)
+                # La lectura del nivel de disco y el JSON no deben bloquear el event loop
+                data = await run_in_threadpool(cache_extracciones.obtener, clave)
+            if data is not None and await _guardado_en_almacen(hash_pdf):
+                registro.incrementar("pdfs_total", resultado="cache")
+                return {"filename": filename, "data": data}
+
+            if isinstance(contenido, (bytes, bytearray)):
+                with registro.tramo("escritura_temporal", tiempos):
+                    with open(file_path, "wb") as buffer:
+                        buffer.write(contenido)
+
+            # Procesar PDF en el pool de procesos
+            info = {}
+            data = await procesar_pdf_en_pool(file_path, info, con_movimientos=almacen_extractos.habilitado)
+        tiempos.update(info["tiempos"])
+        if not data:
+            registro.incrementar("pdfs_total", resultado="error")
+            return {"filename": filename, "error": _motivo_sin_datos(info)}
+        if "error" not in data:
+            registro.incrementar("pdfs_total", resultado="ok")
+            with registro.tramo("cache_guardado", tiempos):
+                await run_in_threadpool(cache_extracciones.guardar, clave, data)
+            try:
+                with registro.tramo("almacen_guardado", tiempos):
+                    await run_in_threadpool(almacen_extractos.guardar, hash_pdf, filename, data, info)
+            except Exception as e:
+                # El resultado se entrega aunque no se haya podido guardar para consultas
+                print(f"No se pudo guardar '{filename}' en el almacén de extractos: {e}")
+        else:
+            registro.incrementar("pdfs_total", resultado="error")
+        return {"filename": filename, "data": data}
+
+    except Exception as e:
+        registro.incrementar("pdfs_total", resultado="error")
+        return {"filename": filename, "error": str(e)}
+
+
+async def generar_excel(results, excel_id=None, tiempos=None, ttl=None):
+    """
+    Genera en memoria el Excel SIVICOF de un lote sin bloquear el event loop.
+
+    Args:
+        results (list): Resultados retornados por `procesar_archivo`.
+        excel_id (str): Id con el que se guarda el libro (por ejemplo, el de un trabajo).
+                        Si es None, se genera uno nuevo.
+        tiempos (dict): Si se indica, se llena con la duración de cada etapa del llenado.
+        ttl (float): Segundos que se conserva el libro. Si es None, `EXCEL_TTL`.
+
+    Returns:
+        str: El id con el que se descarga el Excel desde `almacen_libros`.
+    """
+    contenido = await run_in_threadpool(fill_excel_en_memoria, results, tiempos)
+    return almacen_libros.guardar(contenido, excel_id, ttl=ttl)
+
+
+def respuesta_excel(excel_id):
+    """
+    Construye la respuesta de descarga de un Excel guardado en memoria.
+
+    Args:
+        excel_id (str): El id retornado por `generar_excel`.
+
+    Returns:
+        Response: El Excel como descarga, o un error 404 si no existe o ya expiró.
+    """
+    contenido = almacen_libros.obtener(excel_id) if excel_id else None
+    if contenido is None:
+        return JSONResponse(content={"error": f"El Excel '{excel_id}' no existe o ya expiró. Primero procesa un PDF."},
+                            status_code=404)
+    def bloques():
+        vista = memoryview(contenido)
+        for inicio in range(0, len(vista), TAMANO_BLOQUE_DESCARGA):
+            yield vista[inicio:inicio + TAMANO_BLOQUE_DESCARGA]
+
+    return StreamingResponse(
+        bloques(),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": 'attachment; filename="resultado.xlsx"',
+                 "Content-Length": str(len(contenido))}
+    )
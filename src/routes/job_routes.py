@@ -0,0 +1,69 @@
+import json
+from typing import List
+from fastapi import APIRouter, File, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+import src.controllers.pdf_controller as pdf_controller
+from src.util.jobs import GestorTrabajos, ColaLlena, COMPLETADO
+from src.util.admission import control_admision, PeticionRechazada
+from src.util.workbook_store import almacen_libros
+
+gestor_trabajos = GestorTrabajos(
+    procesar_archivo=pdf_controller.procesar_archivo,
+    generar_excel=pdf_controller.generar_excel,
+)
+
+job_router = APIRouter()
+
+@job_router.post("/", status_code=202)
+async def submit_job(files: List[UploadFile] = File(...)):
+    # Mismos límites que /upload/: el cupo se ocupa hasta que el trabajo termina
+    tamano = sum(file.size or 0 for file in files)
+    try:
+        await control_admision.reservar(len(files), tamano)
+    except PeticionRechazada as e:
+        headers = {"Retry-After": str(e.reintentar)} if e.reintentar else None
+        return JSONResponse(content={"error": str(e)}, status_code=e.codigo, headers=headers)
+    try:
+        archivos = [(file.filename, await file.read()) for file in files]
+        trabajo = gestor_trabajos.enviar(archivos, al_terminar=lambda: control_admision.liberar(len(files), tamano))
+    except ColaLlena as e:
+        control_admision.liberar(len(files), tamano)
+        return JSONResponse(content={"error": str(e)}, status_code=503,
+                            headers={"Retry-After": str(control_admision.reintentar)})
+    except BaseException:
+        control_admision.liberar(len(files), tamano)
+        raise
+    return {"job_id": trabajo.id, "estado": trabajo.estado, "total": len(archivos)}
+
+@job_router.get("/{job_id}")
+async def job_status(job_id: str):
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None:
+        return JSONResponse(content={"error": f"El trabajo {job_id} no existe."}, status_code=404)
+    resumen = trabajo.resumen()
+    # El libro puede haberse descartado del almacén (por memoria) antes que el trabajo
+    resumen["excel_disponible"] = resumen["excel_disponible"] and almacen_libros.obtener(trabajo.excel) is not None
+    return resumen
+
+@job_router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None:
+        return JSONResponse(content={"error": f"El trabajo {job_id} no existe."}, status_code=404)
+
+    async def eventos():
+        async for evento in trabajo.escuchar():
+            yield f"event: {evento['evento']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(eventos(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@job_router.get("/{job_id}/excel")
+async def job_excel(job_id: str):
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None:
+        return JSONResponse(content={"error": f"El trabajo {job_id} no existe."}, status_code=404)
+    if trabajo.estado != COMPLETADO:
+        return JSONResponse(content={"error": f"El trabajo {job_id} aún no ha terminado.", "estado": trabajo.estado},
+                            status_code=409)
+    return pdf_controller.respuesta_excel(trabajo.excel)
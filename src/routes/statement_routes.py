@@ -0,0 +1,38 @@
+from typing import List, Optional
+from fastapi import APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+import src.controllers.pdf_controller as pdf_controller
+from src.util.statement_store import almacen_extractos
+
+statement_router = APIRouter()
+
+@statement_router.get("/")
+async def list_statements(cuenta: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                          limite: int = Query(100, ge=1, le=1000)):
+    return await run_in_threadpool(almacen_extractos.buscar_extractos, cuenta, desde, hasta, limite)
+
+@statement_router.get("/movimientos/")
+async def search_movements(cuenta: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                           valor_min: Optional[float] = None, valor_max: Optional[float] = None,
+                           descripcion: Optional[str] = None, extracto_id: Optional[int] = None,
+                           limite: int = Query(500, ge=1, le=10000)):
+    return await run_in_threadpool(almacen_extractos.buscar_movimientos, cuenta, desde, hasta,
+                                   valor_min, valor_max, descripcion, extracto_id, limite)
+
+@statement_router.post("/excel/")
+async def regenerate_excel(cuenta: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                           ids: List[int] = Query(None)):
+    results = await run_in_threadpool(almacen_extractos.resultados, cuenta, desde, hasta, ids)
+    if not results:
+        return JSONResponse(content={"error": "No hay extractos guardados que coincidan con el filtro."},
+                            status_code=404)
+    excel_id = await pdf_controller.generar_excel(results)
+    return {"excel_id": excel_id, "extractos": len(results)}
+
+@statement_router.get("/{extracto_id}")
+async def get_statement(extracto_id: int):
+    extracto = await run_in_threadpool(almacen_extractos.obtener, extracto_id)
+    if extracto is None:
+        return JSONResponse(content={"error": f"El extracto {extracto_id} no existe."}, status_code=404)
+    return extracto
@@ -0,0 +1,34 @@
+from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter
+from src.util.cache import cache_extracciones
+from src.util.workbook_store import almacen_libros
+from src.util.executor import estadisticas_resumen
+from src.util.warmup import arranque
+from src.util.admission import control_admision
+from src.util.statement_store import almacen_extractos
+
+stats_router = APIRouter()
+
+@stats_router.get("/cache/")
+async def cache_stats():
+    return cache_extracciones.estadisticas()
+
+@stats_router.get("/excel/")
+async def excel_stats():
+    return almacen_libros.estadisticas()
+
+@stats_router.get("/resumen/")
+async def resumen_stats():
+    return estadisticas_resumen()
+
+@stats_router.get("/arranque/")
+async def startup_stats():
+    return arranque
+
+@stats_router.get("/admision/")
+async def admission_stats():
+    return control_admision.estadisticas()
+
+@stats_router.get("/extractos/")
+async def statement_stats():
+    return await run_in_threadpool(almacen_extractos.estadisticas)
@@ -1,7 +1,6 @@
-import os
 from fastapi import Path, APIRouter
 import src.controllers.test_controller as test_controller
-from fastapi.responses import FileResponse
+import src.controllers.pdf_controller as pdf_controller
 
 test_router = APIRouter()
 
@@ -14,12 +13,5 @@ async def say_hello(name: str):
     return {"message": f"Hello {name}"}
 
 @test_router.get("/download-excel/")
-async def download_excel():
-    file_path = os.path.abspath("src/template_excel/Inf SIVICOF_PLANTILLA.xlsx")
-    if os.path.exists(file_path):
-        return FileResponse(
-            path=file_path,
-            filename="resultado.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    return {"error": "El archivo Excel no existe. Primero procesa un PDF."}
+async def download_excel(excel_id: str = ""):
+    return pdf_controller.respuesta_excel(excel_id)
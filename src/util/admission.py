@@ -0,0 +1,297 @@
+"""
+Control de admisión de las peticiones a `/upload/`.
+
+Sin límites, un par de lotes grandes a fin de mes mete decenas de PDFs a la
+vez en memoria (cada uno con camelot y Ghostscript en un worker) y todo el
+servicio se vuelve lento. El control se hace en dos momentos:
+
+- Antes de recibir el cuerpo (`FiltroSubidas`), con el `Content-Length`: una
+  petición más pesada que `UPLOAD_MAX_MB_PETICION` se rechaza con 413, y si la
+  cola de espera ya está llena, con 429. Así el servidor no recibe ni guarda
+  un lote que de todos modos va a rechazar.
+- Con el formulario ya recibido (solo entonces se sabe cuántos archivos trae),
+  antes de procesarlos, cada petición pide cupo para sus PDFs y sus bytes:
+  - Si hay capacidad y nadie espera, entra de inmediato.
+  - Si no, espera en una cola FIFO acotada hasta que se libere capacidad.
+  - Si la cola está llena, se rechaza con 429; si espera demasiado, con 503.
+  - Una petición con más archivos o más bytes de los permitidos se rechaza con 413.
+
+Las respuestas 429 y 503 incluyen `Retry-After`. Una petición que no cabe en
+los límites en curso ni con el servidor vacío (por ejemplo, más archivos que
+`UPLOAD_MAX_EXTRACCIONES`) se admite cuando no hay otra en curso, para que
+nunca quede esperando para siempre.
+
+Configuración (variables de entorno):
+- UPLOAD_MAX_EXTRACCIONES: PDFs en proceso a la vez, sumando todas las
+  peticiones (por defecto, 4 por cada worker del pool).
+- UPLOAD_MAX_MB_EN_CURSO: MB de PDFs en proceso a la vez (por defecto 200).
+- UPLOAD_MAX_MB_PETICION: MB de una sola petición (por defecto, igual a
+  UPLOAD_MAX_MB_EN_CURSO).
+- UPLOAD_MAX_ARCHIVOS: Archivos por petición (por defecto 50).
+- UPLOAD_MAX_COLA: Peticiones que pueden esperar capacidad (por defecto 10).
+- UPLOAD_ESPERA_MAX: Segundos máximos de espera en la cola (por defecto 30).
+- UPLOAD_REINTENTAR: Segundos que se sugieren en `Retry-After` (por defecto 30).
+
+"""
+
+import asyncio
+import os
+from collections import Counter, deque
+
+from starlette.responses import JSONResponse
+
+from src.util.executor import PDF_WORKERS
+from src.util.metrics import registro
+
+UPLOAD_MAX_EXTRACCIONES = int(os.getenv("UPLOAD_MAX_EXTRACCIONES", str(4 * PDF_WORKERS)))
+UPLOAD_MAX_MB_EN_CURSO = float(os.getenv("UPLOAD_MAX_MB_EN_CURSO", "200"))
+UPLOAD_MAX_MB_PETICION = float(os.getenv("UPLOAD_MAX_MB_PETICION", str(UPLOAD_MAX_MB_EN_CURSO)))
+UPLOAD_MAX_ARCHIVOS = int(os.getenv("UPLOAD_MAX_ARCHIVOS", "50"))
+UPLOAD_MAX_COLA = int(os.getenv("UPLOAD_MAX_COLA", "10"))
+UPLOAD_ESPERA_MAX = float(os.getenv("UPLOAD_ESPERA_MAX", "30"))
+UPLOAD_REINTENTAR = int(os.getenv("UPLOAD_REINTENTAR", "30"))
+
+
+class PeticionRechazada(Exception):
+    """
+    La petición no se admite.
+
+    Attributes:
+        motivo (str): "archivos", "tamano", "cola_llena" o "espera".
+        codigo (int): Código HTTP de la respuesta (413, 429 o 503).
+        reintentar (int): Segundos para `Retry-After`, o None si reintentar no sirve.
+    """
+
+    def __init__(self, mensaje, motivo, codigo, reintentar=None):
+        super().__init__(mensaje)
+        self.motivo = motivo
+        self.codigo = codigo
+        self.reintentar = reintentar
+
+
+class ControlAdmision:
+    """
+    Cupos de PDFs y bytes en curso con una cola FIFO acotada de peticiones en espera.
+
+    Args:
+        max_extracciones (int): PDFs en proceso a la vez.
+        max_bytes (int): Bytes de PDFs en proceso a la vez.
+        max_archivos (int): Archivos por petición.
+        max_bytes_peticion (int): Bytes de una sola petición.
+        max_cola (int): Peticiones que pueden esperar capacidad.
+        espera_max (float): Segundos máximos de espera en la cola.
+        reintentar (int): Segundos que se sugieren en `Retry-After`.
+    """
+
+    def __init__(self, max_extracciones=UPLOAD_MAX_EXTRACCIONES,
+                 max_bytes=int(UPLOAD_MAX_MB_EN_CURSO * 1024 * 1024), max_archivos=UPLOAD_MAX_ARCHIVOS,
+                 max_bytes_peticion=int(UPLOAD_MAX_MB_PETICION * 1024 * 1024),
+                 max_cola=UPLOAD_MAX_COLA, espera_max=UPLOAD_ESPERA_MAX, reintentar=UPLOAD_REINTENTAR):
+        self.max_extracciones = max_extracciones
+        self.max_bytes = max_bytes
+        self.max_archivos = max_archivos
+        self.max_bytes_peticion = max_bytes_peticion
+        self.max_cola = max_cola
+        self.espera_max = espera_max
+        self.reintentar = reintentar
+        self.peticiones_en_curso = 0
+        self.archivos_en_curso = 0
+        self.bytes_en_curso = 0
+        # Entradas [archivos, bytes, futuro] en orden de llegada
+        self._cola = deque()
+        self.max_cola_observada = 0
+        self.admitidas = Counter()
+        self.rechazadas = Counter()
+        self._espera_total = 0.0
+
+    def _cabe(self, archivos, tamano):
+        if self.peticiones_en_curso == 0:
+            return True
+        return (self.archivos_en_curso + archivos <= self.max_extracciones
+                and self.bytes_en_curso + tamano <= self.max_bytes)
+
+    def _ocupar(self, archivos, tamano):
+        self.peticiones_en_curso += 1
+        self.archivos_en_curso += archivos
+        self.bytes_en_curso += tamano
+        self._publicar()
+
+    def liberar(self, archivos, tamano):
+        """
+        Devuelve la capacidad reservada con `reservar` y admite a las que esperan.
+
+        Args:
+            archivos (int): Número de PDFs de la petición.
+            tamano (int): Bytes de los PDFs de la petición.
+        """
+        self.peticiones_en_curso -= 1
+        self.archivos_en_curso -= archivos
+        self.bytes_en_curso -= tamano
+        self._despertar()
+
+    def _despertar(self):
+        """Admite, en orden de llegada, a las peticiones en espera mientras quepan."""
+        while self._cola and self._cabe(*self._cola[0][:2]):
+            archivos, tamano, futuro = self._cola.popleft()
+            self._ocupar(archivos, tamano)
+            futuro.set_result(True)
+        self._publicar()
+
+    def _rechazar(self, mensaje, motivo, codigo, reintentar=None):
+        self.rechazadas[motivo] += 1
+        registro.incrementar("rechazos_total", motivo=motivo)
+        print(f"Petición rechazada ({motivo}): {mensaje}")
+        raise PeticionRechazada(mensaje, motivo, codigo, reintentar)
+
+    def _publicar(self):
+        registro.fijar("cola_admision", len(self._cola))
+        registro.fijar("archivos_en_curso", self.archivos_en_curso)
+        registro.fijar("bytes_en_curso", self.bytes_en_curso)
+
+    def _revisar_tamano(self, tamano):
+        if tamano > self.max_bytes_peticion:
+            self._rechazar(f"La petición pesa {tamano / 1024 / 1024:.2f} MB; el máximo es "
+                           f"{self.max_bytes_peticion / 1024 / 1024:.2f} MB.", "tamano", 413)
+
+    def prevalidar(self, tamano):
+        """
+        Rechaza una petición antes de recibir su cuerpo si de todos modos no se admitiría.
+
+        No reserva nada: la petición todavía debe llamar a `reservar` cuando
+        sepa cuántos archivos trae.
+
+        Args:
+            tamano (int): Bytes anunciados en `Content-Length` (incluye el formato multipart).
+
+        Raises:
+            PeticionRechazada: Si la petición es demasiado pesada o la cola de espera está llena.
+        """
+        self._revisar_tamano(tamano)
+        # Con al menos un archivo, la petición tendría que esperar y no hay lugar en la cola
+        if len(self._cola) >= self.max_cola and (self._cola or not self._cabe(1, tamano)):
+            self._rechazar(f"Hay {len(self._cola)} peticiones esperando. Intente más tarde.",
+                           "cola_llena", 429, self.reintentar)
+
+    async def reservar(self, archivos, tamano, tiempos=None):
+        """
+        Reserva capacidad para una petición, esperando en la cola si hace falta.
+
+        Quien reserva debe llamar a `liberar` con los mismos valores al terminar.
+
+        Args:
+            archivos (int): Número de PDFs de la petición.
+            tamano (int): Bytes de los PDFs de la petición.
+            tiempos (dict): Si se indica, se le suma la espera en la cola ("espera_admision").
+
+        Raises:
+            PeticionRechazada: Si la petición tiene demasiados archivos o bytes, la
+                               cola está llena o la espera supera `espera_max`.
+        """
+        if archivos > self.max_archivos:
+            self._rechazar(f"La petición tiene {archivos} archivos; el máximo es {self.max_archivos}.",
+                           "archivos", 413)
+        self._revisar_tamano(tamano)
+
+        if not self._cola and self._cabe(archivos, tamano):
+            self._ocupar(archivos, tamano)
+            self.admitidas["inmediata"] += 1
+            registro.incrementar("admisiones_total", resultado="inmediata")
+        else:
+            if len(self._cola) >= self.max_cola:
+                self._rechazar(f"Hay {len(self._cola)} peticiones esperando. Intente más tarde.",
+                               "cola_llena", 429, self.reintentar)
+            entrada = [archivos, tamano, asyncio.get_running_loop().create_future()]
+            self._cola.append(entrada)
+            self.max_cola_observada = max(self.max_cola_observada, len(self._cola))
+            self._publicar()
+            espera = {}
+            try:
+                with registro.tramo("espera_admision", espera):
+                    await asyncio.wait_for(asyncio.shield(entrada[2]), self.espera_max)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if entrada[2].done():
+                    # Se le asignó capacidad justo al vencer la espera o al cancelarse
+                    if isinstance(e, asyncio.CancelledError):
+                        self.liberar(archivos, tamano)
+                        raise
+                else:
+                    self._cola.remove(entrada)
+                    entrada[2].cancel()
+                    # Las que venían detrás quizá sí quepan
+                    self._despertar()
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    self._rechazar(f"No hubo capacidad en {self.espera_max:g} segundos. Intente más tarde.",
+                                   "espera", 503, self.reintentar)
+            finally:
+                if tiempos is not None:
+                    tiempos.update(espera)
+            self._espera_total += espera["espera_admision"]
+            self.admitidas["tras_espera"] += 1
+            registro.incrementar("admisiones_total", resultado="tras_espera")
+
+    def estadisticas(self):
+        """
+        Retorna el estado del control de admisión para ajustar los límites.
+
+        Returns:
+            dict: Límites, capacidad en uso, cola y conteo de admisiones y rechazos.
+        """
+        admitidas_tras_espera = self.admitidas["tras_espera"]
+        return {
+            "limites": {
+                "max_extracciones": self.max_extracciones,
+                "max_bytes": self.max_bytes,
+                "max_archivos": self.max_archivos,
+                "max_bytes_peticion": self.max_bytes_peticion,
+                "max_cola": self.max_cola,
+                "espera_max": self.espera_max,
+            },
+            "peticiones_en_curso": self.peticiones_en_curso,
+            "archivos_en_curso": self.archivos_en_curso,
+            "bytes_en_curso": self.bytes_en_curso,
+            "en_cola": len(self._cola),
+            "max_cola_observada": self.max_cola_observada,
+            "admitidas": dict(self.admitidas),
+            "rechazadas": dict(self.rechazadas),
+            "espera_promedio": self._espera_total / admitidas_tras_espera if admitidas_tras_espera else 0.0,
+        }
+
+
+control_admision = ControlAdmision()
+
+
+class FiltroSubidas:
+    """
+    Middleware ASGI que aplica `ControlAdmision.prevalidar` antes de recibir el cuerpo.
+
+    FastAPI lee y guarda todo el formulario multipart antes de llamar a la
+    ruta, así que la ruta solo puede rechazar un lote cuando ya se recibió.
+    Este middleware decide con los encabezados. Las peticiones sin
+    `Content-Length` (cuerpo por partes) pasan y se revisan en `reservar`.
+
+    Args:
+        app: La aplicación ASGI.
+        rutas (dict): Ruta -> llave del mensaje de error en el JSON de respuesta, para
+                      responder con la misma forma que la ruta (ej. {"/upload/": "detail"}).
+        control (ControlAdmision): El control de admisión.
+    """
+
+    def __init__(self, app, rutas, control=control_admision):
+        self.app = app
+        self.rutas = rutas
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.rutas:
+            longitud = dict(scope["headers"]).get(b"content-length", b"")
+            try:
+                if longitud.isdigit():
+                    self.control.prevalidar(int(longitud))
+            except PeticionRechazada as e:
+                headers = {"Retry-After": str(e.reintentar)} if e.reintentar else None
+                respuesta = JSONResponse(content={self.rutas[scope["path"]]: str(e)}, status_code=e.codigo,
+                                         headers=headers)
+                await respuesta(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
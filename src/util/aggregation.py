@@ -0,0 +1,189 @@
+"""
+Agregación en streaming de los movimientos de un extracto.
+
+Antes, los movimientos de todas las páginas se unían con `pd.concat` dentro del
+ciclo de páginas (cada página copiaba de nuevo todas las anteriores) y se
+mantenían en memoria solo para calcular un número. `AgregadorMovimientos`
+recibe las páginas una por una, actualiza estadísticas acumuladas con
+operaciones vectorizadas sobre la página y la descarta: el costo es lineal en
+el número de páginas y la memoria no crece con ellas. Solo si se pide
+(`con_movimientos`, cuando el almacén de extractos está habilitado) se
+conservan además las filas normalizadas de cada página para guardarlas.
+
+Configuración (variables de entorno):
+- TOP_MOVIMIENTOS: Número de movimientos más grandes que se reportan (por defecto 5).
+
+"""
+
+import heapq
+import math
+import os
+
+TOP_MOVIMIENTOS = int(os.getenv("TOP_MOVIMIENTOS", "5"))
+
+# Columnas de la tabla de movimientos de Bancolombia; cada formato puede declarar las suyas
+COLUMNAS_POR_DEFECTO = {"fecha": 0, "descripcion": 1, "valor": 4}
+
+
+def formatear_valor(numero):
+    """Formatea un número con separadores de miles y dos decimales."""
+    return f"{numero:,.2f}"
+
+
+class AgregadorMovimientos:
+    """
+    Acumula estadísticas de los movimientos de un extracto, página por página.
+
+    Las filas cuyo valor no es numérico (encabezados, líneas de descripción
+    partidas) se ignoran.
+
+    Args:
+        top_n (int): Número de movimientos más grandes que se conservan.
+        columnas (dict): Índice de las columnas "fecha", "descripcion" y "valor"
+                         (ver `Layout.columnas_movimiento`).
+        con_movimientos (bool): Si es True, conserva las filas en `movimientos`.
+
+    Attributes:
+        cantidad (int): Número de movimientos con valor.
+        maximo (float): Abono más grande (NaN si no hay movimientos).
+        minimo (float): Cargo más grande, con signo negativo (NaN si no hay movimientos).
+        total_abonos (float): Suma de los valores positivos.
+        total_cargos (float): Suma de los valores negativos, en valor absoluto.
+        paginas (int): Páginas recibidas.
+        paginas_fallidas (list): Páginas cuya extracción falló.
+        movimientos (list): Con `con_movimientos`, tuplas (página, fecha, descripción,
+                            valor) de todos los movimientos con valor, en orden de página.
+    """
+
+    def __init__(self, top_n=TOP_MOVIMIENTOS, columnas=None, con_movimientos=False):
+        self.top_n = top_n
+        self.con_movimientos = con_movimientos
+        self.columnas = dict(columnas or COLUMNAS_POR_DEFECTO)
+        self.cantidad = 0
+        self.maximo = math.nan
+        self.minimo = math.nan
+        self.total_abonos = 0.0
+        self.total_cargos = 0.0
+        self.paginas = 0
+        self.paginas_fallidas = []
+        self.movimientos = []
+        # Montículo de mínimos con los `top_n` movimientos de mayor valor absoluto
+        self._mayores = []
+        self._orden = 0
+
+    def agregar(self, df_pagina, pagina=None):
+        """
+        Incorpora los movimientos de una página.
+
+        Args:
+            df_pagina (pd.DataFrame): Tabla de movimientos de la página (puede ser None).
+            pagina (int): Número de la página, para identificar los movimientos más grandes.
+        """
+        import pandas as pd
+
+        self.paginas += 1
+        columna_valor = self.columnas["valor"]
+        if df_pagina is None or columna_valor not in df_pagina.columns:
+            return
+        valores = pd.to_numeric(df_pagina[columna_valor].astype(str).str.replace(',', ''),
+                                errors='coerce').dropna()
+        if valores.empty:
+            return
+
+        maximo, minimo = float(valores.max()), float(valores.min())
+        self.maximo = maximo if self.cantidad == 0 else max(self.maximo, maximo)
+        self.minimo = minimo if self.cantidad == 0 else min(self.minimo, minimo)
+        self.cantidad += len(valores)
+        self.total_abonos += float(valores[valores > 0].sum())
+        self.total_cargos += float(-valores[valores < 0].sum())
+
+        if self.con_movimientos:
+            filas = df_pagina.loc[valores.index]
+            columna_fecha, columna_descripcion = self.columnas["fecha"], self.columnas["descripcion"]
+            fechas = filas[columna_fecha].astype(str) if columna_fecha in filas.columns else [""] * len(filas)
+            descripciones = (filas[columna_descripcion].astype(str) if columna_descripcion in filas.columns
+                             else [""] * len(filas))
+            self.movimientos.extend(zip([pagina] * len(filas), fechas, descripciones, valores.tolist()))
+
+        # Solo los candidatos de la página pueden entrar al top: como mucho `top_n` filas
+        for indice, absoluto in valores.abs().nlargest(self.top_n).items():
+            fila = df_pagina.loc[indice]
+            movimiento = {
+                "pagina": pagina,
+                "fecha": str(fila.get(self.columnas["fecha"], "")),
+                "descripcion": str(fila.get(self.columnas["descripcion"], "")),
+                "valor": formatear_valor(valores[indice]),
+            }
+            self._agregar_mayor(float(absoluto), movimiento)
+
+    def combinar(self, otro):
+        """
+        Incorpora las estadísticas de otro agregador con páginas posteriores a las de este.
+
+        Permite agregar por separado bloques de páginas (por ejemplo, en procesos
+        distintos) y unirlos después en orden de página.
+
+        Args:
+            otro (AgregadorMovimientos): Agregador de las páginas siguientes.
+        """
+        if otro.cantidad:
+            self.maximo = otro.maximo if self.cantidad == 0 else max(self.maximo, otro.maximo)
+            self.minimo = otro.minimo if self.cantidad == 0 else min(self.minimo, otro.minimo)
+        self.cantidad += otro.cantidad
+        self.total_abonos += otro.total_abonos
+        self.total_cargos += otro.total_cargos
+        self.paginas += otro.paginas
+        self.paginas_fallidas.extend(otro.paginas_fallidas)
+        if self.con_movimientos:
+            self.movimientos.extend(otro.movimientos)
+        # Se renumeran en su orden original para que los empates sigan favoreciendo al primero
+        for absoluto, _, movimiento in sorted(otro._mayores, key=lambda e: -e[1]):
+            self._agregar_mayor(absoluto, movimiento)
+
+    def _agregar_mayor(self, absoluto, movimiento):
+        """Mete un movimiento en el top si está entre los `top_n` más grandes."""
+        # Con valores iguales se conserva el que llegó primero
+        entrada = (absoluto, -self._orden, movimiento)
+        self._orden += 1
+        if len(self._mayores) < self.top_n:
+            heapq.heappush(self._mayores, entrada)
+        elif entrada[:2] > self._mayores[0][:2]:
+            heapq.heapreplace(self._mayores, entrada)
+
+    @property
+    def maximo_absoluto(self):
+        """float: Mayor valor absoluto entre todos los movimientos (NaN si no hay)."""
+        if self.cantidad == 0:
+            return math.nan
+        return max(abs(self.maximo), abs(self.minimo))
+
+    def mayores(self):
+        """
+        Retorna los movimientos de mayor valor absoluto.
+
+        Returns:
+            list: Hasta `top_n` diccionarios {"pagina", "fecha", "descripcion", "valor"},
+                  de mayor a menor.
+        """
+        return [movimiento for _, _, movimiento in sorted(self._mayores, key=lambda e: e[:2], reverse=True)]
+
+    def resultado(self):
+        """
+        Retorna las estadísticas con las llaves que se agregan al resultado de `process_pdf`.
+
+        Returns:
+            dict: Estadísticas formateadas como texto, lista de movimientos más grandes
+                  y, si las hubo, las páginas cuya extracción falló.
+        """
+        resultado = {
+            "Valor de movimiento maximo en el mes en pesos": formatear_valor(self.maximo_absoluto),
+            "Abono maximo en el mes en pesos": formatear_valor(max(self.maximo, 0) if self.cantidad else math.nan),
+            "Cargo maximo en el mes en pesos": formatear_valor(abs(min(self.minimo, 0)) if self.cantidad else math.nan),
+            "Suma de abonos de los movimientos": formatear_valor(self.total_abonos),
+            "Suma de cargos de los movimientos": formatear_valor(self.total_cargos),
+            "Numero de movimientos": self.cantidad,
+            "Movimientos mas grandes": self.mayores(),
+        }
+        if self.paginas_fallidas:
+            resultado["Paginas con error"] = sorted(self.paginas_fallidas)
+        return resultado
@@ -0,0 +1,209 @@
+"""
+Caché de resultados de extracción direccionada por contenido.
+
+Un mismo extracto vuelve a subirse con frecuencia (por ejemplo, para corregir un
+archivo de un lote y repetirlo). La llave de la caché es el hash SHA-256 de los
+bytes del PDF junto con la versión del resultado y la de los formatos de
+extracto registrados, de modo que un PDF idéntico devuelve el mismo
+`datosfinales` sin volver a ejecutar camelot, y un cambio de coordenadas
+invalida todas las entradas anteriores.
+
+La caché tiene dos niveles:
+- Memoria: LRU con un número máximo de entradas.
+- Disco: un archivo JSON por entrada, con expulsión de los menos usados
+  cuando el directorio supera el tamaño máximo.
+
+Configuración (variables de entorno):
+- CACHE_MAX_ENTRADAS_MEMORIA: Entradas en el nivel de memoria (por defecto 256).
+- CACHE_DIRECTORIO: Directorio del nivel de disco (por defecto '.cache/extracciones').
+- CACHE_MAX_MB_DISCO: Tamaño máximo del nivel de disco en MB (por defecto 100).
+
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src.util.process_pdf import VERSION_CONFIGURACION
+from src.util.layouts import version_layouts
+
+CACHE_MAX_ENTRADAS_MEMORIA = int(os.getenv("CACHE_MAX_ENTRADAS_MEMORIA", "256"))
+CACHE_DIRECTORIO = os.getenv("CACHE_DIRECTORIO", os.path.join(".cache", "extracciones"))
+CACHE_MAX_MB_DISCO = float(os.getenv("CACHE_MAX_MB_DISCO", "100"))
+
+
+class CacheExtracciones:
+    """
+    Caché de dos niveles (memoria LRU y disco) para los resultados de `process_pdf`.
+
+    Args:
+        max_entradas_memoria (int): Número máximo de entradas en memoria.
+        directorio (str): Directorio del nivel de disco. Si es None, solo se usa memoria.
+        max_bytes_disco (int): Tamaño máximo en bytes del nivel de disco.
+    """
+
+    def __init__(self, max_entradas_memoria=CACHE_MAX_ENTRADAS_MEMORIA, directorio=CACHE_DIRECTORIO,
+                 max_bytes_disco=int(CACHE_MAX_MB_DISCO * 1024 * 1024)):
+        self.max_entradas_memoria = max_entradas_memoria
+        self.directorio = directorio
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.expulsiones_disco = 0
+
+    @staticmethod
+    def clave(contenido):
+        """
+        Calcula la llave de un PDF a partir de sus bytes y la versión de la configuración y de los formatos.
+
+        Args:
+            contenido (bytes): Contenido del archivo PDF.
+
+        Returns:
+            str: La llave hexadecimal de la entrada.
+        """
+        return CacheExtracciones.clave_de_hash(hashlib.sha256(contenido).hexdigest())
+
+    @staticmethod
+    def clave_de_hash(hash_pdf):
+        """
+        Calcula la llave de un PDF cuyo SHA-256 ya se conoce (ver `clave`).
+
+        Args:
+            hash_pdf (str): SHA-256 hexadecimal del contenido del PDF.
+
+        Returns:
+            str: La llave hexadecimal de la entrada.
+        """
+        return f"{hash_pdf}-v{VERSION_CONFIGURACION}-{version_layouts()}"
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def obtener(self, clave):
+        """
+        Busca un resultado primero en memoria y luego en disco.
+
+        Args:
+            clave (str): La llave calculada con `clave()`.
+
+        Returns:
+            dict: El resultado guardado, o None si no está en la caché.
+        """
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return self._memoria[clave]
+
+        datos = self._leer_disco(clave)
+        with self._lock:
+            if datos is None:
+                self.fallos += 1
+                return None
+            self.aciertos_disco += 1
+            self._guardar_en_memoria(clave, datos)
+            return datos
+
+    def guardar(self, clave, datos):
+        """
+        Guarda un resultado en ambos niveles de la caché.
+
+        Args:
+            clave (str): La llave calculada con `clave()`.
+            datos (dict): El diccionario retornado por `process_pdf`.
+        """
+        with self._lock:
+            self._guardar_en_memoria(clave, datos)
+        self._escribir_disco(clave, datos)
+
+    def _guardar_en_memoria(self, clave, datos):
+        self._memoria[clave] = datos
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas_memoria:
+            self._memoria.popitem(last=False)
+
+    def _leer_disco(self, clave):
+        if not self.directorio:
+            return None
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "r", encoding="utf-8") as archivo:
+                datos = json.load(archivo)
+            # Se actualiza la fecha de modificación para que la expulsión sea por uso
+            os.utime(ruta)
+            return datos
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"No se pudo leer la entrada de caché '{ruta}': {e}")
+            return None
+
+    def _escribir_disco(self, clave, datos):
+        if not self.directorio:
+            return
+        ruta = self._ruta(clave)
+        ruta_temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+                json.dump(datos, archivo, ensure_ascii=False)
+            os.replace(ruta_temporal, ruta)
+        except Exception as e:
+            print(f"No se pudo escribir la entrada de caché '{ruta}': {e}")
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            return
+        self._expulsar_disco()
+
+    def _expulsar_disco(self):
+        """Borra las entradas de disco menos usadas hasta quedar bajo el tamaño máximo."""
+        entradas = []
+        total = 0
+        for nombre in os.listdir(self.directorio):
+            # Los archivos .tmp son escrituras en curso y no cuentan como entradas
+            if not nombre.endswith(".json"):
+                continue
+            try:
+                estado = os.stat(os.path.join(self.directorio, nombre))
+            except FileNotFoundError:
+                continue
+            entradas.append((estado.st_mtime, estado.st_size, nombre))
+            total += estado.st_size
+        entradas.sort()
+        while total > self.max_bytes_disco and entradas:
+            _, tamano, nombre = entradas.pop(0)
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            with self._lock:
+                self.expulsiones_disco += 1
+
+    def estadisticas(self):
+        """
+        Retorna los contadores de la caché.
+
+        Returns:
+            dict: Aciertos por nivel, fallos, tasa de aciertos, entradas en memoria y expulsiones de disco.
+        """
+        with self._lock:
+            aciertos = self.aciertos_memoria + self.aciertos_disco
+            consultas = aciertos + self.fallos
+            return {
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_aciertos": aciertos / consultas if consultas else 0.0,
+                "entradas_memoria": len(self._memoria),
+                "expulsiones_disco": self.expulsiones_disco,
+            }
+
+
+cache_extracciones = CacheExtracciones()
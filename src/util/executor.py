@@ -0,0 +1,348 @@
+"""
+Pool de procesos para ejecutar la extracción de PDFs sin bloquear el event loop.
+
+`process_pdf` es intensivo en CPU (camelot analiza el layout de cada página), por
+lo que se ejecuta en procesos separados. Así varios archivos de una misma
+petición se procesan en paralelo y el servidor sigue atendiendo `/`, `/static`
+y `/download-excel/` mientras tanto.
+
+Configuración (variables de entorno):
+- PDF_WORKERS: Número de procesos del pool (por defecto, el número de CPUs).
+- PDF_TIMEOUT: Segundos máximos de procesamiento por archivo (por defecto 120).
+  Cada tarea corre en un proceso hijo del worker; si lo supera, el worker
+  termina solo ese hijo y el archivo se da por fallido. Las tareas de los
+  demás workers no se ven afectadas.
+- PDF_MAX_TAREAS_POR_WORKER: PDFs que procesa cada proceso antes de ser
+  reemplazado por uno nuevo, para acotar el crecimiento de memoria de
+  camelot (por defecto 20).
+- PDF_PAGINAS_PARALELO: A partir de cuántas páginas un extracto se reparte en
+  bloques que se extraen en paralelo en varios workers (por defecto 40; 0
+  desactiva el modo por bloques). Los extractos más cortos, o todos si el pool
+  tiene un solo worker, se procesan en un solo worker.
+- PDF_PAGINAS_POR_BLOQUE: Páginas de movimientos por bloque (por defecto 10).
+
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.util.process_pdf import process_pdf, contar_paginas, extraer_bloque_movimientos, RUTA_TEXTO
+from src.util.aggregation import AgregadorMovimientos
+from src.util.warmup import PRECARGA, precargar
+from src.util.metrics import registro, medir
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "120"))
+PDF_MAX_TAREAS_POR_WORKER = int(os.getenv("PDF_MAX_TAREAS_POR_WORKER", "20"))
+PDF_PAGINAS_PARALELO = int(os.getenv("PDF_PAGINAS_PARALELO", "40"))
+PDF_PAGINAS_POR_BLOQUE = int(os.getenv("PDF_PAGINAS_POR_BLOQUE", "10"))
+
+_pool = None
+_cupos = None
+
+# Veces que la tabla de resumen se extrajo por cada ruta (capa de texto o camelot)
+rutas_resumen = Counter()
+
+
+def iniciar_pool():
+    """
+    Crea el pool de procesos si aún no existe.
+
+    Returns:
+        ProcessPoolExecutor: El pool de procesos activo.
+    """
+    global _pool, _cupos
+    if _cupos is None:
+        # Solo se envían al pool tantos archivos como workers haya, para que el
+        # tiempo máximo cuente desde que el archivo empieza a procesarse y no
+        # desde que entra en la cola. Un cupo se devuelve cuando la tarea
+        # termina de verdad en el worker, no cuando se deja de esperarla.
+        _cupos = asyncio.Semaphore(PDF_WORKERS)
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            max_tasks_per_child=PDF_MAX_TAREAS_POR_WORKER,
+            initializer=precargar if PRECARGA else None,
+        )
+        print(f"Pool de procesos iniciado con {PDF_WORKERS} workers "
+              f"(reciclaje cada {PDF_MAX_TAREAS_POR_WORKER} PDFs).")
+    return _pool
+
+
+def cerrar_pool():
+    """Cierra el pool de procesos, cancelando las tareas que no han empezado."""
+    global _pool, _cupos
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+    _cupos = None
+
+
+async def arrancar_workers():
+    """
+    Envía una tarea trivial por cada worker para que el pool los cree antes de la primera petición.
+
+    Las tareas pasan por los mismos cupos que los PDFs, así que nunca hay más
+    tareas en el pool que workers.
+    """
+    await asyncio.gather(*(_ejecutar_en_pool({}, os.getpid) for _ in range(PDF_WORKERS)))
+
+
+def _descartar_pool(pool):
+    """
+    Retira un pool dañado para que la siguiente tarea cree uno nuevo.
+
+    Args:
+        pool (ProcessPoolExecutor): El pool que se descarta.
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+        print("El pool de procesos se descarta y se creará uno nuevo.")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def procesar_pdf_en_pool(pdf_path, info=None, con_movimientos=False):
+    """
+    Ejecuta `process_pdf` en el pool de procesos con un tiempo máximo por archivo.
+
+    Los extractos de `PDF_PAGINAS_PARALELO` páginas o más se reparten primero
+    en bloques de páginas que se extraen en paralelo; luego un worker extrae el
+    resumen y la página 1 y combina los bloques en orden de página. Los tiempos
+    y contadores medidos en los workers se registran en las métricas del servidor.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        info (dict): Si se indica, se llena con los detalles de la extracción
+                     (ver `process_pdf`), incluido el tiempo de espera por un worker.
+        con_movimientos (bool): Si es True, deja en `info["movimientos"]` las filas de
+                                movimientos de todo el extracto (ver `process_pdf`).
+
+    Returns:
+        dict: Los datos extraídos por `process_pdf`.
+
+    Raises:
+        TimeoutError: Si el archivo no se procesa en `PDF_TIMEOUT` segundos.
+    """
+    if info is None:
+        info = {}
+    tiempos = {}
+    bloques = None
+    # Con un solo worker los bloques se extraerían uno tras otro: no hay nada que ganar
+    if PDF_PAGINAS_PARALELO > 0 and PDF_WORKERS > 1:
+        # Solo se cuentan las páginas; el formato lo detecta cada worker
+        try:
+            numero_de_paginas = await asyncio.get_running_loop().run_in_executor(None, contar_paginas, pdf_path)
+        except Exception as e:
+            # `process_pdf` reporta el error de lectura
+            print(f"No se pudieron contar las páginas de '{pdf_path}': {e}")
+            numero_de_paginas = 0
+        if numero_de_paginas >= PDF_PAGINAS_PARALELO:
+            with medir(tiempos, "bloques_paralelos"):
+                bloques = await _extraer_por_bloques(pdf_path, numero_de_paginas, con_movimientos)
+
+    # Las filas de los bloques se quedan aquí: el worker final solo necesita sus estadísticas
+    filas_bloques = []
+    for bloque in bloques or []:
+        filas_bloques.extend(bloque.movimientos)
+        bloque.movimientos = []
+
+    datos, info_worker = await _ejecutar_en_pool(tiempos, _procesar_pdf, pdf_path, bloques, con_movimientos)
+    info.update(info_worker)
+    if filas_bloques and "movimientos" in info:
+        info["movimientos"].extend(filas_bloques)
+    info["tiempos"].update(tiempos)
+    registro.registrar_extraccion(info)
+    if "ruta_resumen" in info:
+        rutas_resumen[info["ruta_resumen"]] += 1
+    return datos
+
+
+async def _ejecutar_en_pool(tiempos, funcion, *args):
+    """
+    Ejecuta `funcion(*args)` en el pool cuando hay un worker libre, con el tiempo máximo por tarea.
+
+    La tarea corre en un proceso hijo del worker (ver `_con_limite`): si supera
+    el tiempo máximo o muere (un fallo de Ghostscript, el OOM killer), solo se
+    pierde ese hijo y el worker queda libre para la siguiente. Si aun así muere
+    un worker, el pool queda inservible: se reemplaza por uno nuevo y la tarea
+    se reintenta una vez.
+
+    Args:
+        tiempos (dict): Se le suma el tiempo de espera por un worker ("espera_pool").
+        funcion: Función de nivel de módulo (se envía a otro proceso).
+        *args: Argumentos de la función.
+
+    Returns:
+        El resultado de la función.
+
+    Raises:
+        TimeoutError: Si la tarea no termina en `PDF_TIMEOUT` segundos.
+        RuntimeError: Si el proceso que la ejecutaba muere (o el worker, dos veces seguidas).
+    """
+    for intento in range(2):
+        try:
+            return await _ejecutar_una_vez(tiempos, funcion, *args)
+        except BrokenProcessPool:
+            if intento == 0:
+                print("Un worker del pool terminó inesperadamente; se reintenta la tarea.")
+                continue
+            registro.incrementar("fallos_total", etapa="worker")
+            raise RuntimeError("El proceso que extraía el archivo terminó inesperadamente.")
+
+
+async def _ejecutar_una_vez(tiempos, funcion, *args):
+    """Envía una tarea al pool ocupando un cupo hasta que el worker la termine."""
+    iniciar_pool()
+    loop = asyncio.get_running_loop()
+    cupos = _cupos
+    with medir(tiempos, "espera_pool"):
+        await cupos.acquire()
+    # El pool se toma después de la espera: pudo haberse reemplazado mientras tanto
+    pool = iniciar_pool()
+    try:
+        futuro = pool.submit(_con_limite, PDF_TIMEOUT, funcion, *args)
+    except BaseException as e:
+        cupos.release()
+        if isinstance(e, BrokenProcessPool):
+            _descartar_pool(pool)
+        raise
+    futuro.add_done_callback(lambda _: loop.call_soon_threadsafe(cupos.release))
+    try:
+        return await asyncio.wrap_future(futuro)
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        raise
+    except TimeoutError:
+        registro.incrementar("fallos_total", etapa="timeout")
+        raise
+    except _TareaInterrumpida as e:
+        registro.incrementar("fallos_total", etapa="worker")
+        raise RuntimeError(str(e)) from None
+
+
+class _TareaInterrumpida(Exception):
+    """El proceso hijo que ejecutaba una tarea murió sin devolver un resultado."""
+
+
+def _con_limite(limite, funcion, *args):
+    """
+    Ejecuta `funcion(*args)` en un proceso hijo del worker con un tiempo máximo.
+
+    Se ejecuta dentro del worker del pool. El hijo se crea con `fork`, así que
+    hereda los módulos ya importados por la precarga. Si la tarea supera el
+    tiempo máximo, el worker termina solo ese hijo: un worker del pool no se
+    puede terminar sin que `ProcessPoolExecutor` dé por roto el pool entero.
+
+    Args:
+        limite (float): Segundos máximos de la tarea.
+        funcion: Función de nivel de módulo.
+        *args: Argumentos de la función.
+
+    Returns:
+        El resultado de la función.
+
+    Raises:
+        TimeoutError: Si la tarea no termina en `limite` segundos.
+        _TareaInterrumpida: Si el proceso hijo muere sin devolver un resultado.
+    """
+    contexto = multiprocessing.get_context("fork")
+    receptor, emisor = contexto.Pipe(duplex=False)
+    hijo = contexto.Process(target=_ejecutar_en_hijo, args=(emisor, funcion, args), daemon=True)
+    hijo.start()
+    emisor.close()
+    try:
+        # El resultado se lee antes de esperar al hijo: uno grande no cabe en el pipe
+        if not receptor.poll(limite):
+            hijo.kill()
+            raise TimeoutError(f"El procesamiento superó el tiempo máximo de {limite:g} segundos.")
+        try:
+            correcto, valor = receptor.recv()
+        except EOFError:
+            raise _TareaInterrumpida("El proceso que extraía el archivo terminó inesperadamente.")
+    finally:
+        receptor.close()
+        hijo.join()
+    if not correcto:
+        raise valor
+    return valor
+
+
+def _ejecutar_en_hijo(emisor, funcion, args):
+    """Punto de entrada del proceso hijo creado por `_con_limite`."""
+    try:
+        resultado = (True, funcion(*args))
+    except BaseException as e:
+        resultado = (False, e)
+    try:
+        emisor.send(resultado)
+    except Exception as e:
+        # El resultado (o la excepción) no se pudo serializar
+        emisor.send((False, RuntimeError(f"No se pudo enviar el resultado de la tarea: {e}")))
+    finally:
+        emisor.close()
+
+
+async def _extraer_por_bloques(pdf_path, numero_de_paginas, con_movimientos=False):
+    """
+    Reparte las páginas 2 a N de un extracto largo en bloques y los extrae en paralelo.
+
+    Un bloque que falla (o supera el tiempo máximo) no detiene a los demás: sus
+    páginas se reportan en "Paginas con error".
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        numero_de_paginas (int): Número de páginas del PDF.
+        con_movimientos (bool): Si es True, cada bloque conserva sus filas de movimientos.
+
+    Returns:
+        list: Un `AgregadorMovimientos` por bloque, en orden de página.
+    """
+    paginas = list(range(2, numero_de_paginas + 1))
+    grupos = [paginas[i:i + PDF_PAGINAS_POR_BLOQUE] for i in range(0, len(paginas), PDF_PAGINAS_POR_BLOQUE)]
+    print(f"'{pdf_path}' tiene {numero_de_paginas} páginas: se extrae en {len(grupos)} bloques en paralelo.")
+    resultados = await asyncio.gather(
+        *(_ejecutar_en_pool({}, extraer_bloque_movimientos, pdf_path, grupo, None, con_movimientos)
+          for grupo in grupos),
+        return_exceptions=True,
+    )
+
+    bloques = []
+    for grupo, resultado in zip(grupos, resultados):
+        if isinstance(resultado, Exception):
+            print(f"Falló el bloque de páginas {grupo[0]}-{grupo[-1]}: {resultado}")
+            registro.incrementar("fallos_total", etapa="bloque_paginas")
+            agregador = AgregadorMovimientos()
+            agregador.paginas = len(grupo)
+            agregador.paginas_fallidas = list(grupo)
+        else:
+            agregador, info_bloque = resultado
+            registro.registrar_extraccion(info_bloque)
+        bloques.append(agregador)
+    return bloques
+
+
+def estadisticas_resumen():
+    """
+    Retorna cuántas tablas de resumen se extrajeron por cada ruta.
+
+    Returns:
+        dict: Conteo por ruta y tasa de aciertos de la capa de texto.
+    """
+    total = sum(rutas_resumen.values())
+    return {
+        "rutas": dict(rutas_resumen),
+        "tasa_capa_texto": rutas_resumen[RUTA_TEXTO] / total if total else 0.0,
+    }
+
+
+def _procesar_pdf(pdf_path, bloques=None, con_movimientos=False):
+    """Punto de entrada ejecutado dentro de cada proceso del pool."""
+    info = {"tiempos": {}}
+    with medir(info["tiempos"], "process_pdf"):
+        datos = process_pdf(pdf_path=pdf_path, info=info, bloques=bloques, con_movimientos=con_movimientos)
+    return datos, info
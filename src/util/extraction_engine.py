@@ -0,0 +1,184 @@
+"""
+Motor de extracción de tablas que analiza cada página del PDF una sola vez.
+
+`camelot.read_pdf` vuelve a abrir el PDF y a generar el layout de cada página
+en cada llamada. Cuando de una misma página se recortan varias regiones
+(resumen y movimientos de la página 1) o cuando se procesan muchas páginas,
+casi todo el tiempo se va en repetir ese análisis. Este motor abre el PDF una
+vez, genera el layout de cada página una sola vez y aplica sobre ese layout
+en caché todas las regiones (`area`/`columns`) configuradas.
+
+Dependencias requeridas:
+- camelot-py: Se reutilizan su análisis de layout y su parser `Stream`. El
+  motor usa APIs internas de camelot (`PDFHandler._get_layout`,
+  `Stream.prepare_page_parse`, `camelot.plotting._HAS_MPL` y `plt`), por eso
+  `requirements.txt` fija la versión a la serie 2.0.x; al subirla hay que
+  revisar que sigan existiendo con la misma firma.
+- playa-pdf: Lector de PDF usado internamente por camelot.
+
+"""
+
+import importlib.abc
+import sys
+
+
+class _BloqueadorMatplotlib(importlib.abc.MetaPathFinder):
+    """Hace que `import matplotlib` falle mientras camelot se importa sin gráficos."""
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname == "matplotlib" or fullname.startswith("matplotlib."):
+            raise ImportError(f"{fullname} no se carga fuera del modo de visualización")
+        return None
+
+
+def importar_camelot(con_graficos=False):
+    """
+    Importa camelot, dejando matplotlib por fuera salvo que se pidan gráficos.
+
+    El paquete camelot importa matplotlib al cargarse (más de la mitad de su
+    tiempo de importación) aunque solo lo usa para `camelot.plot`. Sin gráficos,
+    se importa con matplotlib bloqueado; camelot lo tolera y desactiva sus
+    gráficos. Si luego se piden gráficos, se importan y se reactivan.
+
+    Args:
+        con_graficos (bool): Si es True, deja `camelot.plot` listo para usarse.
+
+    Returns:
+        module: El módulo camelot.
+    """
+    if "camelot" not in sys.modules and not con_graficos:
+        bloqueador = _BloqueadorMatplotlib()
+        sys.meta_path.insert(0, bloqueador)
+        try:
+            import camelot
+        finally:
+            sys.meta_path.remove(bloqueador)
+    import camelot
+    import camelot.plotting
+    if con_graficos and not camelot.plotting._HAS_MPL:
+        import matplotlib.patches
+        import matplotlib.pyplot
+        camelot.plotting.patches = matplotlib.patches
+        camelot.plotting.plt = matplotlib.pyplot
+        camelot.plotting._HAS_MPL = True
+    return camelot
+
+
+class MotorExtraccion:
+    """
+    Abre un PDF una sola vez y extrae regiones de sus páginas reutilizando el layout.
+
+    Se usa como administrador de contexto:
+
+        with MotorExtraccion("extracto.pdf") as motor:
+            resumen = motor.extraer(1, ['0,500,600,450'], ['110,190,300,410,490'])
+
+    Attributes:
+        pdf_path (str): Ruta al archivo PDF.
+        aperturas (int): Veces que se abrió y parseó el PDF (debe ser 1).
+        layouts_generados (int): Número de páginas cuyo layout se analizó.
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.aperturas = 0
+        self.layouts_generados = 0
+        self._handler = None
+        self._pdf = None
+        self._layouts = {}
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cerrar()
+
+    def abrir(self):
+        """Abre el PDF si aún no está abierto."""
+        if self._pdf is not None:
+            return
+        # Importación diferida: camelot tarda cerca de un segundo en importarse
+        importar_camelot()
+        import playa
+        from camelot.handlers import PDFHandler
+        self._handler = PDFHandler(self.pdf_path)
+        self._pdf = playa.open(self._handler.filepath, space="page")
+        self.aperturas += 1
+
+    def cerrar(self):
+        """Cierra el PDF y libera los layouts en caché."""
+        self._layouts.clear()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._handler is not None:
+            self._handler.close()
+            self._handler = None
+
+    @property
+    def numero_de_paginas(self):
+        """int: Número de páginas del PDF."""
+        self.abrir()
+        return len(self._pdf.pages)
+
+    def _layout(self, page):
+        """
+        Devuelve el layout de una página, generándolo solo la primera vez.
+
+        Args:
+            page (int): Número de la página (empezando en 1).
+
+        Returns:
+            tuple: (layout, dimensiones, imágenes, texto horizontal, texto vertical, rotación).
+        """
+        if page not in self._layouts:
+            self.abrir()
+            pagina = self._pdf.pages[page - 1]
+            layout, dimensions, images, _chars, horizontal_text, vertical_text, rotation = (
+                self._handler._get_layout(pagina)
+            )
+            self._layouts[page] = (layout, dimensions, images, horizontal_text, vertical_text, rotation)
+            self.layouts_generados += 1
+        return self._layouts[page]
+
+    def extraer(self, page, table_area, columns):
+        """
+        Extrae las tablas de una región de una página usando el layout en caché.
+
+        Equivale a `camelot.read_pdf(pdf, flavor='stream', pages=page,
+        table_areas=table_area, columns=columns)` pero sin volver a parsear el PDF.
+
+        Args:
+            page (int | str): Número de la página (empezando en 1).
+            table_area (list): Lista con una cadena que define el área de la tabla (ej. ['x1,y1,x2,y2']).
+            columns (list): Lista con una cadena de las posiciones de las columnas (ej. ['c1,c2,c3...']).
+
+        Returns:
+            list: Lista de `camelot.core.Table` encontradas en la región.
+        """
+        from camelot.parsers import Stream
+        page = int(page)
+        layout, dimensions, images, horizontal_text, vertical_text, rotation = self._layout(page)
+        parser = Stream(table_areas=table_area, columns=columns)
+        parser.prepare_page_parse(
+            self._handler.filepath,
+            layout,
+            dimensions,
+            page,
+            images,
+            horizontal_text,
+            vertical_text,
+            rotation,
+            layout_kwargs={},
+        )
+        return parser.extract_tables()
+
+    def liberar_pagina(self, page):
+        """
+        Descarta el layout en caché de una página que ya no se va a usar.
+
+        Args:
+            page (int | str): Número de la página (empezando en 1).
+        """
+        self._layouts.pop(int(page), None)
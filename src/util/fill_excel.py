@@ -1,6 +1,8 @@
-from openpyxl import Workbook, load_workbook
+from io import BytesIO
 import shutil
 import os
+from src.util.metrics import registro
+from src.util.xlsx_patch import PlantillaXlsx
 
 def escribir_en_excel(ruta_archivo, nombre_hoja, celda, valor):
     """
@@ -12,6 +14,8 @@ def escribir_en_excel(ruta_archivo, nombre_hoja, celda, valor):
         celda (str): La celda de destino (ej. 'A1', 'B5').
         valor: El valor que se va a escribir en la celda.
     """
+    from openpyxl import Workbook, load_workbook
+
     try:
         # Cargar el libro de trabajo si existe. Si no, crear uno nuevo.
         try:
@@ -58,6 +62,8 @@ def es_celda_vacia(ruta_archivo, nombre_hoja, celda):
     Returns:
         bool: True si la celda está vacía, False si contiene un valor.
     """
+    from openpyxl import load_workbook
+
     try:
         # Cargar el libro de trabajo
         libro = load_workbook(ruta_archivo)
@@ -150,39 +156,178 @@ def borrar_archivo_si_existe(ruta_archivo):
 # borrar_archivo_si_existe(archivo_a_borrar)
 
 
-def fill_excel(results):
-    row=3
-    saldo_inicial=["I",row]
-    movimiento_de_ingresos_en_pesos=["J",row]
-    movimiento_de_egresos_en_pesos=["K",row]
-    saldo_en_pesos_al_final_de_mes_segun_tesoreria=["L",row]
-    valor_de_movimiento_maximo_en_el_mes_en_pesos=["M",row]
-
-    borrar_archivo_si_existe(r"src\template_excel\Inf SIVICOF_PLANTILLA.xlsx")
-    copiar_y_renombrar_excel(r"src\template_excel\1Inf SIVICOF_PLANTILLA.xlsx",r"src\template_excel\Inf SIVICOF_PLANTILLA.xlsx")
-    for length in range(len(results)):
-        if(es_celda_vacia(r"src\template_excel\Inf SIVICOF_PLANTILLA.xlsx","14233 CB-0115  INFORME SOBR...",str(saldo_inicial[0]+str(saldo_inicial[1])))):
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(saldo_inicial[0]+str(saldo_inicial[1])), results[length]['data']['SALDO ANTERIOR'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(movimiento_de_ingresos_en_pesos[0]+str(movimiento_de_ingresos_en_pesos[1])), results[length]['data']['TOTAL ABONOS'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(movimiento_de_egresos_en_pesos[0]+str(movimiento_de_egresos_en_pesos[1])), results[length]['data']['TOTAL CARGOS'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(saldo_en_pesos_al_final_de_mes_segun_tesoreria[0]+str(saldo_en_pesos_al_final_de_mes_segun_tesoreria[1])), results[length]['data']['SALDO ACTUAL'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(valor_de_movimiento_maximo_en_el_mes_en_pesos[0]+str(valor_de_movimiento_maximo_en_el_mes_en_pesos[1])), results[length]['data']['Valor de movimiento maximo en el mes en pesos'])
-            saldo_inicial[1]+=1
-            movimiento_de_ingresos_en_pesos[1]+=1
-            movimiento_de_egresos_en_pesos[1]+=1
-            saldo_en_pesos_al_final_de_mes_segun_tesoreria[1]+=1
-            valor_de_movimiento_maximo_en_el_mes_en_pesos[1]+=1
+PLANTILLA_EXCEL = os.path.join("src", "template_excel", "1Inf SIVICOF_PLANTILLA.xlsx")
+SALIDA_EXCEL = os.path.join("src", "template_excel", "Inf SIVICOF_PLANTILLA.xlsx")
+HOJA_SIVICOF = "14233 CB-0115  INFORME SOBR..."
+FILA_INICIAL_SIVICOF = 3
+
+# Motor de `fill_excel_en_memoria`: "xml" edita solo la hoja SIVICOF dentro del ZIP
+# (ver `xlsx_patch`); "openpyxl" carga y guarda el libro completo
+EXCEL_MOTOR = os.getenv("EXCEL_MOTOR", "xml")
+
+# Columna de la hoja SIVICOF -> llave del diccionario que retorna `process_pdf`
+COLUMNAS_SIVICOF = [
+    ("I", "SALDO ANTERIOR"),  # Saldo inicial
+    ("J", "TOTAL ABONOS"),  # Movimiento de ingresos en pesos
+    ("K", "TOTAL CARGOS"),  # Movimiento de egresos en pesos
+    ("L", "SALDO ACTUAL"),  # Saldo en pesos al final de mes según tesorería
+    ("M", "Valor de movimiento maximo en el mes en pesos"),
+]
+
+
+def _celda_vacia(hoja, celda):
+    """
+    Verifica si una celda de una hoja ya cargada en memoria está vacía.
+
+    Args:
+        hoja: La hoja de cálculo de openpyxl (o `HojaXml`).
+        celda (str): La celda a verificar (ej. 'A1', 'B5').
+
+    Returns:
+        bool: True si la celda está vacía, False si contiene un valor.
+    """
+    valor_celda = hoja[celda].value
+    return valor_celda is None or (isinstance(valor_celda, str) and valor_celda.strip() == "")
+
+
+def escribir_resultados(hoja, results, fila_inicial=FILA_INICIAL_SIVICOF):
+    """
+    Escribe en memoria una fila por cada PDF procesado en la hoja SIVICOF.
+
+    Si la fila actual ya tiene un saldo inicial, se escribe en la siguiente,
+    igual que lo hacía el llenado celda por celda sobre el archivo.
+    Los resultados con error (sin datos extraídos) o sin alguna de las llaves de
+    `COLUMNAS_SIVICOF` se omiten.
+
+    Args:
+        hoja: La hoja de cálculo de openpyxl (o `HojaXml`).
+        results (list): Lista de diccionarios {"filename", "data"} o {"filename", "error"}.
+        fila_inicial (int): Primera fila de datos de la plantilla.
+
+    Returns:
+        int: Número de filas escritas.
+    """
+    fila = fila_inicial
+    escritas = 0
+    for result in results:
+        data = result.get("data")
+        if not data or "error" in data:
+            print(f"Se omite '{result.get('filename')}' en el Excel: no tiene datos extraídos.")
+            continue
+        faltantes = [llave for _, llave in COLUMNAS_SIVICOF if llave not in data]
+        if faltantes:
+            print(f"Se omite '{result.get('filename')}' en el Excel: le faltan {', '.join(faltantes)}.")
+            continue
+        if _celda_vacia(hoja, f"{COLUMNAS_SIVICOF[0][0]}{fila}"):
+            fila_destino = fila
+            fila += 1
         else:
-            saldo_inicial[1]+=1
-            movimiento_de_ingresos_en_pesos[1]+=1
-            movimiento_de_egresos_en_pesos[1]+=1
-            saldo_en_pesos_al_final_de_mes_segun_tesoreria[1]+=1
-            valor_de_movimiento_maximo_en_el_mes_en_pesos[1]+=1
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(saldo_inicial[0]+str(saldo_inicial[1])), results[length]['data']['SALDO ANTERIOR'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(movimiento_de_ingresos_en_pesos[0]+str(movimiento_de_ingresos_en_pesos[1])), results[length]['data']['TOTAL ABONOS'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(movimiento_de_egresos_en_pesos[0]+str(movimiento_de_egresos_en_pesos[1])), results[length]['data']['TOTAL CARGOS'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(saldo_en_pesos_al_final_de_mes_segun_tesoreria[0]+str(saldo_en_pesos_al_final_de_mes_segun_tesoreria[1])), results[length]['data']['SALDO ACTUAL'])
-            escribir_en_excel(r'src\template_excel\Inf SIVICOF_PLANTILLA.xlsx',"14233 CB-0115  INFORME SOBR...", str(valor_de_movimiento_maximo_en_el_mes_en_pesos[0]+str(valor_de_movimiento_maximo_en_el_mes_en_pesos[1])), results[length]['data']['Valor de movimiento maximo en el mes en pesos'])
-        
-    output_path = r"src/template_excel/Inf SIVICOF_PLANTILLA.xlsx"
-    return output_path
+            fila += 1
+            fila_destino = fila
+        for columna, llave in COLUMNAS_SIVICOF:
+            hoja[f"{columna}{fila_destino}"] = data[llave]
+        escritas += 1
+    return escritas
+
+
+def _hoja_sivicof(libro):
+    """Retorna la hoja SIVICOF del libro, creándola si no existe."""
+    if HOJA_SIVICOF in libro.sheetnames:
+        return libro[HOJA_SIVICOF]
+    print(f"La hoja '{HOJA_SIVICOF}' no existe. Creando una nueva.")
+    return libro.create_sheet(HOJA_SIVICOF)
+
+
+def fill_excel(results, ruta_plantilla=PLANTILLA_EXCEL, ruta_salida=SALIDA_EXCEL):
+    """
+    Llena la plantilla SIVICOF con los resultados de un lote de PDFs.
+
+    La plantilla se carga una sola vez, todas las filas se escriben en memoria y
+    el libro se guarda una sola vez en `ruta_salida`.
+
+    Args:
+        results (list): Lista de diccionarios {"filename", "data"} o {"filename", "error"}.
+        ruta_plantilla (str): Ruta de la plantilla SIVICOF original.
+        ruta_salida (str): Ruta donde se guarda el Excel diligenciado.
+
+    Returns:
+        str: La ruta del Excel generado.
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta_plantilla)
+    escritas = escribir_resultados(_hoja_sivicof(libro), results)
+    libro.save(ruta_salida)
+    print(f"{escritas} filas escritas en la hoja '{HOJA_SIVICOF}' de '{ruta_salida}'.")
+    return ruta_salida
+
+
+_plantilla_bytes = None
+_plantilla_xlsx = None
+
+
+def cargar_plantilla(ruta_plantilla=PLANTILLA_EXCEL):
+    """
+    Lee la plantilla SIVICOF a memoria una sola vez.
+
+    Con el motor "xml" también prepara la plantilla para editar la hoja SIVICOF
+    directamente. Si la hoja no existe se usa openpyxl, que la crea.
+
+    Args:
+        ruta_plantilla (str): Ruta de la plantilla SIVICOF original.
+
+    Returns:
+        bytes: El contenido de la plantilla.
+    """
+    global _plantilla_bytes, _plantilla_xlsx
+    if _plantilla_bytes is None:
+        with open(ruta_plantilla, "rb") as archivo:
+            contenido = archivo.read()
+        if EXCEL_MOTOR == "xml":
+            try:
+                _plantilla_xlsx = PlantillaXlsx(contenido, HOJA_SIVICOF)
+            except KeyError as e:
+                print(f"No se puede editar la plantilla sin openpyxl: {e}")
+        _plantilla_bytes = contenido
+        print(f"Plantilla SIVICOF cargada en memoria ({len(_plantilla_bytes)} bytes).")
+    return _plantilla_bytes
+
+
+def fill_excel_en_memoria(results, tiempos=None):
+    """
+    Llena una copia en memoria de la plantilla SIVICOF y retorna el libro resultante.
+
+    No lee ni escribe archivos en disco, así que varias peticiones pueden
+    generar su Excel al mismo tiempo sin pisarse. Con el motor "xml" solo se
+    reescribe la hoja SIVICOF; el libro se ve en Excel igual que el que genera
+    `fill_excel`.
+
+    Args:
+        results (list): Lista de diccionarios {"filename", "data"} o {"filename", "error"}.
+        tiempos (dict): Si se indica, se llena con la duración de la carga, la
+                        escritura y el guardado del libro.
+
+    Returns:
+        bytes: El contenido del Excel diligenciado.
+    """
+    with registro.tramo("excel_carga", tiempos):
+        contenido = cargar_plantilla()
+        if _plantilla_xlsx is not None:
+            hoja = _plantilla_xlsx.hoja()
+        else:
+            from openpyxl import load_workbook
+
+            libro = load_workbook(BytesIO(contenido))
+            hoja = _hoja_sivicof(libro)
+    with registro.tramo("excel_escritura", tiempos):
+        escritas = escribir_resultados(hoja, results)
+    with registro.tramo("excel_guardado", tiempos):
+        if _plantilla_xlsx is not None:
+            contenido = _plantilla_xlsx.generar(hoja)
+        else:
+            buffer = BytesIO()
+            libro.save(buffer)
+            contenido = buffer.getvalue()
+    registro.incrementar("filas_excel_total", escritas)
+    print(f"{escritas} filas escritas en la hoja '{HOJA_SIVICOF}' ({len(contenido)} bytes en memoria).")
+    return contenido
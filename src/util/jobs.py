@@ -0,0 +1,230 @@
+"""
+Trabajos asíncronos para lotes grandes de extractos.
+
+`POST /upload/` mantiene abierta la conexión hasta terminar todo el lote, lo que
+provoca timeouts en los proxies con lotes grandes. Con los trabajos, el cliente
+envía los archivos, recibe un id de inmediato y luego consulta el estado o
+escucha el progreso por Server-Sent Events.
+
+Los trabajos esperan en una cola acotada y los atiende un número fijo de
+workers, de modo que la carga la controla el servidor y no la duración de las
+peticiones HTTP. Un trabajo guarda sus PDFs en memoria desde que se envía, así
+que `POST /jobs/` reserva cupo en el control de admisión de `/upload/` y lo
+devuelve cuando el trabajo termina.
+
+Configuración (variables de entorno):
+- JOBS_MAX_COLA: Trabajos que pueden esperar en cola (por defecto 20).
+- JOBS_WORKERS: Trabajos que se procesan a la vez (por defecto 2).
+- JOBS_TTL: Segundos que se conserva un trabajo terminado (por defecto 3600).
+
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+JOBS_MAX_COLA = int(os.getenv("JOBS_MAX_COLA", "20"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_TTL = float(os.getenv("JOBS_TTL", "3600"))
+
+EN_COLA = "en_cola"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+
+
+class ColaLlena(Exception):
+    """La cola de trabajos no admite más trabajos por ahora."""
+
+
+class Trabajo:
+    """
+    Estado y progreso de un lote de PDFs enviado como trabajo.
+
+    Attributes:
+        id (str): Identificador del trabajo.
+        estado (str): EN_COLA, PROCESANDO, COMPLETADO o FALLIDO.
+        archivos (list): Lista de tuplas (filename, contenido) pendientes de procesar.
+        resultados (list): Resultados por archivo, en el orden en que se enviaron.
+        excel (str): Id del Excel en memoria generado cuando el trabajo termina.
+        error (str): Mensaje de error si el trabajo falló.
+        eventos (list): Historial de eventos de progreso.
+        al_terminar (function): Se llama una vez cuando el trabajo termina (ej. para liberar cupo).
+    """
+
+    def __init__(self, archivos, al_terminar=None):
+        self.id = uuid.uuid4().hex
+        self.estado = EN_COLA
+        self.archivos = archivos
+        self.nombres = [filename for filename, _ in archivos]
+        self.resultados = [None] * len(archivos)
+        self.procesados = 0
+        self.excel = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+        self.eventos = []
+        self.al_terminar = al_terminar
+        self._cambio = asyncio.Condition()
+
+    @property
+    def finalizado(self):
+        return self.estado in (COMPLETADO, FALLIDO)
+
+    async def publicar(self, tipo, **datos):
+        """Agrega un evento de progreso y despierta a quienes lo estén escuchando."""
+        evento = {"evento": tipo, "job_id": self.id, "estado": self.estado,
+                  "procesados": self.procesados, "total": len(self.nombres), **datos}
+        async with self._cambio:
+            self.eventos.append(evento)
+            self._cambio.notify_all()
+
+    async def escuchar(self):
+        """
+        Genera los eventos del trabajo, desde el primero, hasta que termina.
+
+        Yields:
+            dict: Cada evento de progreso.
+        """
+        indice = 0
+        while True:
+            async with self._cambio:
+                await self._cambio.wait_for(lambda: indice < len(self.eventos) or self.finalizado)
+                pendientes = self.eventos[indice:]
+                indice = len(self.eventos)
+                finalizado = self.finalizado
+            for evento in pendientes:
+                yield evento
+            if finalizado and indice == len(self.eventos):
+                return
+
+    def resumen(self):
+        """
+        Retorna el estado del trabajo para la API.
+
+        Returns:
+            dict: Estado, progreso y resultados disponibles.
+        """
+        return {
+            "job_id": self.id,
+            "estado": self.estado,
+            "total": len(self.nombres),
+            "procesados": self.procesados,
+            "resultados": [r for r in self.resultados if r is not None],
+            "excel_disponible": self.estado == COMPLETADO and self.excel is not None,
+            "error": self.error,
+        }
+
+
+class GestorTrabajos:
+    """
+    Cola acotada de trabajos atendida por un número fijo de workers.
+
+    Args:
+        procesar_archivo: Corrutina `(filename, contenido) -> dict` que procesa un PDF.
+        generar_excel: Corrutina `(results, excel_id, ttl=...) -> str` que genera el Excel del
+                       trabajo y lo conserva `ttl` segundos.
+        max_cola (int): Trabajos que pueden esperar en cola.
+        workers (int): Trabajos que se procesan a la vez.
+        ttl (float): Segundos que se conserva un trabajo terminado.
+    """
+
+    def __init__(self, procesar_archivo, generar_excel, max_cola=JOBS_MAX_COLA, workers=JOBS_WORKERS, ttl=JOBS_TTL):
+        self.procesar_archivo = procesar_archivo
+        self.generar_excel = generar_excel
+        self.max_cola = max_cola
+        self.num_workers = workers
+        self.ttl = ttl
+        self.trabajos = {}
+        self._cola = None
+        self._workers = []
+
+    async def iniciar(self):
+        """Crea la cola y lanza los workers."""
+        if self._cola is not None:
+            return
+        self._cola = asyncio.Queue(maxsize=self.max_cola)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def detener(self):
+        """Cancela los workers; los trabajos en cola se descartan."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._cola = None
+
+    def enviar(self, archivos, al_terminar=None):
+        """
+        Encola un nuevo trabajo.
+
+        Args:
+            archivos (list): Lista de tuplas (filename, contenido).
+            al_terminar (function): Si se indica, se llama cuando el trabajo termina.
+
+        Returns:
+            Trabajo: El trabajo creado.
+
+        Raises:
+            ColaLlena: Si la cola ya tiene `max_cola` trabajos esperando.
+        """
+        self._purgar()
+        trabajo = Trabajo(archivos, al_terminar)
+        try:
+            self._cola.put_nowait(trabajo)
+        except asyncio.QueueFull:
+            raise ColaLlena(f"Hay {self.max_cola} trabajos en cola. Intente más tarde.")
+        self.trabajos[trabajo.id] = trabajo
+        return trabajo
+
+    def obtener(self, job_id):
+        """Retorna el trabajo con ese id, o None si no existe o ya expiró."""
+        return self.trabajos.get(job_id)
+
+    def en_cola(self):
+        """int: Número de trabajos esperando a un worker."""
+        return self._cola.qsize() if self._cola is not None else 0
+
+    async def _worker(self):
+        while True:
+            trabajo = await self._cola.get()
+            try:
+                await self._ejecutar(trabajo)
+            finally:
+                self._cola.task_done()
+
+    async def _ejecutar(self, trabajo):
+        trabajo.estado = PROCESANDO
+        await trabajo.publicar("inicio")
+
+        async def procesar(indice, filename, contenido):
+            resultado = await self.procesar_archivo(filename, contenido)
+            trabajo.resultados[indice] = resultado
+            trabajo.procesados += 1
+            await trabajo.publicar("archivo", resultado=resultado)
+
+        try:
+            await asyncio.gather(*(procesar(i, filename, contenido)
+                                   for i, (filename, contenido) in enumerate(trabajo.archivos)))
+            # El contenido de los PDFs ya no se necesita
+            trabajo.archivos = []
+            trabajo.excel = await self.generar_excel(trabajo.resultados, trabajo.id, ttl=self.ttl)
+            trabajo.estado = COMPLETADO
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = FALLIDO
+        finally:
+            trabajo.archivos = []
+            if trabajo.al_terminar is not None:
+                trabajo.al_terminar()
+                trabajo.al_terminar = None
+        trabajo.terminado = time.time()
+        await trabajo.publicar("fin", error=trabajo.error)
+
+    def _purgar(self):
+        """Elimina los trabajos terminados hace más de `ttl` segundos."""
+        limite = time.time() - self.ttl
+        for job_id, trabajo in list(self.trabajos.items()):
+            if trabajo.finalizado and trabajo.terminado < limite:
+                del self.trabajos[job_id]
@@ -0,0 +1,235 @@
+"""
+Registro de formatos (layouts) de extracto bancario y detección automática del formato.
+
+Las coordenadas de cada formato (área y columnas del resumen, de los
+movimientos de la página 1 y de las páginas siguientes) se declaran en un
+archivo JSON por banco en `src/layouts/`. El registro se carga y valida una
+sola vez por proceso; para soportar otro banco basta con agregar su archivo.
+
+Antes de cualquier trabajo con camelot, el formato de un PDF se detecta a
+partir del texto de la página 1: cada formato declara una `huella` (textos que
+deben aparecer en esa página) y se elige el formato cuya huella completa
+aparece, prefiriendo la más específica (la de más textos).
+
+Configuración (variables de entorno):
+- LAYOUTS_DIRECTORIO: Directorio de los archivos de formato (por defecto 'src/layouts').
+- LAYOUT_POR_DEFECTO: Formato que se usa si ninguna huella coincide (por
+  defecto 'bancolombia'). Si se deja vacío, esos PDFs se rechazan sin extraerlos.
+
+"""
+
+import hashlib
+import json
+import os
+import re
+
+LAYOUTS_DIRECTORIO = os.getenv(
+    "LAYOUTS_DIRECTORIO", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "layouts"))
+LAYOUT_POR_DEFECTO = os.getenv("LAYOUT_POR_DEFECTO", "bancolombia")
+
+_layouts = None
+_version = None
+
+
+class LayoutNoReconocido(Exception):
+    """El texto de la página 1 no coincide con ningún formato registrado."""
+
+
+def _normalizar(texto):
+    """Pasa a mayúsculas y quita los espacios, que la capa de texto no siempre conserva."""
+    return "".join(texto.split()).upper()
+
+
+class Layout:
+    """
+    Coordenadas de extracción de un formato de extracto.
+
+    Attributes:
+        nombre (str): Identificador del formato (ej. "bancolombia").
+        descripcion (str): Descripción del formato.
+        huella (list): Textos que deben aparecer en la página 1 (normalizados con `_normalizar`).
+        resumen (dict): "area" y "columnas" de la tabla de resumen (página 1).
+        movimientos_pagina_1 (dict): "area" y "columnas" de los movimientos de la página 1.
+        movimientos_paginas (dict): "area" y "columnas" de los movimientos de las páginas 2 a N.
+        columnas_movimiento (dict): Índice de las columnas "fecha", "descripcion" y "valor".
+        identificacion (dict): Expresiones regulares opcionales "cuenta", "desde" y "hasta"
+                               (fechas AAAA/MM/DD) que se buscan en el texto de la página 1;
+                               el primer grupo de cada una es el valor.
+    """
+
+    CAMPOS_IDENTIFICACION = ("cuenta", "desde", "hasta")
+
+    REGIONES = ("resumen", "movimientos_pagina_1", "movimientos_paginas")
+
+    def __init__(self, datos, origen="<dict>"):
+        try:
+            self.nombre = datos["nombre"]
+            self.descripcion = datos.get("descripcion", "")
+            self.huella = [_normalizar(texto) for texto in datos["huella"]]
+            for region in self.REGIONES:
+                area, columnas = datos[region]["area"], datos[region]["columnas"]
+                if len(area.split(",")) != 4:
+                    raise ValueError(f"el área de '{region}' debe tener 4 coordenadas")
+                for valor in area.split(",") + columnas.split(","):
+                    float(valor)
+                setattr(self, region, {"area": area, "columnas": columnas})
+            self.columnas_movimiento = {
+                campo: int(datos["columnas_movimiento"][campo]) for campo in ("fecha", "descripcion", "valor")
+            }
+            self.identificacion = {
+                campo: re.compile(patron) for campo, patron in datos.get("identificacion", {}).items()
+                if campo in self.CAMPOS_IDENTIFICACION
+            }
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise ValueError(f"El formato '{origen}' no es válido: {e}") from e
+
+    def config(self, region, page, title):
+        """
+        Retorna la configuración de una región con la forma que usa `extract_table`.
+
+        Args:
+            region (str): Una de `REGIONES`.
+            page (int | str): Número de la página.
+            title (str): Título para mensajes y visualización.
+
+        Returns:
+            dict: {"title", "page", "area", "columns"}.
+        """
+        coordenadas = getattr(self, region)
+        return {"title": title, "page": str(page), "area": [coordenadas["area"]],
+                "columns": [coordenadas["columnas"]]}
+
+    def coincide(self, texto):
+        """
+        Indica si el texto de la página 1 contiene toda la huella del formato.
+
+        Args:
+            texto (str): Texto de la página 1 normalizado con `_normalizar`.
+
+        Returns:
+            bool: True si todos los textos de la huella aparecen.
+        """
+        return all(fragmento in texto for fragmento in self.huella)
+
+    def identificar(self, texto):
+        """
+        Busca la cuenta y el periodo del extracto en el texto de la página 1.
+
+        Args:
+            texto (str): Texto de la página 1, sin normalizar.
+
+        Returns:
+            dict: "cuenta", "desde" y "hasta" (las fechas en formato AAAA-MM-DD);
+                  None en los campos que no se encuentran.
+        """
+        identificacion = dict.fromkeys(self.CAMPOS_IDENTIFICACION)
+        for campo, patron in self.identificacion.items():
+            coincidencia = patron.search(texto)
+            if coincidencia:
+                identificacion[campo] = coincidencia.group(1).strip()
+        for campo in ("desde", "hasta"):
+            if identificacion[campo]:
+                identificacion[campo] = identificacion[campo].replace("/", "-")
+        return identificacion
+
+
+def cargar_layouts(directorio=LAYOUTS_DIRECTORIO):
+    """
+    Carga y valida los formatos del directorio, solo la primera vez.
+
+    Args:
+        directorio (str): Directorio con un archivo JSON por formato.
+
+    Returns:
+        dict: Nombre -> Layout.
+
+    Raises:
+        ValueError: Si algún archivo no es un formato válido.
+    """
+    global _layouts, _version
+    if _layouts is None:
+        layouts = {}
+        resumen_archivos = hashlib.sha256()
+        for archivo in sorted(os.listdir(directorio)):
+            if not archivo.endswith(".json"):
+                continue
+            ruta = os.path.join(directorio, archivo)
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            resumen_archivos.update(archivo.encode() + b"\0" + contenido)
+            layout = Layout(json.loads(contenido), origen=archivo)
+            layouts[layout.nombre] = layout
+        if LAYOUT_POR_DEFECTO and LAYOUT_POR_DEFECTO not in layouts:
+            raise ValueError(f"El formato por defecto '{LAYOUT_POR_DEFECTO}' no está en '{directorio}'.")
+        _layouts = layouts
+        _version = resumen_archivos.hexdigest()[:12]
+        print(f"{len(layouts)} formatos de extracto cargados: {', '.join(layouts)}.")
+    return _layouts
+
+
+def version_layouts():
+    """
+    Retorna una huella del contenido de todos los formatos registrados.
+
+    Cambia cuando se edita, agrega o elimina un formato, así que sirve para
+    invalidar los resultados guardados en la caché de extracciones.
+
+    Returns:
+        str: Los primeros 12 caracteres del SHA-256 de los archivos de formato.
+    """
+    cargar_layouts()
+    return _version
+
+
+def obtener_layout(nombre):
+    """
+    Retorna un formato registrado por su nombre.
+
+    Args:
+        nombre (str): Nombre del formato.
+
+    Returns:
+        Layout: El formato.
+
+    Raises:
+        KeyError: Si el formato no existe.
+    """
+    return cargar_layouts()[nombre]
+
+
+def layout_por_defecto():
+    """
+    Retorna el formato que se usa cuando el de un PDF no se puede detectar.
+
+    Returns:
+        Layout: El formato `LAYOUT_POR_DEFECTO`.
+
+    Raises:
+        LayoutNoReconocido: Si no hay formato por defecto.
+    """
+    if not LAYOUT_POR_DEFECTO:
+        raise LayoutNoReconocido("El extracto no coincide con ningún formato registrado.")
+    return obtener_layout(LAYOUT_POR_DEFECTO)
+
+
+def detectar_layout(texto_pagina_1):
+    """
+    Elige el formato de un extracto a partir del texto de su página 1.
+
+    Args:
+        texto_pagina_1 (str): Texto de la página 1.
+
+    Returns:
+        Layout: El formato cuya huella coincide (la más específica si hay varias),
+                o el formato por defecto si ninguna coincide.
+
+    Raises:
+        LayoutNoReconocido: Si ninguna huella coincide y no hay formato por defecto.
+    """
+    texto = _normalizar(texto_pagina_1)
+    candidatos = [layout for layout in cargar_layouts().values() if layout.coincide(texto)]
+    if candidatos:
+        return max(candidatos, key=lambda layout: len(layout.huella))
+    layout = layout_por_defecto()
+    print(f"Ningún formato coincide con la página 1; se usa '{layout.nombre}'.")
+    return layout
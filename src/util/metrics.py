@@ -0,0 +1,217 @@
+"""
+Métricas de rendimiento del servicio en formato Prometheus.
+
+Cada etapa del procesamiento (conteo de páginas, extracción del resumen y de
+los movimientos, agregación, carga, escritura y guardado de la plantilla
+SIVICOF, guardado en el almacén de extractos...) se mide como un
+tramo y se acumula en un histograma por etapa. Además se cuentan los PDFs,
+páginas, tablas, filas y fallos, y se publican indicadores del control de
+admisión de `/upload/` (peticiones en cola, archivos y bytes en curso).
+
+`process_pdf` corre en los procesos del pool, donde este registro no es el del
+servidor. Por eso allí los tiempos y contadores solo se acumulan en el
+diccionario `info` (con `medir` y `contar`), y el proceso principal los
+incorpora al registro con `registro.registrar_extraccion(info)`.
+
+El registro se expone en `GET /metrics`.
+
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (en segundos) de los buckets de los histogramas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PREFIJO = "sivicof_"
+
+# Nombre -> (tipo, descripción) de las métricas que se exportan
+METRICAS = {
+    "etapa_segundos": ("histogram", "Duración de cada etapa del procesamiento."),
+    "pdfs_total": ("counter", "PDFs recibidos, por resultado (ok, error, cache)."),
+    "paginas_total": ("counter", "Páginas de PDF procesadas."),
+    "tablas_total": ("counter", "Tablas extraídas de los PDFs."),
+    "filas_total": ("counter", "Filas de movimientos extraídas."),
+    "fallos_total": ("counter", "Fallos por etapa."),
+    "filas_excel_total": ("counter", "Filas escritas en la plantilla SIVICOF."),
+    "admisiones_total": ("counter", "Peticiones a /upload/ admitidas, de inmediato o tras esperar en cola."),
+    "rechazos_total": ("counter", "Peticiones a /upload/ rechazadas por el control de admisión, por motivo."),
+    "cola_admision": ("gauge", "Peticiones a /upload/ esperando capacidad."),
+    "archivos_en_curso": ("gauge", "PDFs de peticiones admitidas que aún no terminan."),
+    "bytes_en_curso": ("gauge", "Bytes de PDFs de peticiones admitidas que aún no terminan."),
+}
+
+
+@contextmanager
+def medir(tiempos, etapa):
+    """
+    Suma a `tiempos[etapa]` la duración del bloque, en segundos.
+
+    Args:
+        tiempos (dict): Diccionario donde se acumulan los tiempos por etapa.
+        etapa (str): Nombre de la etapa.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def contar(info, contador, cantidad=1):
+    """
+    Suma `cantidad` al contador `info["contadores"][contador]`.
+
+    Args:
+        info (dict): Diccionario de detalles de la extracción.
+        contador (str): Nombre del contador (ej. "paginas", "tablas", "filas").
+        cantidad (int): Valor a sumar.
+    """
+    contadores = info.setdefault("contadores", {})
+    contadores[contador] = contadores.get(contador, 0) + cantidad
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{nombre}="{valor}"' for nombre, valor in etiquetas) + "}"
+
+
+class RegistroMetricas:
+    """
+    Contadores, indicadores e histogramas en memoria, seguros entre hilos.
+
+    Attributes:
+        contadores (dict): (nombre, etiquetas) -> valor.
+        indicadores (dict): (nombre, etiquetas) -> último valor.
+        histogramas (dict): (nombre, etiquetas) -> [conteos por bucket, suma, total].
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.contadores = {}
+        self.indicadores = {}
+        self.histogramas = {}
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        """
+        Suma `cantidad` a un contador.
+
+        Args:
+            nombre (str): Nombre de la métrica (una llave de `METRICAS`).
+            cantidad (float): Valor a sumar.
+            **etiquetas: Etiquetas de la serie (ej. resultado="ok").
+        """
+        llave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self.contadores[llave] = self.contadores.get(llave, 0) + cantidad
+
+    def fijar(self, nombre, valor, **etiquetas):
+        """
+        Fija el valor actual de un indicador.
+
+        Args:
+            nombre (str): Nombre de la métrica (una llave de `METRICAS`).
+            valor (float): Valor actual.
+            **etiquetas: Etiquetas de la serie.
+        """
+        llave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self.indicadores[llave] = valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        """
+        Registra una observación en un histograma.
+
+        Args:
+            nombre (str): Nombre de la métrica (una llave de `METRICAS`).
+            valor (float): Valor observado (en segundos).
+            **etiquetas: Etiquetas de la serie (ej. etapa="resumen").
+        """
+        llave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self.histogramas.setdefault(llave, [[0] * len(BUCKETS), 0.0, 0])
+            for indice, limite in enumerate(BUCKETS):
+                if valor <= limite:
+                    histograma[0][indice] += 1
+            histograma[1] += valor
+            histograma[2] += 1
+
+    def registrar_tiempos(self, tiempos):
+        """
+        Registra en el histograma de etapas los tiempos medidos con `medir`.
+
+        Args:
+            tiempos (dict): Etapa -> duración en segundos.
+        """
+        for etapa, segundos in tiempos.items():
+            self.observar("etapa_segundos", segundos, etapa=etapa)
+
+    def registrar_extraccion(self, info):
+        """
+        Incorpora los tiempos y contadores que un worker dejó en `info`.
+
+        Args:
+            info (dict): Detalles de la extracción llenados por `process_pdf`.
+        """
+        self.registrar_tiempos(info.get("tiempos", {}))
+        for contador, cantidad in info.get("contadores", {}).items():
+            self.incrementar(f"{contador}_total", cantidad)
+        if "fallo" in info:
+            self.incrementar("fallos_total", etapa=info["fallo"])
+
+    @contextmanager
+    def tramo(self, etapa, tiempos=None):
+        """
+        Mide un bloque que corre en el proceso principal y lo registra en el histograma.
+
+        Args:
+            etapa (str): Nombre de la etapa.
+            tiempos (dict): Si se indica, también se acumula allí la duración
+                            (para el desglose por petición).
+        """
+        locales = {}
+        try:
+            with medir(locales, etapa):
+                yield
+        finally:
+            self.registrar_tiempos(locales)
+            if tiempos is not None:
+                tiempos[etapa] = tiempos.get(etapa, 0.0) + locales[etapa]
+
+    def exportar(self):
+        """
+        Genera el texto de exposición de Prometheus.
+
+        Returns:
+            str: Las métricas en formato de texto 0.0.4.
+        """
+        with self._lock:
+            contadores = dict(self.contadores)
+            indicadores = dict(self.indicadores)
+            histogramas = {llave: [list(h[0]), h[1], h[2]] for llave, h in self.histogramas.items()}
+
+        lineas = []
+        for nombre, (tipo, descripcion) in METRICAS.items():
+            completo = PREFIJO + nombre
+            lineas.append(f"# HELP {completo} {descripcion}")
+            lineas.append(f"# TYPE {completo} {tipo}")
+            if tipo in ("counter", "gauge"):
+                series = contadores if tipo == "counter" else indicadores
+                for (serie, etiquetas), valor in sorted(series.items()):
+                    if serie == nombre:
+                        lineas.append(f"{completo}{_etiquetas(etiquetas)} {valor:g}")
+            else:
+                for (serie, etiquetas), (conteos, suma, total) in sorted(histogramas.items()):
+                    if serie != nombre:
+                        continue
+                    for limite, conteo in zip(BUCKETS, conteos):
+                        lineas.append(f"{completo}_bucket{_etiquetas(etiquetas + (('le', f'{limite:g}'),))} {conteo}")
+                    lineas.append(f"{completo}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {total}")
+                    lineas.append(f"{completo}_sum{_etiquetas(etiquetas)} {suma:.6f}")
+                    lineas.append(f"{completo}_count{_etiquetas(etiquetas)} {total}")
+        return "\n".join(lineas) + "\n"
+
+
+registro = RegistroMetricas()
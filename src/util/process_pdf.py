@@ -7,14 +7,43 @@ Dependencias requeridas:
 - matplotlib: Para visualizar las áreas de extracción de tablas.
 - ghostscript: Requerido por Camelot para procesar PDFs.
 
+Las coordenadas de cada región salen del formato (`layouts`) detectado con el
+texto de la página 1, antes de abrir el PDF con camelot. Todas las regiones se
+extraen con `MotorExtraccion`, que abre el PDF y analiza el layout de cada
+página una sola vez. La tabla de resumen se intenta primero desde la capa de
+texto (`text_layer`) y solo se recurre a camelot si el resultado no pasa la
+validación.
+
 """
 
-import camelot
-import pandas as pd
 import os
-import matplotlib.pyplot as plt
-from pypdf import PdfReader
 import gc
+import time
+from src.util.extraction_engine import MotorExtraccion, importar_camelot
+from src.util.text_layer import abrir_lector, extraer_tabla_texto, fragmentos_pagina, texto_de_fragmentos
+from src.util.layouts import detectar_layout, obtener_layout, layout_por_defecto, LayoutNoReconocido
+from src.util.metrics import medir, contar
+from src.util.aggregation import AgregadorMovimientos
+
+# camelot, pandas y matplotlib se importan dentro de las funciones que los usan:
+# importarlos aquí hace que arrancar el servicio tarde más de un segundo.
+# matplotlib solo se carga con activar_visualizacion=True.
+
+# Incrementar cada vez que cambie la forma del resultado: invalida los resultados
+# guardados en la caché de extracciones. Los cambios de coordenadas los invalida
+# `version_layouts()`.
+# v2: los movimientos de la página 1 cuentan también en extractos de varias páginas,
+#     y se agregan las estadísticas de `AgregadorMovimientos`.
+# v3: los resúmenes incompletos se reportan como error y la ruta sin bloques
+#     también reporta "Paginas con error".
+VERSION_CONFIGURACION = 3
+
+# Llaves que debe tener la tabla de resumen para considerarla bien extraída
+CLAVES_RESUMEN = ("SALDO ANTERIOR", "TOTAL ABONOS", "TOTAL CARGOS", "SALDO ACTUAL")
+
+# Rutas posibles para extraer la tabla de resumen
+RUTA_TEXTO = "texto"
+RUTA_CAMELOT = "camelot"
 
 def formatear_numero(numero):
   """
@@ -28,7 +57,7 @@ def formatear_numero(numero):
   """
   return f"{numero:,.2f}"
 
-def extract_table(pdf_path, page, table_area, columns, title="Tabla", visualize=False):
+def extract_table(pdf_path, page, table_area, columns, title="Tabla", visualize=False, motor=None, errores=None):
     """
     Extrae una tabla específica de una página de un archivo PDF.
 
@@ -39,21 +68,32 @@ def extract_table(pdf_path, page, table_area, columns, title="Tabla", visualize=
         columns (list): Lista con una cadena de las posiciones de las columnas (ej. ['c1,c2,c3...']).
         title (str): Título para la visualización del gráfico.
         visualize (bool): Si es True, muestra un gráfico de la extracción.
+        motor (MotorExtraccion): Motor con el PDF ya abierto. Si se indica, la región
+                                 se recorta del layout en caché en lugar de volver
+                                 a parsear el PDF con `camelot.read_pdf`.
+        errores (list): Si se indica, se le agrega el número de página cuando la
+                        extracción falla (y no cuando la región está vacía).
 
     Returns:
         pd.DataFrame: Un DataFrame de pandas con la tabla extraída.
                       Retorna None si no se encuentra ninguna tabla.
     """
     try:
-        tables = camelot.read_pdf(
-            pdf_path,
-            flavor='stream',
-            pages=page,
-            table_areas=table_area,
-            columns=columns
-        )
-        if tables.n > 0:
+        if motor is not None:
+            tables = motor.extraer(page, table_area, columns)
+        else:
+            camelot = importar_camelot(con_graficos=visualize)
+            tables = camelot.read_pdf(
+                pdf_path,
+                flavor='stream',
+                pages=page,
+                table_areas=table_area,
+                columns=columns
+            )
+        if len(tables) > 0:
             if visualize:
+                camelot = importar_camelot(con_graficos=True)
+                import matplotlib.pyplot as plt
                 print(f"Generando visualización para: {title}")
                 # CORRECCIÓN: Se pasa la primera tabla (tables[0]) a la función de ploteo, no la lista de tablas.
                 # 'all' muestra el texto, las líneas y los contornos de la tabla.
@@ -66,11 +106,187 @@ def extract_table(pdf_path, page, table_area, columns, title="Tabla", visualize=
             return None
     except Exception as e:
         print(f"Ocurrió un error extrayendo la tabla de la página {page}: {e}")
+        if errores is not None:
+            errores.append(int(page))
         return None
 
-def process_pdf(activar_visualizacion = False,pdf_path=""):
+def resumen_valido(df_resumen):
+  """
+  Verifica que una tabla de resumen tenga todas las llaves esperadas con un valor numérico.
+
+  Args:
+    df_resumen (pd.DataFrame): La tabla de resumen (llaves en la columna 0, valores en la 2).
+
+  Returns:
+    bool: True si la tabla se puede usar.
+  """
+  if df_resumen is None or df_resumen.shape[1] < 3:
+    return False
+  resumen = df_resumen.set_index(0)[2].to_dict()
+  for clave in CLAVES_RESUMEN:
+    valor = str(resumen.get(clave, ""))
+    if not any(caracter.isdigit() for caracter in valor):
+      return False
+  return True
+
+def extraer_resumen(pdf_path, config, visualize=False, motor=None, fragmentos=None):
+    """
+    Extrae la tabla de resumen por la capa de texto y, si no es válida, con camelot.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        config (dict): Configuración de la tabla ("title", "page", "area", "columns").
+        visualize (bool): Si es True, se usa siempre camelot para poder graficar la extracción.
+        motor (MotorExtraccion): Motor con el PDF ya abierto para el respaldo con camelot.
+        fragmentos (list): Fragmentos de texto de la página ya leídos (ver `fragmentos_pagina`).
+
+    Returns:
+        tuple: (pd.DataFrame o None, ruta usada: RUTA_TEXTO o RUTA_CAMELOT).
+    """
+    if not visualize:
+        try:
+            df_resumen = extraer_tabla_texto(pdf_path, config["page"], config["area"], config["columns"],
+                                             fragmentos=fragmentos)
+            if resumen_valido(df_resumen):
+                return df_resumen, RUTA_TEXTO
+            print("La capa de texto no tiene un resumen válido; se usará camelot.")
+        except Exception as e:
+            print(f"No se pudo leer el resumen desde la capa de texto; se usará camelot: {e}")
+
+    df_resumen = extract_table(
+        pdf_path,
+        config["page"],
+        config["area"],
+        config["columns"],
+        title=config["title"],
+        visualize=visualize,
+        motor=motor
+    )
+    return df_resumen, RUTA_CAMELOT
+
+def agregar_movimientos(df_movimientos, paginas, columnas=None, con_movimientos=False):
+    """
+    Calcula las estadísticas de los movimientos de todas las páginas, una página a la vez.
+
+    Las páginas no se unen en un solo DataFrame: cada una se consume del
+    iterable, se agrega y se descarta. Antes, con más de una página, las tablas
+    de las páginas 2 a N reemplazaban a la de la página 1 y sus movimientos no
+    se tenían en cuenta; ahora cuentan todas las páginas.
+
+    Args:
+        df_movimientos (pd.DataFrame): Tabla de movimientos de la página 1 (puede ser None).
+        paginas (iterable): Tablas de movimientos de las páginas 2 a N, en orden.
+        columnas (dict): Columnas de la tabla de movimientos (ver `Layout.columnas_movimiento`).
+        con_movimientos (bool): Si es True, el agregador conserva las filas de movimientos.
+
+    Returns:
+        AgregadorMovimientos: El agregador con las estadísticas de todo el extracto.
+    """
+    agregador = AgregadorMovimientos(columnas=columnas, con_movimientos=con_movimientos)
+    agregador.agregar(df_movimientos, pagina=1)
+    for numero, df_pagina in enumerate(paginas, start=2):
+      agregador.agregar(df_pagina, pagina=numero)
+    return agregador
+
+def leer_layout(pdf_path, reader=None):
+    """
+    Detecta el formato de un PDF con el texto de su página 1, sin usar camelot.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        reader (pypdf.PdfReader): Lector ya abierto del mismo PDF.
+
+    Returns:
+        tuple: (Layout, fragmentos de texto de la página 1 o None si no se pudieron leer).
+
+    Raises:
+        LayoutNoReconocido: Si el formato no se reconoce y no hay formato por defecto.
+    """
+    try:
+        fragmentos = fragmentos_pagina(pdf_path, 1, reader=reader)
+    except Exception as e:
+        print(f"No se pudo leer el texto de la página 1 para detectar el formato: {e}")
+        return layout_por_defecto(), None
+    return detectar_layout(texto_de_fragmentos(fragmentos)), fragmentos
+
+def contar_paginas(pdf_path):
+    """
+    Cuenta las páginas de un PDF sin leer su contenido.
+
+    Se lee el `/Count` del árbol de páginas; solo si falta o no es válido se
+    recorre el árbol completo.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+
+    Returns:
+        int: Número de páginas.
+    """
+    reader = abrir_lector(pdf_path)
+    try:
+        return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+    except (KeyError, TypeError, ValueError):
+        return len(reader.pages)
+
+def extraer_bloque_movimientos(pdf_path, paginas, layout_nombre=None, con_movimientos=False):
+    """
+    Extrae y agrega los movimientos de un bloque de páginas (de la 2 en adelante).
+
+    Se usa para repartir un extracto largo entre varios procesos: cada bloque
+    abre el PDF una vez y retorna solo sus estadísticas, que luego se combinan
+    en orden de página. Una página que falla se registra en `paginas_fallidas`
+    y no detiene el resto del bloque.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        paginas (list): Números de página del bloque, en orden.
+        layout_nombre (str): Formato del extracto. Si es None, se detecta en este
+                             proceso con el texto de la página 1.
+        con_movimientos (bool): Si es True, el agregador conserva las filas de movimientos.
+
+    Returns:
+        tuple: (AgregadorMovimientos, info) con los tiempos y contadores del bloque.
+    """
+    layout = obtener_layout(layout_nombre) if layout_nombre else leer_layout(pdf_path)[0]
+    area, columnas = [layout.movimientos_paginas["area"]], [layout.movimientos_paginas["columnas"]]
+    info = {"tiempos": {}}
+    agregador = AgregadorMovimientos(columnas=layout.columnas_movimiento, con_movimientos=con_movimientos)
+    with MotorExtraccion(pdf_path) as motor:
+        for page in paginas:
+            try:
+                with medir(info["tiempos"], "extraccion_movimientos"):
+                    tables = motor.extraer(page, area, columnas)
+                    motor.liberar_pagina(page)
+            except Exception as e:
+                print(f"Ocurrió un error extrayendo la tabla de la página {page}: {e}")
+                agregador.paginas_fallidas.append(page)
+                tables = []
+            df_pagina = tables[0].df if len(tables) > 0 else None
+            if df_pagina is not None:
+                contar(info, "tablas")
+                contar(info, "filas", len(df_pagina))
+            agregador.agregar(df_pagina, pagina=page)
+    return agregador, info
+
+def process_pdf(activar_visualizacion = False,pdf_path="", info=None, bloques=None, con_movimientos=False):
     """
     Función principal que orquesta la extracción de tablas del PDF.
+
+    Args:
+        activar_visualizacion (bool): Si es True, muestra gráficos de depuración.
+        pdf_path (str): Ruta al archivo PDF.
+        info (dict): Si se indica, se llena con detalles de la extracción: "layout" (formato
+                     detectado), "identificacion" (cuenta y periodo, ver `Layout.identificar`),
+                     "movimientos" (con `con_movimientos`, filas de movimientos, ver
+                     `AgregadorMovimientos`), "ruta_resumen" (RUTA_TEXTO o RUTA_CAMELOT),
+                     "tiempos" (segundos por etapa), "contadores" (páginas, tablas y filas)
+                     y "fallo" (etapa que falló).
+        bloques (list): Agregadores de las páginas 2 a N ya extraídas por bloques
+                        (ver `extraer_bloque_movimientos`), en orden de página. Si se
+                        indica, esas páginas no se vuelven a extraer aquí; sus filas de
+                        movimientos no se incorporan (las junta quien extrajo los bloques).
+        con_movimientos (bool): Si es True, deja en `info["movimientos"]` las filas de
+                                movimientos para el almacén de extractos.
     """
     # --- CONFIGURACIÓN ---
     if not pdf_path:
@@ -80,45 +296,65 @@ def process_pdf(activar_visualizacion = False,pdf_path=""):
         print(f"Error: El archivo '{pdf_path}' no se encontró.")
         return
 
+    if info is None:
+        info = {}
+    tiempos = info.setdefault("tiempos", {})
+
+    # El formato se detecta con la capa de texto, antes de cualquier trabajo con camelot
     try:
-        with PdfReader(pdf_path) as reader:
-            number_of_pages = len(reader.pages)
-            print(f"El archivo '{pdf_path}' tiene {number_of_pages} páginas.")
+        with medir(tiempos, "deteccion_layout"):
+            layout, fragmentos_1 = leer_layout(pdf_path)
+    except LayoutNoReconocido as e:
+        print(f"No se extrae '{pdf_path}': {e}")
+        info["fallo"] = "layout"
+        return {"error": str(e)}
+    info["layout"] = layout.nombre
+    if fragmentos_1 is not None:
+        info["identificacion"] = layout.identificar(texto_de_fragmentos(fragmentos_1))
+    print(f"Formato detectado para '{pdf_path}': {layout.nombre}")
+
+    # El PDF se abre una sola vez; todas las regiones se recortan del mismo layout.
+    motor = MotorExtraccion(pdf_path)
+    try:
+        # Incluye la apertura del PDF (y la importación de camelot en el primer PDF del proceso)
+        with medir(tiempos, "conteo_paginas"):
+            number_of_pages = motor.numero_de_paginas
+        contar(info, "paginas", number_of_pages)
+        print(f"El archivo '{pdf_path}' tiene {number_of_pages} páginas.")
     except Exception as e:
-        print(f"Error al leer el archivo PDF con pypdf: {e}")
+        print(f"Error al leer el archivo PDF: {e}")
+        info["fallo"] = "lectura_pdf"
+        motor.cerrar()
         return
 
-    # --- Configuraciones para cada tabla ---
-    bancolombia_config_resumen = {
-        "title": "Tabla de Resumen",
-        "page": '1',
-        "area": ['0,500,600,450'],
-        "columns": ['110,190,300,410,490']
-    }
-    bancolombia_config_movimientos = {
-        "title": "Tabla de Movimientos",
-        "page": '1',
-        "area": ['0,70,600,430'],
-        "columns": ['90,280,350,410,500']
-    }
-
-    bancolombia_config_pg_mayor_a_1 = {
-        "title": "Tabla de Movimientos",
-        "page": 'all',
-        "area": ['0,70,600,640'],
-        "columns": ['90,280,350,410,500']
-    }
+    with motor:
+        return _extraer_datos(motor, number_of_pages, activar_visualizacion, pdf_path, info,
+                              layout, fragmentos_1, bloques, con_movimientos)
+
+
+def _extraer_datos(motor, number_of_pages, activar_visualizacion, pdf_path, info,
+                   layout, fragmentos_1=None, bloques=None, con_movimientos=False):
+    """
+    Extrae el resumen y los movimientos de un PDF ya abierto en `motor`.
+    """
+
+    tiempos = info.setdefault("tiempos", {})
+
+    def contar_tabla(df, filas=False):
+      if df is not None:
+        contar(info, "tablas")
+        if filas:
+          contar(info, "filas", len(df))
+
+    # --- Configuraciones para cada tabla (del formato detectado) ---
+    config_resumen = layout.config("resumen", 1, "Tabla de Resumen")
+    config_movimientos = layout.config("movimientos_pagina_1", 1, "Tabla de Movimientos")
+    config_pg_mayor_a_1 = layout.config("movimientos_paginas", "all", "Tabla de Movimientos")
     templates=[]
     print(number_of_pages,"///")
     for pag in range(number_of_pages):
       if pag >= 1:
-        bancolombia_config_pg_mayor_a_1 = {
-        "title": "Tabla de Movimientos",
-        "page": str(pag+1),
-        "area": ['0,70,600,610'],
-        "columns": ['90,280,350,410,500']
-    }
-        templates.append(bancolombia_config_pg_mayor_a_1)
+        templates.append(layout.config("movimientos_paginas", pag+1, "Tabla de Movimientos"))
         if activar_visualizacion:
           print("$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$",templates)
 
@@ -127,66 +363,95 @@ def process_pdf(activar_visualizacion = False,pdf_path=""):
         print("La visualización está ACTIVADA. Se mostrarán gráficos de depuración.")
 
     # --- Extracción de la tabla de Resumen ---
-    print(f"\n--- Extrayendo {bancolombia_config_resumen['title']} ---")
-    df_resumen = extract_table(
-        pdf_path,
-        bancolombia_config_resumen["page"],
-        bancolombia_config_resumen["area"],
-        bancolombia_config_resumen["columns"],
-        title=bancolombia_config_resumen["title"],
-        visualize=activar_visualizacion
-    )
+    print(f"\n--- Extrayendo {config_resumen['title']} ---")
+    with medir(tiempos, "resumen"):
+        df_resumen, info["ruta_resumen"] = extraer_resumen(
+            pdf_path,
+            config_resumen,
+            visualize=activar_visualizacion,
+            motor=motor,
+            fragmentos=fragmentos_1
+        )
+    contar_tabla(df_resumen)
+    if not resumen_valido(df_resumen):
+        # Sin las cuatro llaves del resumen el extracto no se puede llevar a la plantilla
+        print(f"No se encontró un resumen válido en '{pdf_path}' con las coordenadas de '{layout.nombre}'.")
+        info["fallo"] = "resumen"
+        return {"error": "No se pudo extraer la Tabla 1 (Resumen) con las coordenadas dadas: "
+                         f"faltan valores de {', '.join(CLAVES_RESUMEN)}."}
+    print(f"{config_resumen['title']} extraída por la ruta '{info['ruta_resumen']}'.")
 
     if df_resumen is not None and activar_visualizacion:
-        print(f"¡{bancolombia_config_resumen['title']} extraída con éxito!")
+        print(f"¡{config_resumen['title']} extraída con éxito!")
         print(df_resumen.to_string())
 
     # --- Extracción de la tabla de Movimientos ---
     if activar_visualizacion:
-      print(f"\n--- Extrayendo {bancolombia_config_movimientos['title']} ---")
-    df_movimientos = extract_table(
-        pdf_path,
-        bancolombia_config_movimientos["page"],
-        bancolombia_config_movimientos["area"],
-        bancolombia_config_movimientos["columns"],
-        title=bancolombia_config_movimientos["title"],
-        visualize=activar_visualizacion
-    )
+      print(f"\n--- Extrayendo {config_movimientos['title']} ---")
+    with medir(tiempos, "extraccion_movimientos"):
+        df_movimientos = extract_table(
+            pdf_path,
+            config_movimientos["page"],
+            config_movimientos["area"],
+            config_movimientos["columns"],
+            title=config_movimientos["title"],
+            visualize=activar_visualizacion,
+            motor=motor
+        )
+    contar_tabla(df_movimientos, filas=True)
     if df_movimientos is not None and activar_visualizacion:
-        print(f"¡{bancolombia_config_movimientos['title']} extraída con éxito!")
+        print(f"¡{config_movimientos['title']} extraída con éxito!")
         print(df_movimientos.to_string())
 
 # --- Extracción de la tabla de movimientos mayor a uno ---
     if activar_visualizacion:
-      print(f"\n--- Extrayendo {bancolombia_config_pg_mayor_a_1['title']} ---")
-    movimientos_list = []
-    for template in range(len(templates)):
-      df_pg_mayor_a_1 = extract_table(
-          pdf_path,
-          templates[template]["page"],
-          templates[template]["area"],
-          templates[template]["columns"],
-          title=templates[template]["title"],
-          visualize=activar_visualizacion
-      )
-      movimientos_list.append(df_pg_mayor_a_1)
-      #df_movimientos=pd.concat([df_movimientos,df_pg_mayor_a_1])
-      if df_pg_mayor_a_1 is not None and activar_visualizacion:
-          print(f"¡{bancolombia_config_pg_mayor_a_1['title']} extraída con éxito!")
-          print(df_pg_mayor_a_1.to_string())
-      df_movimientos = pd.concat(movimientos_list, ignore_index=True)
+      print(f"\n--- Extrayendo {config_pg_mayor_a_1['title']} ---")
+    # Igual que en el modo por bloques, las páginas que fallan se reportan en "Paginas con error"
+    paginas_fallidas = []
+    def paginas_de_movimientos():
+      for template in range(len(templates)):
+        with medir(tiempos, "extraccion_movimientos"):
+            df_pg_mayor_a_1 = extract_table(
+                pdf_path,
+                templates[template]["page"],
+                templates[template]["area"],
+                templates[template]["columns"],
+                title=templates[template]["title"],
+                visualize=activar_visualizacion,
+                motor=motor,
+                errores=paginas_fallidas
+            )
+            motor.liberar_pagina(templates[template]["page"])
+        contar_tabla(df_pg_mayor_a_1, filas=True)
+        if df_pg_mayor_a_1 is not None and activar_visualizacion:
+            print(f"¡{config_pg_mayor_a_1['title']} extraída con éxito!")
+            print(df_pg_mayor_a_1.to_string())
+        yield df_pg_mayor_a_1
 ############################################################################# retrive data
     try:
           datosfinales=df_resumen.set_index(0)[2].to_dict()
 
-          df = df_movimientos.iloc[1:] # Eliminamos la primera fila de encabezado que no tiene valor
-          valor_maximo_absoluto = pd.to_numeric(df[4].str.replace(',', ''), errors='coerce').abs().max()
-          datosfinales["Valor de movimiento maximo en el mes en pesos"]=formatear_numero(valor_maximo_absoluto)
-          dataf_2_excel=pd.DataFrame(datosfinales,index=[0])
-          dataf_2_excel.to_excel("movimientos.xlsx", index=False)
+          extraccion_previa = tiempos["extraccion_movimientos"]
+          inicio = time.perf_counter()
+          if bloques is None:
+              agregador = agregar_movimientos(df_movimientos, paginas_de_movimientos(), layout.columnas_movimiento,
+                                              con_movimientos)
+              agregador.paginas_fallidas.extend(paginas_fallidas)
+          else:
+              agregador = agregar_movimientos(df_movimientos, [], layout.columnas_movimiento, con_movimientos)
+              for bloque in bloques:
+                  agregador.combinar(bloque)
+          # Las páginas 2 a N se extraen mientras se agregan: ese tiempo ya está en "extraccion_movimientos"
+          tiempos["agregacion"] = (time.perf_counter() - inicio
+                                   - (tiempos["extraccion_movimientos"] - extraccion_previa))
+          datosfinales.update(agregador.resultado())
+          if con_movimientos:
+              # Las filas de movimientos no van en el resultado: se guardan en el almacén de extractos
+              info["movimientos"] = agregador.movimientos
           print("######## Resultado de extracción ########", datosfinales)
           #df.to_csv("movimientos.csv")
           return datosfinales
     except Exception as e:
           print("No se pudo extraer la Tabla 1 (Resumen) con las coordenadas dadas.",e)
+          info["fallo"] = "resumen"
           return {"error": f"No se pudo extraer la Tabla 1 (Resumen) con las coordenadas dadas. {e}"}
\ No newline at end of file
@@ -0,0 +1,342 @@
+"""
+Almacén local de los extractos procesados y sus movimientos, en SQLite.
+
+La caché de extracciones guarda el resultado de cada PDF para no volver a
+procesarlo, pero no permite consultar: para ver los saldos de una cuenta en un
+periodo o buscar un movimiento había que volver a subir los PDFs. Aquí, cada
+extracción exitosa se guarda en dos tablas indexadas:
+
+- `extractos`: una fila por PDF (por su SHA-256), con la cuenta y el periodo
+  detectados en la página 1 (ver `Layout.identificar`), los saldos del
+  resumen como números y el resultado completo de la extracción.
+- `movimientos`: todas las filas de movimientos del extracto, con la fecha
+  completa (el año se toma del periodo del extracto) y el valor numérico.
+
+Los movimientos de un extracto se insertan con un solo `executemany` dentro de
+una transacción. Volver a subir el mismo PDF reemplaza sus filas.
+
+Configuración (variables de entorno):
+- EXTRACTOS_DB: Ruta de la base de datos (por defecto '.data/extractos.sqlite3').
+  Si se deja vacía, los extractos no se guardan.
+
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from src.util.date import now
+
+EXTRACTOS_DB = os.getenv("EXTRACTOS_DB", os.path.join(".data", "extractos.sqlite3"))
+
+# Columnas del resumen que se guardan como números, con su llave en el resultado
+COLUMNAS_RESUMEN = (
+    ("saldo_anterior", "SALDO ANTERIOR"),
+    ("total_abonos", "TOTAL ABONOS"),
+    ("total_cargos", "TOTAL CARGOS"),
+    ("saldo_actual", "SALDO ACTUAL"),
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS extractos (
+    id INTEGER PRIMARY KEY,
+    hash_pdf TEXT NOT NULL UNIQUE,
+    archivo TEXT NOT NULL,
+    layout TEXT,
+    cuenta TEXT,
+    periodo_desde TEXT,
+    periodo_hasta TEXT,
+    saldo_anterior REAL,
+    total_abonos REAL,
+    total_cargos REAL,
+    saldo_actual REAL,
+    numero_movimientos INTEGER,
+    resumen TEXT NOT NULL,
+    creado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS extractos_cuenta_periodo ON extractos (cuenta, periodo_desde);
+CREATE INDEX IF NOT EXISTS extractos_periodo ON extractos (periodo_desde);
+CREATE TABLE IF NOT EXISTS movimientos (
+    extracto_id INTEGER NOT NULL REFERENCES extractos (id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    pagina INTEGER,
+    fecha TEXT,
+    fecha_texto TEXT,
+    descripcion TEXT,
+    valor REAL NOT NULL,
+    PRIMARY KEY (extracto_id, orden)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS movimientos_fecha ON movimientos (fecha);
+CREATE INDEX IF NOT EXISTS movimientos_valor ON movimientos (valor);
+"""
+
+_PATRON_FECHA = re.compile(r"^\s*(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?")
+
+
+def valor_numerico(texto):
+    """
+    Convierte un valor del resumen (ej. "$ 1,234.50" o "-20.00") en número.
+
+    Args:
+        texto (str): El valor como aparece en el resultado de la extracción.
+
+    Returns:
+        float: El número, o None si el texto no tiene uno.
+    """
+    if isinstance(texto, (int, float)):
+        return float(texto)
+    limpio = re.sub(r"[^0-9.\-]", "", str(texto or ""))
+    try:
+        return float(limpio)
+    except ValueError:
+        return None
+
+
+def fecha_completa(fecha_texto, periodo_hasta):
+    """
+    Completa la fecha "dd/mm" de un movimiento con el año del periodo del extracto.
+
+    Un movimiento de un mes posterior al final del periodo (por ejemplo, diciembre
+    en un extracto que termina en enero) se asigna al año anterior.
+
+    Args:
+        fecha_texto (str): La fecha como aparece en el extracto ("dd/mm" o "dd/mm/aaaa").
+        periodo_hasta (str): Fin del periodo del extracto (AAAA-MM-DD), o None.
+
+    Returns:
+        str: La fecha en formato AAAA-MM-DD, o None si no se puede determinar.
+    """
+    coincidencia = _PATRON_FECHA.match(str(fecha_texto or ""))
+    if not coincidencia:
+        return None
+    dia, mes, anio = int(coincidencia.group(1)), int(coincidencia.group(2)), coincidencia.group(3)
+    if not (1 <= dia <= 31 and 1 <= mes <= 12):
+        return None
+    if anio:
+        anio = int(anio) + (2000 if len(anio) == 2 else 0)
+    elif periodo_hasta:
+        anio_hasta, mes_hasta = int(periodo_hasta[:4]), int(periodo_hasta[5:7])
+        anio = anio_hasta - 1 if mes > mes_hasta else anio_hasta
+    else:
+        return None
+    return f"{anio:04d}-{mes:02d}-{dia:02d}"
+
+
+class AlmacenExtractos:
+    """
+    Extractos y movimientos guardados en una base de datos SQLite.
+
+    Args:
+        ruta (str): Ruta de la base de datos. Si es None o vacía, no se guarda nada.
+    """
+
+    def __init__(self, ruta=EXTRACTOS_DB):
+        self.ruta = ruta
+        self._conexion = None
+        self._lock = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return bool(self.ruta)
+
+    def _conectar(self):
+        """Abre la base de datos y crea el esquema, solo la primera vez."""
+        if self._conexion is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA foreign_keys=ON")
+            conexion.executescript(ESQUEMA)
+            self._conexion = conexion
+        return self._conexion
+
+    def guardar(self, hash_pdf, archivo, datos, info):
+        """
+        Guarda un extracto y todos sus movimientos, reemplazando los de un PDF idéntico.
+
+        Args:
+            hash_pdf (str): SHA-256 hexadecimal del PDF.
+            archivo (str): Nombre original del archivo.
+            datos (dict): Resultado de `process_pdf`.
+            info (dict): Detalles de la extracción ("layout", "identificacion", "movimientos").
+
+        Returns:
+            int: El id del extracto, o None si el almacén está deshabilitado.
+        """
+        if not self.habilitado:
+            return None
+        identificacion = info.get("identificacion") or {}
+        periodo_hasta = identificacion.get("hasta")
+        movimientos = info.get("movimientos") or []
+        with self._lock:
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute("DELETE FROM extractos WHERE hash_pdf = ?", (hash_pdf,))
+                cursor = conexion.execute(
+                    "INSERT INTO extractos (hash_pdf, archivo, layout, cuenta, periodo_desde, periodo_hasta,"
+                    " saldo_anterior, total_abonos, total_cargos, saldo_actual, numero_movimientos, resumen, creado)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (hash_pdf, archivo, info.get("layout"), identificacion.get("cuenta"),
+                     identificacion.get("desde"), periodo_hasta,
+                     *(valor_numerico(datos.get(llave)) for _, llave in COLUMNAS_RESUMEN),
+                     len(movimientos), json.dumps(datos, ensure_ascii=False), now()))
+                extracto_id = cursor.lastrowid
+                conexion.executemany(
+                    "INSERT INTO movimientos (extracto_id, orden, pagina, fecha, fecha_texto, descripcion, valor)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((extracto_id, orden, pagina, fecha_completa(fecha, periodo_hasta), fecha, descripcion, valor)
+                     for orden, (pagina, fecha, descripcion, valor) in enumerate(movimientos)))
+        return extracto_id
+
+    def existe(self, hash_pdf):
+        """
+        Indica si un PDF ya está guardado.
+
+        Args:
+            hash_pdf (str): SHA-256 hexadecimal del PDF.
+
+        Returns:
+            bool: True si hay un extracto con ese hash (False si el almacén está deshabilitado).
+        """
+        return bool(self._consultar("SELECT 1 FROM extractos WHERE hash_pdf = ?", (hash_pdf,)))
+
+    def _consultar(self, sql, parametros):
+        if not self.habilitado:
+            return []
+        with self._lock:
+            return [dict(fila) for fila in self._conectar().execute(sql, parametros)]
+
+    @staticmethod
+    def _filtro_extractos(cuenta=None, desde=None, hasta=None, ids=None, prefijo=""):
+        """
+        Arma las condiciones sobre la tabla de extractos.
+
+        Un extracto está en el rango si su periodo se cruza con [desde, hasta].
+        """
+        condiciones, parametros = [], []
+        if cuenta:
+            condiciones.append(f"{prefijo}cuenta = ?")
+            parametros.append(cuenta)
+        if desde:
+            condiciones.append(f"{prefijo}periodo_hasta >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append(f"{prefijo}periodo_desde <= ?")
+            parametros.append(hasta)
+        if ids:
+            condiciones.append(f"{prefijo}id IN ({', '.join('?' * len(ids))})")
+            parametros.extend(ids)
+        return condiciones, parametros
+
+    def buscar_extractos(self, cuenta=None, desde=None, hasta=None, limite=100):
+        """
+        Busca los resúmenes de extractos guardados.
+
+        Args:
+            cuenta (str): Número de cuenta.
+            desde (str): Fecha AAAA-MM-DD; se incluyen los periodos que terminan en o después de ella.
+            hasta (str): Fecha AAAA-MM-DD; se incluyen los periodos que empiezan en o antes de ella.
+            limite (int): Número máximo de extractos.
+
+        Returns:
+            list: Extractos (sin el resultado completo), ordenados por cuenta y periodo.
+        """
+        condiciones, parametros = self._filtro_extractos(cuenta, desde, hasta)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._consultar(
+            "SELECT id, hash_pdf, archivo, layout, cuenta, periodo_desde, periodo_hasta, saldo_anterior,"
+            " total_abonos, total_cargos, saldo_actual, numero_movimientos, creado"
+            f" FROM extractos{donde} ORDER BY cuenta, periodo_desde, id LIMIT ?",
+            (*parametros, limite))
+
+    def obtener(self, extracto_id):
+        """
+        Retorna un extracto guardado con su resultado completo.
+
+        Args:
+            extracto_id (int): Id del extracto.
+
+        Returns:
+            dict: El extracto, con el resultado de la extracción en "resumen", o None si no existe.
+        """
+        filas = self._consultar("SELECT * FROM extractos WHERE id = ?", (extracto_id,))
+        if not filas:
+            return None
+        extracto = filas[0]
+        extracto["resumen"] = json.loads(extracto["resumen"])
+        return extracto
+
+    def buscar_movimientos(self, cuenta=None, desde=None, hasta=None, valor_min=None, valor_max=None,
+                           descripcion=None, extracto_id=None, limite=500):
+        """
+        Busca movimientos por fecha, rango de valor y descripción.
+
+        Args:
+            cuenta (str): Número de cuenta.
+            desde (str): Fecha mínima del movimiento (AAAA-MM-DD).
+            hasta (str): Fecha máxima del movimiento (AAAA-MM-DD).
+            valor_min (float): Valor mínimo (los cargos son negativos).
+            valor_max (float): Valor máximo.
+            descripcion (str): Texto que debe contener la descripción (sin distinguir mayúsculas).
+            extracto_id (int): Id del extracto.
+            limite (int): Número máximo de movimientos.
+
+        Returns:
+            list: Movimientos con la cuenta y el archivo de su extracto, ordenados por fecha.
+        """
+        condiciones, parametros = [], []
+        for condicion, valor in (("e.cuenta = ?", cuenta), ("m.fecha >= ?", desde), ("m.fecha <= ?", hasta),
+                                 ("m.valor >= ?", valor_min), ("m.valor <= ?", valor_max),
+                                 ("m.extracto_id = ?", extracto_id)):
+            if valor is not None and valor != "":
+                condiciones.append(condicion)
+                parametros.append(valor)
+        if descripcion:
+            condiciones.append("m.descripcion LIKE ?")
+            parametros.append(f"%{descripcion}%")
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._consultar(
+            "SELECT m.extracto_id, e.cuenta, e.archivo, m.orden, m.pagina, m.fecha, m.fecha_texto,"
+            " m.descripcion, m.valor FROM movimientos m JOIN extractos e ON e.id = m.extracto_id"
+            f"{donde} ORDER BY m.fecha, m.extracto_id, m.orden LIMIT ?",
+            (*parametros, limite))
+
+    def resultados(self, cuenta=None, desde=None, hasta=None, ids=None):
+        """
+        Retorna extractos guardados con la forma que recibe el llenado del Excel SIVICOF.
+
+        Args:
+            cuenta (str): Número de cuenta.
+            desde (str): Fecha AAAA-MM-DD (ver `buscar_extractos`).
+            hasta (str): Fecha AAAA-MM-DD (ver `buscar_extractos`).
+            ids (list): Ids de extractos.
+
+        Returns:
+            list: Diccionarios {"filename", "data"}, ordenados por cuenta y periodo.
+        """
+        condiciones, parametros = self._filtro_extractos(cuenta, desde, hasta, ids)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        filas = self._consultar(
+            f"SELECT archivo, resumen FROM extractos{donde} ORDER BY cuenta, periodo_desde, id", parametros)
+        return [{"filename": fila["archivo"], "data": json.loads(fila["resumen"])} for fila in filas]
+
+    def estadisticas(self):
+        """
+        Retorna el tamaño del almacén.
+
+        Returns:
+            dict: Ruta de la base de datos y número de extractos y movimientos guardados.
+        """
+        if not self.habilitado:
+            return {"ruta": None, "extractos": 0, "movimientos": 0}
+        extractos = self._consultar("SELECT COUNT(*) AS n FROM extractos", ())[0]["n"]
+        movimientos = self._consultar("SELECT COUNT(*) AS n FROM movimientos", ())[0]["n"]
+        return {"ruta": self.ruta, "extractos": extractos, "movimientos": movimientos}
+
+
+almacen_extractos = AlmacenExtractos()
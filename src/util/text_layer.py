@@ -0,0 +1,145 @@
+"""
+Extracción rápida de tablas pequeñas directamente desde la capa de texto del PDF.
+
+La "Tabla de Resumen" de la página 1 es un bloque pequeño de posición fija. En
+lugar de pasarla por todo el pipeline de camelot, se leen las coordenadas de
+cada fragmento de texto con `pypdf` y se reparten en filas (por su coordenada
+y) y en columnas (según los límites configurados en `columns`).
+
+El resultado tiene la misma forma que el DataFrame de camelot, pero quien lo
+use debe validarlo y recurrir a camelot si no es confiable (por ejemplo, si el
+PDF dibuja cada letra por separado y las palabras no se pueden reconstruir).
+
+Dependencias requeridas:
+- pypdf: Para leer el texto y sus coordenadas.
+- pandas: Para devolver la tabla como DataFrame.
+
+"""
+
+import mmap
+
+# Tolerancia vertical (en puntos) para considerar que dos fragmentos están en la misma fila,
+# igual al `row_tol` por defecto del flavor 'stream' de camelot.
+TOLERANCIA_FILA = 2
+
+
+def _fragmentos_de_texto(page):
+    """
+    Retorna los fragmentos de texto de una página con su posición en el espacio del PDF.
+
+    Args:
+        page (pypdf.PageObject): La página a leer.
+
+    Returns:
+        list: Lista de tuplas (x, y, texto).
+    """
+    fragmentos = []
+
+    def visitante(texto, cm, tm, font_dict, font_size):
+        if not texto or not texto.strip():
+            return
+        # Posición = matriz de texto (tm) transformada por la matriz actual (cm)
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        fragmentos.append((x, y, texto))
+
+    page.extract_text(visitor_text=visitante)
+    return fragmentos
+
+
+def abrir_lector(pdf_path):
+    """
+    Abre un `PdfReader` sobre el archivo mapeado en memoria.
+
+    `PdfReader(ruta)` copia el archivo completo a memoria; sobre un `mmap` lee
+    solo las partes que necesita directamente de la caché de páginas del sistema,
+    las mismas que mapea playa (camelot) al extraer las tablas.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+
+    Returns:
+        pypdf.PdfReader: El lector.
+    """
+    from pypdf import PdfReader
+    with open(pdf_path, "rb") as archivo:
+        try:
+            datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Un archivo vacío no se puede mapear; pypdf reporta el error de lectura
+            return PdfReader(archivo)
+    return PdfReader(datos)
+
+
+def fragmentos_pagina(pdf_path, page, reader=None):
+    """
+    Lee los fragmentos de texto de una página del PDF.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        page (int | str): Número de la página (empezando en 1).
+        reader (pypdf.PdfReader): Lector ya abierto del mismo PDF. Si es None, se abre uno.
+
+    Returns:
+        list: Lista de tuplas (x, y, texto).
+    """
+    if reader is None:
+        reader = abrir_lector(pdf_path)
+    return _fragmentos_de_texto(reader.pages[int(page) - 1])
+
+
+def texto_de_fragmentos(fragmentos):
+    """Une el texto de los fragmentos de una página, en el orden en que se dibujan."""
+    return " ".join(texto for _, _, texto in fragmentos)
+
+
+def extraer_tabla_texto(pdf_path, page, table_area, columns, fragmentos=None):
+    """
+    Extrae una tabla de posición fija leyendo las coordenadas de la capa de texto.
+
+    Args:
+        pdf_path (str): Ruta al archivo PDF.
+        page (str): Número de la página (como string, empezando en 1).
+        table_area (list): Lista con una cadena que define el área de la tabla (ej. ['x1,y1,x2,y2']).
+        columns (list): Lista con una cadena de las posiciones de las columnas (ej. ['c1,c2,c3...']).
+        fragmentos (list): Fragmentos de la página ya leídos con `fragmentos_pagina`.
+                           Si es None, se lee la página.
+
+    Returns:
+        pd.DataFrame: Un DataFrame con una fila por línea de texto y una columna por
+                      intervalo entre límites. Retorna None si el área no tiene texto.
+    """
+    import pandas as pd
+
+    x1, y1, x2, y2 = (float(v) for v in table_area[0].split(","))
+    x_min, x_max = min(x1, x2), max(x1, x2)
+    y_min, y_max = min(y1, y2), max(y1, y2)
+    limites = [float(c) for c in columns[0].split(",")]
+
+    if fragmentos is None:
+        fragmentos = fragmentos_pagina(pdf_path, page)
+    fragmentos = [
+        (x, y, texto) for x, y, texto in fragmentos
+        if x_min <= x <= x_max and y_min <= y <= y_max
+    ]
+    if not fragmentos:
+        return None
+
+    # Filas de arriba hacia abajo
+    fragmentos.sort(key=lambda f: -f[1])
+    filas = []
+    y_fila = None
+    for x, y, texto in fragmentos:
+        if y_fila is None or abs(y_fila - y) > TOLERANCIA_FILA:
+            filas.append([])
+            y_fila = y
+        filas[-1].append((x, texto))
+
+    # Dentro de cada fila, de izquierda a derecha y repartidos entre los límites de columna
+    tabla = []
+    for fila in filas:
+        celdas = [[] for _ in range(len(limites) + 1)]
+        for x, texto in sorted(fila, key=lambda f: f[0]):
+            celdas[sum(1 for limite in limites if x >= limite)].append(texto)
+        tabla.append([" ".join("".join(celda).split()) for celda in celdas])
+    return pd.DataFrame(tabla)
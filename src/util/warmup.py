@@ -0,0 +1,115 @@
+"""
+Precarga opcional de dependencias pesadas y medición del tiempo de arranque.
+
+camelot, pandas, pypdf y openpyxl se importan solo cuando se usan por primera
+vez, para que el servicio arranque rápido. La contrapartida es que la primera
+petición paga esas importaciones. Con la precarga activada, después de que el
+servicio reporta que está listo se importan en segundo plano y se ejecuta una
+extracción mínima, tanto en el proceso principal como en cada worker del pool.
+
+Configuración (variables de entorno):
+- PRECARGA: "1" para activar la precarga al arrancar (por defecto desactivada).
+- PRESUPUESTO_IMPORTACION_MS: Tiempo máximo esperado para importar `main`
+  (por defecto 800 ms). Si se supera, se avisa al arrancar.
+
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+PRECARGA = os.getenv("PRECARGA", "0") == "1"
+PRESUPUESTO_IMPORTACION_MS = float(os.getenv("PRESUPUESTO_IMPORTACION_MS", "800"))
+
+arranque = {
+    "importacion_ms": None,
+    "presupuesto_importacion_ms": PRESUPUESTO_IMPORTACION_MS,
+    "dentro_del_presupuesto": None,
+    "precarga_activada": PRECARGA,
+    "precarga_ms": None,
+    "precarga_completada": False,
+}
+
+
+def registrar_importacion(segundos):
+    """
+    Registra cuánto tardó la importación del servicio y avisa si supera el presupuesto.
+
+    Args:
+        segundos (float): Duración de la importación en segundos.
+    """
+    milisegundos = segundos * 1000
+    arranque["importacion_ms"] = round(milisegundos, 1)
+    arranque["dentro_del_presupuesto"] = milisegundos <= PRESUPUESTO_IMPORTACION_MS
+    if not arranque["dentro_del_presupuesto"]:
+        print(f"Advertencia: la importación tardó {milisegundos:.0f} ms "
+              f"(presupuesto: {PRESUPUESTO_IMPORTACION_MS:.0f} ms).")
+
+
+def _pdf_minimo():
+    """Crea un PDF de una página en blanco en un archivo temporal y retorna su ruta."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=612, height=792)
+    with tempfile.NamedTemporaryFile(prefix="precarga-", suffix=".pdf", delete=False) as archivo:
+        writer.write(archivo)
+        return archivo.name
+
+
+def precargar():
+    """
+    Importa las dependencias pesadas y ejecuta una extracción mínima.
+
+    Se ejecuta en el proceso principal y como inicializador de cada worker del
+    pool, incluidos los que reemplazan a los workers reciclados.
+
+    Returns:
+        float: Duración de la precarga en segundos.
+    """
+    inicio = time.perf_counter()
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+    from src.util.extraction_engine import MotorExtraccion
+    from src.util.text_layer import extraer_tabla_texto
+    from src.util.layouts import layout_por_defecto, cargar_layouts
+
+    cargar_layouts()
+    ruta = _pdf_minimo()
+    try:
+        layout = layout_por_defecto()
+        resumen, movimientos = layout.config("resumen", 1, ""), layout.config("movimientos_pagina_1", 1, "")
+        extraer_tabla_texto(ruta, "1", resumen["area"], resumen["columns"])
+        with MotorExtraccion(ruta) as motor:
+            motor.extraer(1, movimientos["area"], movimientos["columns"])
+    except Exception as e:
+        print(f"La extracción de precarga falló (no afecta al servicio): {e}")
+    finally:
+        os.remove(ruta)
+    return time.perf_counter() - inicio
+
+
+async def precargar_en_segundo_plano(arrancar_workers):
+    """
+    Precarga el proceso principal y arranca los workers del pool sin bloquear el arranque.
+
+    Cada worker ejecuta `precargar` como inicializador, así que basta con
+    enviarles una tarea trivial para que se creen antes de la primera petición.
+
+    Args:
+        arrancar_workers: Corrutina que envía esa tarea a cada worker por la misma
+                          vía que los PDFs (ver `executor.arrancar_workers`).
+    """
+    loop = asyncio.get_running_loop()
+    inicio = time.perf_counter()
+    try:
+        from src.util.fill_excel import cargar_plantilla
+        await loop.run_in_executor(None, cargar_plantilla)
+        await loop.run_in_executor(None, precargar)
+        await arrancar_workers()
+        arranque["precarga_completada"] = True
+    except Exception as e:
+        print(f"No se pudo completar la precarga: {e}")
+    arranque["precarga_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    print(f"Precarga terminada en {arranque['precarga_ms']:.0f} ms.")
@@ -0,0 +1,115 @@
+"""
+Almacén en memoria de los Excel generados por cada petición o trabajo.
+
+Cada petición genera su propio Excel en memoria bajo un id único, de modo que
+dos usuarios simultáneos no se sobrescriben el archivo y la descarga no depende
+de un archivo compartido en disco. Los libros que nadie descarga expiran y el
+almacén tiene un tope de memoria: al superarlo se descartan los más antiguos.
+
+Configuración (variables de entorno):
+- EXCEL_TTL: Segundos que se conserva cada libro (por defecto 900). Los libros
+  de los trabajos se conservan lo mismo que el trabajo (ver `JOBS_TTL`).
+- EXCEL_MAX_MB: Memoria máxima ocupada por los libros en MB (por defecto 200).
+
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+EXCEL_TTL = float(os.getenv("EXCEL_TTL", "900"))
+EXCEL_MAX_MB = float(os.getenv("EXCEL_MAX_MB", "200"))
+
+
+class AlmacenLibros:
+    """
+    Libros de Excel en memoria indexados por id, con expiración y tope de memoria.
+
+    Args:
+        ttl (float): Segundos que se conserva cada libro.
+        max_bytes (int): Memoria máxima ocupada por todos los libros.
+    """
+
+    def __init__(self, ttl=EXCEL_TTL, max_bytes=int(EXCEL_MAX_MB * 1024 * 1024)):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._libros = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.expirados = 0
+        self.descartados_por_memoria = 0
+
+    def guardar(self, contenido, libro_id=None, ttl=None):
+        """
+        Guarda un libro y retorna su id.
+
+        Args:
+            contenido (bytes): El contenido del Excel.
+            libro_id (str): Id a usar (por ejemplo, el id de un trabajo). Si es None, se genera uno.
+            ttl (float): Segundos que se conserva este libro (por ejemplo, los de un trabajo
+                         viven lo mismo que el trabajo). Si es None, se usa el del almacén.
+
+        Returns:
+            str: El id con el que se puede descargar el libro.
+        """
+        libro_id = libro_id or uuid.uuid4().hex
+        vence = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._eliminar(libro_id)
+            self._libros[libro_id] = (contenido, vence)
+            self._bytes += len(contenido)
+            self._limpiar()
+        return libro_id
+
+    def obtener(self, libro_id):
+        """
+        Retorna el contenido de un libro, o None si no existe o ya expiró.
+
+        Args:
+            libro_id (str): El id retornado por `guardar`.
+
+        Returns:
+            bytes: El contenido del Excel.
+        """
+        with self._lock:
+            self._limpiar()
+            entrada = self._libros.get(libro_id)
+            return entrada[0] if entrada else None
+
+    def _eliminar(self, libro_id):
+        entrada = self._libros.pop(libro_id, None)
+        if entrada:
+            self._bytes -= len(entrada[0])
+
+    def _limpiar(self):
+        """Descarta los libros expirados y los más antiguos si se supera el tope de memoria."""
+        # Cada libro tiene su propio vencimiento, así que se revisan todos y no solo los primeros
+        ahora = time.time()
+        for libro_id, (_, vence) in list(self._libros.items()):
+            if vence < ahora:
+                self.expirados += 1
+                self._eliminar(libro_id)
+        while self._libros and self._bytes > self.max_bytes:
+            self.descartados_por_memoria += 1
+            self._eliminar(next(iter(self._libros)))
+
+    def estadisticas(self):
+        """
+        Retorna el uso del almacén.
+
+        Returns:
+            dict: Número de libros, bytes ocupados, expirados y descartados por memoria.
+        """
+        with self._lock:
+            self._limpiar()
+            return {
+                "libros": len(self._libros),
+                "bytes": self._bytes,
+                "expirados": self.expirados,
+                "descartados_por_memoria": self.descartados_por_memoria,
+            }
+
+
+almacen_libros = AlmacenLibros()
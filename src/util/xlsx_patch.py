@@ -0,0 +1,317 @@
+"""
+Llenado de la plantilla SIVICOF editando directamente el XML de la hoja dentro del ZIP.
+
+Un .xlsx es un ZIP de partes XML. Cargar y guardar la plantilla con openpyxl
+analiza y vuelve a escribir todas las hojas, estilos, dibujos y nombres
+definidos solo para llenar las columnas I–M de unas pocas filas. Aquí:
+
+- Al preparar la plantilla (una vez por proceso) se ubica la parte XML de la
+  hoja destino a través de `xl/workbook.xml` y sus relaciones, y se arma un ZIP
+  base con todos los demás miembros.
+- Por cada libro se copia ese ZIP base tal cual (los demás miembros quedan
+  idénticos byte a byte), se modifican en el XML de la hoja solo las celdas
+  escritas y se agrega la hoja modificada al final del ZIP.
+
+Las celdas y las filas conservan todos sus atributos de la plantilla (estilo,
+alto, etc.) salvo el tipo de la celda; los textos se escriben como cadenas en
+línea (`inlineStr`), así que `sharedStrings.xml` no cambia. El rango de
+`<dimension>` y los `spans` de las filas se amplían para cubrir las celdas
+escritas.
+
+`HojaXml` imita la parte de la hoja de openpyxl que usa `escribir_resultados`
+(`hoja["I3"].value` y `hoja["I3"] = valor`), de modo que la lógica de filas es
+la misma en ambos motores.
+
+"""
+
+import html
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+_PATRON_REFERENCIA = re.compile(r"^([A-Z]+)(\d+)$")
+_PATRON_FILA = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_PATRON_CELDA = re.compile(r'<c\b(?P<antes>[^>]*?)\br="(?P<columna>[A-Z]+)(?P<fila>\d+)"(?P<despues>[^>]*?)'
+                           r'(?:/>|>(?P<contenido>.*?)</c>)', re.S)
+_PATRON_TIPO = re.compile(r'\s+t="[^"]*"')
+_PATRON_SPANS = re.compile(r'\bspans="(\d+):(\d+)"')
+_PATRON_DIMENSION = re.compile(r'<dimension\b[^>]*?\bref="([^"]*)"')
+
+
+def _indice_columna(letras):
+    """Convierte letras de columna en índice (A=1, Z=26, AA=27)."""
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - ord("A") + 1
+    return indice
+
+
+def _letras_columna(indice):
+    """Convierte un índice de columna en letras (1=A, 27=AA)."""
+    letras = ""
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord("A") + resto) + letras
+    return letras
+
+
+def _atributos_celda(coincidencia):
+    """Atributos de una celda encontrada con `_PATRON_CELDA`, sin su referencia `r`."""
+    atributos = " ".join(parte.strip() for parte in (coincidencia.group("antes"), coincidencia.group("despues"))
+                         if parte.strip())
+    return f" {atributos}" if atributos else ""
+
+
+def _ampliar_dimension(xml, referencias):
+    """Amplía el rango de `<dimension ref>` para que incluya las celdas indicadas."""
+    dimension = _PATRON_DIMENSION.search(xml)
+    if dimension is None:
+        return xml
+    columnas, filas = [], []
+    for referencia in [*dimension.group(1).split(":"), *referencias]:
+        coincidencia = _PATRON_REFERENCIA.match(referencia)
+        if coincidencia:
+            columnas.append(_indice_columna(coincidencia.group(1)))
+            filas.append(int(coincidencia.group(2)))
+    rango = f"{_letras_columna(min(columnas))}{min(filas)}:{_letras_columna(max(columnas))}{max(filas)}"
+    return xml[:dimension.start(1)] + rango + xml[dimension.end(1):]
+
+
+def _texto_de_elemento(xml):
+    """Une el texto de todos los elementos <t> de un fragmento XML."""
+    return "".join(html.unescape(t) for t in re.findall(r"<t\b[^>]*>(.*?)</t>", xml, re.S))
+
+
+def _xml_celda(referencia, atributos, valor):
+    """
+    Arma el XML de una celda con los atributos de la plantilla (sin su tipo) y un valor nuevo.
+
+    Los textos que empiezan por '=' se escriben como fórmula, igual que en openpyxl.
+    """
+    atributos = _PATRON_TIPO.sub("", atributos)
+    if valor is None:
+        return f'<c r="{referencia}"{atributos}/>'
+    if isinstance(valor, bool):
+        return f'<c r="{referencia}"{atributos} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f'<c r="{referencia}"{atributos}><v>{valor!r}</v></c>'
+    texto = str(valor)
+    if texto.startswith("=") and len(texto) > 1:
+        return f'<c r="{referencia}"{atributos}><f>{escape(texto[1:])}</f><v></v></c>'
+    return (f'<c r="{referencia}"{atributos} t="inlineStr">'
+            f'<is><t xml:space="preserve">{escape(texto)}</t></is></c>')
+
+
+class _Celda:
+    """Celda de solo lectura con la interfaz `.value` de openpyxl."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class HojaXml:
+    """
+    Vista editable del XML de una hoja de cálculo.
+
+    Args:
+        xml (str): XML de la hoja de la plantilla.
+        leer (function): Función que retorna el valor de una celda de la plantilla.
+    """
+
+    def __init__(self, xml, leer):
+        self._xml = xml
+        self._leer = leer
+        self._escrituras = {}
+
+    def __getitem__(self, referencia):
+        if referencia in self._escrituras:
+            return _Celda(self._escrituras[referencia])
+        return _Celda(self._leer(referencia))
+
+    def __setitem__(self, referencia, valor):
+        if not _PATRON_REFERENCIA.match(referencia):
+            raise ValueError(f"Referencia de celda no válida: '{referencia}'")
+        self._escrituras[referencia] = valor
+
+    def xml(self):
+        """
+        Retorna el XML de la hoja con las celdas escritas.
+
+        Returns:
+            str: El XML modificado; lo que no se escribió queda igual que en la plantilla.
+        """
+        por_fila = {}
+        for referencia, valor in self._escrituras.items():
+            columna, fila = _PATRON_REFERENCIA.match(referencia).groups()
+            por_fila.setdefault(int(fila), {})[columna] = valor
+        if not por_fila:
+            return self._xml
+
+        def reemplazar_fila(coincidencia):
+            fila = int(coincidencia.group(1))
+            if fila not in por_fila:
+                return coincidencia.group(0)
+            return self._fila_con_celdas(coincidencia.group(0), fila, por_fila.pop(fila))
+
+        xml = _PATRON_FILA.sub(reemplazar_fila, _ampliar_dimension(self._xml, self._escrituras))
+
+        # Filas que no existían en la plantilla: se insertan en orden
+        for fila in sorted(por_fila):
+            nueva = self._fila_con_celdas(f'<row r="{fila}"/>', fila, por_fila[fila])
+            posterior = next((c for c in _PATRON_FILA.finditer(xml) if int(c.group(1)) > fila), None)
+            posicion = posterior.start() if posterior else xml.index("</sheetData>")
+            xml = xml[:posicion] + nueva + xml[posicion:]
+        return xml
+
+    @staticmethod
+    def _fila_con_celdas(xml_fila, fila, celdas):
+        """Reemplaza o inserta, en orden de columna, las celdas escritas de una fila."""
+        pendientes = dict(celdas)
+
+        def reemplazar_celda(coincidencia):
+            columna = coincidencia.group("columna")
+            if columna not in pendientes:
+                return coincidencia.group(0)
+            return _xml_celda(f"{columna}{fila}", _atributos_celda(coincidencia), pendientes.pop(columna))
+
+        spans = _PATRON_SPANS.search(xml_fila[:xml_fila.index(">")])
+        if spans:
+            indices = [_indice_columna(columna) for columna in celdas]
+            primera, ultima = min(int(spans.group(1)), *indices), max(int(spans.group(2)), *indices)
+            xml_fila = f'{xml_fila[:spans.start()]}spans="{primera}:{ultima}"{xml_fila[spans.end():]}'
+        if xml_fila.endswith("/>"):
+            xml_fila = xml_fila[:-2] + "></row>"
+        xml_fila = _PATRON_CELDA.sub(reemplazar_celda, xml_fila)
+
+        for columna in sorted(pendientes, key=_indice_columna):
+            nueva = _xml_celda(f"{columna}{fila}", "", pendientes[columna])
+            posterior = next((c for c in _PATRON_CELDA.finditer(xml_fila)
+                              if _indice_columna(c.group("columna")) > _indice_columna(columna)), None)
+            posicion = posterior.start() if posterior else xml_fila.rindex("</row>")
+            xml_fila = xml_fila[:posicion] + nueva + xml_fila[posicion:]
+        return xml_fila
+
+
+class PlantillaXlsx:
+    """
+    Plantilla .xlsx preparada para generar libros modificando solo una hoja.
+
+    Args:
+        contenido (bytes): Contenido del .xlsx de la plantilla.
+        nombre_hoja (str): Nombre de la hoja que se va a llenar.
+
+    Raises:
+        KeyError: Si el libro no tiene una hoja con ese nombre.
+    """
+
+    def __init__(self, contenido, nombre_hoja):
+        with zipfile.ZipFile(BytesIO(contenido)) as plantilla:
+            self.ruta_hoja = self._ruta_de_hoja(plantilla, nombre_hoja)
+            info_hoja = plantilla.getinfo(self.ruta_hoja)
+            self._xml_hoja = plantilla.read(info_hoja).decode("utf-8")
+            try:
+                self._shared_strings_xml = plantilla.read("xl/sharedStrings.xml").decode("utf-8")
+            except KeyError:
+                self._shared_strings_xml = ""
+            self._compresion = info_hoja.compress_type
+
+            # ZIP base: todos los miembros menos la hoja, en su orden original
+            base = BytesIO()
+            with zipfile.ZipFile(base, "w") as salida:
+                for info in plantilla.infolist():
+                    if info.filename != self.ruta_hoja:
+                        salida.writestr(info, plantilla.read(info), compress_type=info.compress_type)
+        self._base = base.getvalue()
+        self._textos = None
+        self._celdas = None
+
+    @staticmethod
+    def _ruta_de_hoja(plantilla, nombre_hoja):
+        """Ubica la parte XML de una hoja por su nombre, vía workbook.xml y sus relaciones."""
+        workbook = plantilla.read("xl/workbook.xml").decode("utf-8")
+        id_relacion = None
+        for atributos in re.findall(r"<sheet\b([^>]*)/?>", workbook):
+            nombre = re.search(r'\bname="([^"]*)"', atributos)
+            if nombre and html.unescape(nombre.group(1)) == nombre_hoja:
+                id_relacion = re.search(r'\br:id="([^"]*)"', atributos).group(1)
+                break
+        if id_relacion is None:
+            raise KeyError(f"La hoja '{nombre_hoja}' no existe en la plantilla.")
+
+        relaciones = plantilla.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        for atributos in re.findall(r"<Relationship\b([^>]*)/?>", relaciones):
+            if re.search(rf'\bId="{re.escape(id_relacion)}"', atributos):
+                destino = html.unescape(re.search(r'\bTarget="([^"]*)"', atributos).group(1))
+                if destino.startswith("/"):
+                    return destino.lstrip("/")
+                return posixpath.normpath(posixpath.join("xl", destino))
+        raise KeyError(f"No se encontró la relación {id_relacion} de la hoja '{nombre_hoja}'.")
+
+    def _textos_compartidos(self):
+        if self._textos is None:
+            self._textos = [_texto_de_elemento(si) for si in
+                            re.findall(r"<si>(.*?)</si>", self._shared_strings_xml, re.S)]
+        return self._textos
+
+    def valor(self, referencia):
+        """
+        Retorna el valor de una celda de la hoja en la plantilla.
+
+        La primera consulta indexa todas las celdas con contenido de la hoja.
+
+        Args:
+            referencia (str): La celda (ej. 'I3').
+
+        Returns:
+            El valor (texto, número o booleano), o None si la celda está vacía o no existe.
+        """
+        if self._celdas is None:
+            self._celdas = {f"{c.group('columna')}{c.group('fila')}": (_atributos_celda(c), c.group("contenido"))
+                            for c in _PATRON_CELDA.finditer(self._xml_hoja) if c.group("contenido")}
+        if referencia not in self._celdas:
+            return None
+        atributos, contenido = self._celdas[referencia]
+        tipo = re.search(r'\bt="([^"]*)"', atributos)
+        tipo = tipo.group(1) if tipo else "n"
+        if tipo == "inlineStr":
+            return _texto_de_elemento(contenido)
+        valor = re.search(r"<v>(.*?)</v>", contenido, re.S)
+        if valor is None:
+            return None
+        valor = html.unescape(valor.group(1))
+        if tipo == "s":
+            return self._textos_compartidos()[int(valor)]
+        if tipo in ("str", "e"):
+            return valor
+        if tipo == "b":
+            return valor == "1"
+        numero = float(valor)
+        return int(numero) if numero.is_integer() and "." not in valor and "E" not in valor.upper() else numero
+
+    def hoja(self):
+        """
+        Retorna una copia editable de la hoja para generar un libro nuevo.
+
+        Returns:
+            HojaXml: La hoja, sin escrituras.
+        """
+        return HojaXml(self._xml_hoja, self.valor)
+
+    def generar(self, hoja):
+        """
+        Genera el .xlsx con la hoja modificada.
+
+        Args:
+            hoja (HojaXml): Hoja retornada por `hoja()` y ya llenada.
+
+        Returns:
+            bytes: El contenido del libro.
+        """
+        buffer = BytesIO(self._base)
+        buffer.seek(0, 2)
+        # En modo "a" zipfile conserva los miembros existentes sin tocarlos y reescribe el directorio central
+        with zipfile.ZipFile(buffer, "a") as libro:
+            libro.writestr(self.ruta_hoja, hoja.xml().encode("utf-8"), compress_type=self._compresion)
+        return buffer.getvalue()
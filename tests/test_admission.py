@@ -0,0 +1,122 @@
+"""
+Cola, rechazos y `Retry-After` del control de admisión de `/upload/` y `/jobs/`.
+"""
+
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.util.admission import ControlAdmision, FiltroSubidas, PeticionRechazada
+
+
+def _control(**limites):
+    valores = dict(max_extracciones=2, max_bytes=1000, max_archivos=5, max_bytes_peticion=2000,
+                   max_cola=1, espera_max=0.2, reintentar=7)
+    valores.update(limites)
+    return ControlAdmision(**valores)
+
+
+def test_admision_inmediata_y_liberacion():
+    """Con capacidad se admite de inmediato y al liberar los contadores vuelven a cero."""
+    async def escenario():
+        control = _control()
+        await control.reservar(2, 500)
+        assert (control.peticiones_en_curso, control.archivos_en_curso, control.bytes_en_curso) == (1, 2, 500)
+        control.liberar(2, 500)
+        return control
+
+    control = asyncio.run(escenario())
+    assert (control.peticiones_en_curso, control.archivos_en_curso, control.bytes_en_curso) == (0, 0, 0)
+    assert control.admitidas["inmediata"] == 1
+
+
+def test_espera_en_cola_hasta_que_se_libera():
+    """Sin capacidad, la petición espera en la cola y entra cuando otra libera la suya."""
+    async def escenario():
+        control = _control(espera_max=5)
+        await control.reservar(2, 100)
+        tiempos = {}
+        segunda = asyncio.create_task(control.reservar(1, 100, tiempos))
+        await asyncio.sleep(0.05)
+        assert control.estadisticas()["en_cola"] == 1
+        control.liberar(2, 100)
+        await segunda
+        return control, tiempos
+
+    control, tiempos = asyncio.run(escenario())
+    assert control.admitidas["tras_espera"] == 1
+    assert control.archivos_en_curso == 1
+    assert tiempos["espera_admision"] > 0
+
+
+def test_rechazos():
+    """Demasiados archivos o bytes dan 413; la cola llena, 429; la espera vencida, 503 con `Retry-After`."""
+    async def escenario():
+        control = _control()
+        with pytest.raises(PeticionRechazada) as archivos:
+            await control.reservar(6, 10)
+        with pytest.raises(PeticionRechazada) as tamano:
+            await control.reservar(1, 2001)
+        await control.reservar(2, 100)
+        en_espera = asyncio.create_task(control.reservar(1, 10))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PeticionRechazada) as cola_llena:
+            await control.reservar(1, 10)
+        with pytest.raises(PeticionRechazada) as espera:
+            await en_espera
+        return control, archivos.value, tamano.value, cola_llena.value, espera.value
+
+    control, archivos, tamano, cola_llena, espera = asyncio.run(escenario())
+    assert (archivos.codigo, archivos.motivo, archivos.reintentar) == (413, "archivos", None)
+    assert (tamano.codigo, tamano.motivo) == (413, "tamano")
+    assert (cola_llena.codigo, cola_llena.motivo, cola_llena.reintentar) == (429, "cola_llena", 7)
+    assert (espera.codigo, espera.motivo, espera.reintentar) == (503, "espera", 7)
+    assert control.estadisticas()["en_cola"] == 0
+    assert control.rechazadas == {"archivos": 1, "tamano": 1, "cola_llena": 1, "espera": 1}
+
+
+def test_lote_unico_se_admite_con_el_servidor_vacio():
+    """Un lote con más archivos que `max_extracciones` entra si no hay otra petición en curso."""
+    async def escenario():
+        control = _control()
+        await control.reservar(5, 100)
+        return control
+
+    assert asyncio.run(escenario()).archivos_en_curso == 5
+
+
+def _aplicacion(control, recibidas):
+    async def subir(request):
+        recibidas.append(len(await request.body()))
+        return JSONResponse({"ok": True})
+
+    app = Starlette(routes=[Route("/upload/", subir, methods=["POST"])])
+    return FiltroSubidas(app, rutas={"/upload/": "detail"}, control=control)
+
+
+def test_filtro_rechaza_antes_de_recibir_el_cuerpo():
+    """El middleware rechaza por `Content-Length` o con la cola llena sin llamar a la ruta."""
+    control = _control()
+    recibidas = []
+    cliente = TestClient(_aplicacion(control, recibidas))
+
+    respuesta = cliente.post("/upload/", content=b"x" * 2001)
+    assert respuesta.status_code == 413
+    assert "máximo" in respuesta.json()["detail"]
+    assert recibidas == []
+
+    assert cliente.post("/upload/", content=b"x" * 100).status_code == 200
+    assert recibidas == [100]
+
+    # Cola llena: una petición ocupa toda la capacidad y otra ya espera
+    control.peticiones_en_curso, control.archivos_en_curso = 1, 2
+    control._cola.append([1, 10, None])
+    respuesta = cliente.post("/upload/", content=b"x" * 10)
+    assert respuesta.status_code == 429
+    assert respuesta.headers["Retry-After"] == "7"
+    assert recibidas == [100]
+    assert control.rechazadas == {"tamano": 1, "cola_llena": 1}
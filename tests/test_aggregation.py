@@ -0,0 +1,102 @@
+"""
+Agregación de movimientos página por página con `AgregadorMovimientos`.
+
+El resultado debe ser el mismo que calcular las estadísticas sobre todas las
+páginas unidas en un solo DataFrame. Además, agregar un extracto por bloques y
+combinarlos debe dar lo mismo que agregarlo en serie: el modo por bloques de
+`procesar_pdf_en_pool` se apoya en esto.
+"""
+
+import random
+
+import pandas as pd
+
+from src.util.aggregation import AgregadorMovimientos
+from src.util.process_pdf import agregar_movimientos
+
+
+def _pagina(generador, filas):
+    """Tabla de movimientos con las columnas de camelot (texto, valores con separador de miles)."""
+    datos = []
+    for _ in range(filas):
+        valor = generador.choice([-1, 1]) * generador.choice([10.0, 250.5, 1000.0, generador.uniform(1, 90000)])
+        datos.append([f"{generador.randint(1, 28)}/01", f"MOVIMIENTO {generador.randint(1, 999)}",
+                      "", "", f"{valor:,.2f}", ""])
+    # Encabezado y una línea de descripción partida, que no tienen valor numérico
+    datos.insert(0, ["FECHA", "DESCRIPCIÓN", "SUCURSAL", "DCTO.", "VALOR", "SALDO"])
+    datos.insert(2, ["", "CONTINUACION DESCRIPCION", "", "", "", ""])
+    return pd.DataFrame(datos)
+
+
+def test_igual_a_unir_todas_las_paginas():
+    """Las estadísticas acumuladas coinciden con las de todas las páginas unidas con `pd.concat`."""
+    generador = random.Random(3)
+    pagina_1 = _pagina(generador, 8)
+    paginas = [_pagina(generador, 30) for _ in range(2, 12)]
+
+    resultado = agregar_movimientos(pagina_1, paginas).resultado()
+
+    todas = pd.concat([pagina_1, *paginas], ignore_index=True)
+    valores = pd.to_numeric(todas[4].str.replace(',', ''), errors='coerce').dropna()
+    assert resultado["Numero de movimientos"] == len(valores)
+    assert resultado["Suma de abonos de los movimientos"] == f"{valores[valores > 0].sum():,.2f}"
+    assert resultado["Suma de cargos de los movimientos"] == f"{-valores[valores < 0].sum():,.2f}"
+    assert resultado["Abono maximo en el mes en pesos"] == f"{valores.max():,.2f}"
+    assert resultado["Cargo maximo en el mes en pesos"] == f"{-valores.min():,.2f}"
+    assert [m["valor"] for m in resultado["Movimientos mas grandes"]] == [
+        f"{v:,.2f}" for v in valores[valores.abs().sort_values(ascending=False, kind="stable").index][:5]]
+
+
+def test_paginas_se_consumen_una_a_una():
+    """Las páginas pueden venir de un generador: no se necesita tenerlas todas en memoria."""
+    generador = random.Random(5)
+    entregadas = []
+
+    def paginas():
+        for numero in range(2, 6):
+            entregadas.append(numero)
+            yield _pagina(generador, 10)
+
+    agregador = agregar_movimientos(None, paginas())
+    assert entregadas == [2, 3, 4, 5]
+    assert agregador.paginas == 5
+    assert agregador.cantidad == 40
+
+
+def test_empates_favorecen_al_primero():
+    """Con valores iguales, el top conserva los movimientos que aparecieron primero."""
+    filas = [["1/01", f"MOVIMIENTO {i}", "", "", "100.00", ""] for i in range(4)]
+    agregador = AgregadorMovimientos(top_n=2)
+    agregador.agregar(pd.DataFrame(filas), pagina=2)
+    assert [m["descripcion"] for m in agregador.mayores()] == ["MOVIMIENTO 0", "MOVIMIENTO 1"]
+
+
+def test_extracto_sin_movimientos():
+    """Sin filas con valor, los máximos se reportan como 'nan' y las sumas en cero."""
+    resultado = agregar_movimientos(None, [None, _pagina(random.Random(1), 0)]).resultado()
+    assert resultado["Numero de movimientos"] == 0
+    assert resultado["Valor de movimiento maximo en el mes en pesos"] == "nan"
+    assert resultado["Suma de abonos de los movimientos"] == "0.00"
+    assert resultado["Movimientos mas grandes"] == []
+
+
+def test_combinar_bloques_igual_a_serie():
+    """Agregar por bloques de páginas y combinarlos en orden da lo mismo que agregar en serie."""
+    generador = random.Random(7)
+    pagina_1 = _pagina(generador, 8)
+    paginas = [_pagina(generador, 25) for _ in range(2, 24)]
+    # Una página sin tabla, como las que camelot no encuentra
+    paginas[5] = None
+
+    serie = agregar_movimientos(pagina_1, paginas)
+
+    por_bloques = agregar_movimientos(pagina_1, [])
+    for inicio in range(0, len(paginas), 5):
+        bloque = AgregadorMovimientos()
+        for numero, df_pagina in enumerate(paginas[inicio:inicio + 5], start=inicio + 2):
+            bloque.agregar(df_pagina, pagina=numero)
+        por_bloques.combinar(bloque)
+
+    assert por_bloques.resultado() == serie.resultado()
+    assert por_bloques.paginas == serie.paginas
+    assert por_bloques.cantidad == serie.cantidad
@@ -0,0 +1,66 @@
+"""
+Aciertos, fallos y expulsiones de `CacheExtracciones` en sus dos niveles.
+"""
+
+import os
+
+from src.util.cache import CacheExtracciones
+
+
+def test_fallo_y_acierto_en_memoria(tmp_path):
+    """Una llave nueva es un fallo; después de guardarla se encuentra en memoria."""
+    cache = CacheExtracciones(max_entradas_memoria=4, directorio=str(tmp_path))
+    clave = cache.clave(b"%PDF-1.4 extracto")
+    assert cache.obtener(clave) is None
+    cache.guardar(clave, {"SALDO ACTUAL": "$ 10.00"})
+    assert cache.obtener(clave) == {"SALDO ACTUAL": "$ 10.00"}
+    estadisticas = cache.estadisticas()
+    assert estadisticas["fallos"] == 1
+    assert estadisticas["aciertos_memoria"] == 1
+    assert estadisticas["tasa_aciertos"] == 0.5
+
+
+def test_acierto_en_disco(tmp_path):
+    """Una entrada escrita por otra instancia (otro proceso o un reinicio) se lee de disco."""
+    clave = CacheExtracciones.clave(b"%PDF-1.4 extracto")
+    CacheExtracciones(directorio=str(tmp_path)).guardar(clave, {"Numero de movimientos": 3})
+    cache = CacheExtracciones(directorio=str(tmp_path))
+    assert cache.obtener(clave) == {"Numero de movimientos": 3}
+    # La segunda consulta ya no va a disco
+    assert cache.obtener(clave) == {"Numero de movimientos": 3}
+    assert cache.estadisticas()["aciertos_disco"] == 1
+    assert cache.estadisticas()["aciertos_memoria"] == 1
+
+
+def test_llave_cambia_con_el_contenido():
+    """La llave depende de los bytes del PDF y coincide con la calculada desde su hash."""
+    assert CacheExtracciones.clave(b"a") != CacheExtracciones.clave(b"b")
+    assert CacheExtracciones.clave(b"a") == CacheExtracciones.clave_de_hash(
+        "ca978112ca1bbdcafac231b39a23dc4da786eff8147c4e72b9807785afee48bb")
+
+
+def test_expulsion_en_memoria_por_uso():
+    """El nivel de memoria expulsa la entrada menos usada, no la más antigua."""
+    cache = CacheExtracciones(max_entradas_memoria=2, directorio=None)
+    cache.guardar("a", {"v": 1})
+    cache.guardar("b", {"v": 2})
+    cache.obtener("a")
+    cache.guardar("c", {"v": 3})
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == {"v": 1}
+    assert cache.obtener("c") == {"v": 3}
+    assert cache.estadisticas()["entradas_memoria"] == 2
+
+
+def test_expulsion_en_disco_por_tamano(tmp_path):
+    """El nivel de disco borra las entradas menos usadas al superar el tamaño máximo."""
+    cache = CacheExtracciones(max_entradas_memoria=1, directorio=str(tmp_path), max_bytes_disco=250)
+    datos = {"relleno": "x" * 100}
+    cache.guardar("a", datos)
+    cache.guardar("b", datos)
+    # "a" se usa después de "b": la siguiente expulsión debe llevarse a "b"
+    os.utime(tmp_path / "a.json", (1e9, 2e9))
+    os.utime(tmp_path / "b.json", (1e9, 1e9))
+    cache.guardar("c", datos)
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.estadisticas()["expulsiones_disco"] == 1
@@ -0,0 +1,51 @@
+"""
+Reanudación del procesamiento por lotes con el manifiesto de `src.cli`.
+"""
+
+import json
+
+from src import cli
+
+DATOS = {"SALDO ANTERIOR": "$ 100.00", "TOTAL ABONOS": "$ 50.00", "TOTAL CARGOS": "$ 20.00",
+         "SALDO ACTUAL": "$ 130.00", "Numero de movimientos": 2}
+
+
+def _anotar(manifiesto, archivo, huella, resultado):
+    manifiesto.write(json.dumps({"archivo": archivo, "sha256": huella, "resultado": resultado}) + "\n")
+
+
+def test_cargar_manifiesto(tmp_path):
+    """Solo se reanudan los archivos exitosos; una última línea cortada se ignora."""
+    ruta = tmp_path / "lote.manifiesto.jsonl"
+    with open(ruta, "w", encoding="utf-8") as manifiesto:
+        _anotar(manifiesto, "a.pdf", "h1", {"filename": "a.pdf", "data": DATOS})
+        _anotar(manifiesto, "b.pdf", "h2", {"filename": "b.pdf", "data": {"error": "formato"}})
+        _anotar(manifiesto, "c.pdf", "h3", {"filename": "c.pdf", "error": "timeout"})
+        manifiesto.write('{"archivo": "d.pdf", "sha2')
+    assert cli.cargar_manifiesto(str(ruta)) == {("a.pdf", "h1"): {"filename": "a.pdf", "data": DATOS}}
+    assert cli.cargar_manifiesto(str(tmp_path / "no-existe.jsonl")) == {}
+
+
+def test_reanudar_lote(tmp_path, monkeypatch):
+    """Un archivo sin cambios se toma del manifiesto; uno que cambió o falló se procesa de nuevo."""
+    monkeypatch.setattr(cli.almacen_extractos, "ruta", None)
+    entrada = tmp_path / "extractos"
+    (entrada / "enero").mkdir(parents=True)
+    (entrada / "enero" / "a.pdf").write_bytes(b"%PDF a")
+    (entrada / "b.pdf").write_bytes(b"no es un pdf")
+    salida = tmp_path / "sivicof.xlsx"
+    ruta_manifiesto = f"{salida}.manifiesto.jsonl"
+    with open(ruta_manifiesto, "w", encoding="utf-8") as manifiesto:
+        _anotar(manifiesto, "enero/a.pdf", cli.sha256_archivo(entrada / "enero" / "a.pdf"),
+                {"filename": "enero/a.pdf", "data": DATOS})
+        # Mismo nombre pero otro contenido: se debe volver a procesar
+        _anotar(manifiesto, "b.pdf", "otro-hash", {"filename": "b.pdf", "data": DATOS})
+
+    resumen = cli.procesar_lote(str(entrada), str(salida), workers=1)
+
+    assert (resumen["archivos"], resumen["reanudados"], resumen["procesados"], resumen["fallidos"]) == (2, 1, 1, 1)
+    assert salida.exists()
+    with open(ruta_manifiesto, encoding="utf-8") as manifiesto:
+        ultima = json.loads(manifiesto.readlines()[-1])
+    assert ultima["archivo"] == "b.pdf"
+    assert not ultima["resultado"].get("data")
@@ -0,0 +1,51 @@
+"""
+`MotorExtraccion` debe extraer lo mismo que `camelot.read_pdf` abriendo el PDF una sola vez.
+
+Se usa un extracto sintético de `benchmarks.synthetic_statements`.
+"""
+
+import pytest
+
+from benchmarks.synthetic_statements import generar_extracto
+from src.util.extraction_engine import MotorExtraccion, importar_camelot
+from src.util.layouts import layout_por_defecto
+
+
+@pytest.fixture(scope="module")
+def extracto(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp("extractos") / "extracto.pdf"
+    ruta.write_bytes(generar_extracto(paginas=3, semilla=2))
+    return str(ruta)
+
+
+def _regiones():
+    """Regiones (página, configuración) que extrae `process_pdf` de un extracto de 3 páginas."""
+    layout = layout_por_defecto()
+    return [(1, layout.config("resumen", 1, "")), (1, layout.config("movimientos_pagina_1", 1, "")),
+            (2, layout.config("movimientos_paginas", 2, "")), (3, layout.config("movimientos_paginas", 3, ""))]
+
+
+def test_motor_igual_a_read_pdf(extracto):
+    """Cada región da la misma tabla que `camelot.read_pdf` con flavor 'stream'."""
+    camelot = importar_camelot()
+    with MotorExtraccion(extracto) as motor:
+        assert motor.numero_de_paginas == 3
+        for pagina, config in _regiones():
+            obtenidas = motor.extraer(pagina, config["area"], config["columns"])
+            esperadas = camelot.read_pdf(extracto, flavor="stream", pages=str(pagina),
+                                         table_areas=config["area"], columns=config["columns"])
+            assert len(obtenidas) == len(esperadas) == 1
+            assert obtenidas[0].df.equals(esperadas[0].df), f"página {pagina}"
+
+
+def test_una_apertura_y_un_layout_por_pagina(extracto):
+    """El PDF se abre una vez y el layout de cada página se analiza una sola vez."""
+    with MotorExtraccion(extracto) as motor:
+        for pagina, config in _regiones():
+            motor.extraer(pagina, config["area"], config["columns"])
+        assert motor.aperturas == 1
+        assert motor.layouts_generados == 3
+        # Una página liberada se vuelve a analizar si se pide de nuevo
+        motor.liberar_pagina(1)
+        motor.extraer(1, *(_regiones()[0][1][llave] for llave in ("area", "columns")))
+        assert motor.layouts_generados == 4
@@ -0,0 +1,106 @@
+"""
+Ciclo de vida de los trabajos de `GestorTrabajos`.
+
+Se usan funciones falsas para procesar los archivos y generar el Excel: aquí
+interesa la cola, los estados, los eventos y la liberación del cupo.
+"""
+
+import asyncio
+
+import pytest
+
+from src.util.jobs import GestorTrabajos, ColaLlena, EN_COLA, COMPLETADO, FALLIDO
+
+
+async def _procesar(filename, contenido):
+    await asyncio.sleep(0)
+    return {"filename": filename, "data": {"bytes": len(contenido)}}
+
+
+async def _generar_excel(resultados, excel_id, ttl=None):
+    return excel_id
+
+
+async def _esperar(trabajo):
+    return [evento async for evento in trabajo.escuchar()]
+
+
+def test_trabajo_completo():
+    """Un trabajo pasa de en cola a completado, publica sus eventos y libera el cupo una vez."""
+    async def escenario():
+        gestor = GestorTrabajos(_procesar, _generar_excel, max_cola=2, workers=1)
+        await gestor.iniciar()
+        liberaciones = []
+        trabajo = gestor.enviar([("a.pdf", b"12"), ("b.pdf", b"345")], al_terminar=lambda: liberaciones.append(1))
+        assert trabajo.estado == EN_COLA
+        eventos = await _esperar(trabajo)
+        await gestor.detener()
+        return gestor, trabajo, eventos, liberaciones
+
+    gestor, trabajo, eventos, liberaciones = asyncio.run(escenario())
+    assert trabajo.estado == COMPLETADO
+    assert trabajo.excel == trabajo.id
+    assert trabajo.archivos == []
+    assert liberaciones == [1]
+    assert [e["evento"] for e in eventos] == ["inicio", "archivo", "archivo", "fin"]
+    assert eventos[-1]["procesados"] == 2
+    resumen = trabajo.resumen()
+    assert resumen["excel_disponible"]
+    assert [r["filename"] for r in resumen["resultados"]] == ["a.pdf", "b.pdf"]
+    assert gestor.obtener(trabajo.id) is trabajo
+
+
+def test_trabajo_fallido():
+    """Si generar el Excel falla, el trabajo queda fallido con el error y el cupo se libera igual."""
+    async def fallar(resultados, excel_id, ttl=None):
+        raise ValueError("sin espacio")
+
+    async def escenario():
+        gestor = GestorTrabajos(_procesar, fallar, workers=1)
+        await gestor.iniciar()
+        liberaciones = []
+        trabajo = gestor.enviar([("a.pdf", b"1")], al_terminar=lambda: liberaciones.append(1))
+        eventos = await _esperar(trabajo)
+        await gestor.detener()
+        return trabajo, eventos, liberaciones
+
+    trabajo, eventos, liberaciones = asyncio.run(escenario())
+    assert trabajo.estado == FALLIDO
+    assert trabajo.error == "sin espacio"
+    assert eventos[-1]["evento"] == "fin"
+    assert eventos[-1]["error"] == "sin espacio"
+    assert liberaciones == [1]
+    assert not trabajo.resumen()["excel_disponible"]
+
+
+def test_cola_llena():
+    """Con la cola llena, `enviar` rechaza el trabajo sin registrarlo."""
+    async def escenario():
+        # Sin workers nadie saca trabajos de la cola
+        gestor = GestorTrabajos(_procesar, _generar_excel, max_cola=1, workers=0)
+        await gestor.iniciar()
+        gestor.enviar([("a.pdf", b"1")])
+        with pytest.raises(ColaLlena):
+            gestor.enviar([("b.pdf", b"2")])
+        assert gestor.en_cola() == 1
+        assert len(gestor.trabajos) == 1
+        await gestor.detener()
+
+    asyncio.run(escenario())
+
+
+def test_purgar_trabajos_expirados():
+    """Los trabajos terminados hace más de `ttl` segundos se eliminan al enviar uno nuevo."""
+    async def escenario():
+        gestor = GestorTrabajos(_procesar, _generar_excel, workers=1, ttl=0)
+        await gestor.iniciar()
+        viejo = gestor.enviar([("a.pdf", b"1")])
+        await _esperar(viejo)
+        nuevo = gestor.enviar([("b.pdf", b"2")])
+        await _esperar(nuevo)
+        await gestor.detener()
+        return gestor, viejo, nuevo
+
+    gestor, viejo, nuevo = asyncio.run(escenario())
+    assert gestor.obtener(viejo.id) is None
+    assert gestor.obtener(nuevo.id) is nuevo
@@ -0,0 +1,65 @@
+"""
+Validación de los formatos de extracto y detección del formato por el texto de la página 1.
+"""
+
+import copy
+import json
+import os
+
+import pytest
+
+from src.util import layouts
+from src.util.layouts import Layout, LayoutNoReconocido, detectar_layout
+
+with open(os.path.join(layouts.LAYOUTS_DIRECTORIO, "bancolombia.json"), encoding="utf-8") as _archivo:
+    BANCOLOMBIA = json.load(_archivo)
+
+TEXTO_BANCOLOMBIA = ("ESTADO DE CUENTA  NUMERO 123-456789-01  DESDE: 2024/01/01 HASTA: 2024/01/31\n"
+                     "SALDO ANTERIOR  TOTAL ABONOS  TOTAL CARGOS  SALDO ACTUAL")
+
+
+def _formato(nombre, huella):
+    datos = copy.deepcopy(BANCOLOMBIA)
+    datos["nombre"] = nombre
+    datos["huella"] = huella
+    return Layout(datos)
+
+
+def test_formato_invalido():
+    """Un área sin 4 coordenadas o una región faltante se reportan con el nombre del archivo."""
+    datos = copy.deepcopy(BANCOLOMBIA)
+    datos["resumen"]["area"] = "0,500,600"
+    with pytest.raises(ValueError, match="otro.json"):
+        Layout(datos, origen="otro.json")
+    datos = copy.deepcopy(BANCOLOMBIA)
+    del datos["movimientos_paginas"]
+    with pytest.raises(ValueError, match="no es válido"):
+        Layout(datos)
+
+
+def test_identificar_cuenta_y_periodo():
+    """La cuenta y las fechas del periodo se toman de la página 1, con las fechas en AAAA-MM-DD."""
+    assert Layout(BANCOLOMBIA).identificar(TEXTO_BANCOLOMBIA) == {
+        "cuenta": "123-456789-01", "desde": "2024-01-01", "hasta": "2024-01-31"}
+    assert Layout(BANCOLOMBIA).identificar("sin datos") == {"cuenta": None, "desde": None, "hasta": None}
+
+
+def test_detectar_huella_mas_especifica(monkeypatch):
+    """Si coinciden varias huellas gana la de más textos, sin importar espacios ni mayúsculas."""
+    general = _formato("general", ["SALDO ANTERIOR"])
+    especifico = _formato("especifico", ["saldo anterior", "TOTALABONOS"])
+    monkeypatch.setattr(layouts, "_layouts", {"general": general, "especifico": especifico})
+    assert detectar_layout(TEXTO_BANCOLOMBIA) is especifico
+    assert detectar_layout("SALDO  ANTERIOR") is general
+
+
+def test_sin_coincidencia(monkeypatch):
+    """Sin coincidencias se usa el formato por defecto; si no hay, el PDF se rechaza."""
+    otro = _formato("otro", ["EXTRACTO DE OTRO BANCO"])
+    por_defecto = _formato("bancolombia", ["NO APARECE"])
+    monkeypatch.setattr(layouts, "_layouts", {"otro": otro, "bancolombia": por_defecto})
+    monkeypatch.setattr(layouts, "LAYOUT_POR_DEFECTO", "bancolombia")
+    assert detectar_layout(TEXTO_BANCOLOMBIA) is por_defecto
+    monkeypatch.setattr(layouts, "LAYOUT_POR_DEFECTO", "")
+    with pytest.raises(LayoutNoReconocido):
+        detectar_layout(TEXTO_BANCOLOMBIA)
@@ -0,0 +1,103 @@
+"""
+Guardado y consulta de extractos y movimientos en `AlmacenExtractos`.
+"""
+
+from src.util.statement_store import AlmacenExtractos, fecha_completa, valor_numerico
+
+
+def _extracto(cuenta, desde, hasta, saldo_actual, movimientos):
+    datos = {"SALDO ANTERIOR": "$ 1,000.00", "TOTAL ABONOS": "$ 500.50", "TOTAL CARGOS": "$ 200.25",
+             "SALDO ACTUAL": saldo_actual, "Numero de movimientos": len(movimientos)}
+    info = {"layout": "bancolombia", "identificacion": {"cuenta": cuenta, "desde": desde, "hasta": hasta},
+            "movimientos": movimientos}
+    return datos, info
+
+
+ENERO = _extracto("123-1", "2024-01-01", "2024-01-31", "$ 1,300.25", [
+    (1, "2/01", "CONSIGNACION", 500.5),
+    (2, "15/01", "PAGO NOMINA", -200.25),
+    (2, "31/12", "AJUSTE AÑO ANTERIOR", 0.5),
+])
+FEBRERO = _extracto("123-1", "2024-02-01", "2024-02-29", "$ 900.00", [(1, "10/02", "RETIRO CAJERO", -400.25)])
+OTRA_CUENTA = _extracto("999-9", "2024-01-01", "2024-01-31", "$ 10.00", [(1, "5/01", "CONSIGNACION", 10.0)])
+
+
+def _almacen(tmp_path):
+    almacen = AlmacenExtractos(str(tmp_path / "extractos.sqlite3"))
+    ids = {nombre: almacen.guardar(f"hash-{nombre}", f"{nombre}.pdf", *extracto)
+           for nombre, extracto in (("enero", ENERO), ("febrero", FEBRERO), ("otra", OTRA_CUENTA))}
+    return almacen, ids
+
+
+def test_guardar_y_obtener(tmp_path):
+    """Un extracto guardado se recupera con sus saldos como números y el resultado completo."""
+    almacen, ids = _almacen(tmp_path)
+    extracto = almacen.obtener(ids["enero"])
+    assert extracto["cuenta"] == "123-1"
+    assert (extracto["periodo_desde"], extracto["periodo_hasta"]) == ("2024-01-01", "2024-01-31")
+    assert (extracto["saldo_anterior"], extracto["saldo_actual"]) == (1000.0, 1300.25)
+    assert extracto["numero_movimientos"] == 3
+    assert extracto["resumen"] == ENERO[0]
+    assert almacen.existe("hash-enero")
+    assert not almacen.existe("hash-marzo")
+    assert almacen.obtener(12345) is None
+    assert almacen.estadisticas()["extractos"] == 3
+    assert almacen.estadisticas()["movimientos"] == 5
+
+
+def test_mismo_pdf_reemplaza_sus_filas(tmp_path):
+    """Guardar otra vez el mismo PDF reemplaza el extracto y sus movimientos."""
+    almacen, _ = _almacen(tmp_path)
+    nuevo_id = almacen.guardar("hash-enero", "enero-bis.pdf", *ENERO)
+    assert almacen.estadisticas() == {"ruta": almacen.ruta, "extractos": 3, "movimientos": 5}
+    assert [m["archivo"] for m in almacen.buscar_movimientos(extracto_id=nuevo_id)] == ["enero-bis.pdf"] * 3
+
+
+def test_buscar_extractos_por_cuenta_y_periodo(tmp_path):
+    """Un extracto coincide si su periodo se cruza con el rango pedido."""
+    almacen, ids = _almacen(tmp_path)
+    assert [e["id"] for e in almacen.buscar_extractos(cuenta="123-1")] == [ids["enero"], ids["febrero"]]
+    assert [e["id"] for e in almacen.buscar_extractos(desde="2024-02-15")] == [ids["febrero"]]
+    assert [e["id"] for e in almacen.buscar_extractos(hasta="2024-01-15")] == [ids["enero"], ids["otra"]]
+    assert len(almacen.buscar_extractos(limite=1)) == 1
+
+
+def test_buscar_movimientos(tmp_path):
+    """Los movimientos se filtran por fecha completa, valor, descripción y cuenta."""
+    almacen, ids = _almacen(tmp_path)
+    enero = almacen.buscar_movimientos(cuenta="123-1", desde="2024-01-01", hasta="2024-01-31")
+    assert [(m["fecha"], m["descripcion"]) for m in enero] == [("2024-01-02", "CONSIGNACION"),
+                                                              ("2024-01-15", "PAGO NOMINA")]
+    # Diciembre en un extracto de enero es del año anterior
+    assert almacen.buscar_movimientos(hasta="2023-12-31")[0]["descripcion"] == "AJUSTE AÑO ANTERIOR"
+    cargos = almacen.buscar_movimientos(valor_max=0)
+    assert [m["valor"] for m in cargos] == [-200.25, -400.25]
+    consignaciones = almacen.buscar_movimientos(descripcion="consignacion")
+    assert {m["extracto_id"] for m in consignaciones} == {ids["enero"], ids["otra"]}
+
+
+def test_resultados_para_el_excel(tmp_path):
+    """Los resultados tienen la forma que recibe el llenado del Excel, en orden de cuenta y periodo."""
+    almacen, ids = _almacen(tmp_path)
+    assert almacen.resultados(cuenta="123-1") == [{"filename": "enero.pdf", "data": ENERO[0]},
+                                                  {"filename": "febrero.pdf", "data": FEBRERO[0]}]
+    assert almacen.resultados(ids=[ids["otra"]]) == [{"filename": "otra.pdf", "data": OTRA_CUENTA[0]}]
+
+
+def test_almacen_deshabilitado():
+    """Sin ruta no se guarda ni se consulta nada."""
+    almacen = AlmacenExtractos(None)
+    assert almacen.guardar("hash", "a.pdf", *ENERO) is None
+    assert not almacen.existe("hash")
+    assert almacen.buscar_movimientos() == []
+
+
+def test_conversiones():
+    """Los valores del resumen y las fechas de los movimientos se normalizan."""
+    assert valor_numerico("$ 1,234.50") == 1234.5
+    assert valor_numerico("-20.00") == -20.0
+    assert valor_numerico("") is None
+    assert fecha_completa("5/01", "2024-01-31") == "2024-01-05"
+    assert fecha_completa("05/12/23", None) == "2023-12-05"
+    assert fecha_completa("32/01", "2024-01-31") is None
+    assert fecha_completa("5/01", None) is None
@@ -0,0 +1,48 @@
+"""
+La tabla de resumen leída de la capa de texto debe ser la misma que extrae camelot.
+
+Se usa un extracto sintético de `benchmarks.synthetic_statements`.
+"""
+
+import pytest
+
+from benchmarks.synthetic_statements import generar_extracto
+from src.util import process_pdf
+from src.util.extraction_engine import importar_camelot
+from src.util.layouts import layout_por_defecto
+from src.util.text_layer import extraer_tabla_texto
+
+
+@pytest.fixture(scope="module")
+def extracto(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp("extractos") / "extracto.pdf"
+    ruta.write_bytes(generar_extracto(paginas=1, semilla=1))
+    return str(ruta)
+
+
+@pytest.fixture(scope="module")
+def config_resumen():
+    return layout_por_defecto().config("resumen", 1, "Tabla de Resumen")
+
+
+def test_capa_de_texto_igual_a_camelot(extracto, config_resumen):
+    """Con las mismas área y columnas, ambas rutas dan el mismo DataFrame."""
+    texto = extraer_tabla_texto(extracto, "1", config_resumen["area"], config_resumen["columns"])
+    camelot = importar_camelot().read_pdf(extracto, flavor="stream", pages="1",
+                                          table_areas=config_resumen["area"], columns=config_resumen["columns"])
+    assert texto.equals(camelot[0].df)
+
+
+def test_resumen_por_capa_de_texto(extracto, config_resumen):
+    """Un resumen válido en la capa de texto no necesita camelot."""
+    df_resumen, ruta = process_pdf.extraer_resumen(extracto, config_resumen)
+    assert ruta == process_pdf.RUTA_TEXTO
+    assert process_pdf.resumen_valido(df_resumen)
+
+
+def test_respaldo_con_camelot(extracto, config_resumen, monkeypatch):
+    """Si la capa de texto no da un resumen válido, se extrae con camelot."""
+    monkeypatch.setattr(process_pdf, "extraer_tabla_texto", lambda *args, **kwargs: None)
+    df_resumen, ruta = process_pdf.extraer_resumen(extracto, config_resumen)
+    assert ruta == process_pdf.RUTA_CAMELOT
+    assert process_pdf.resumen_valido(df_resumen)
@@ -0,0 +1,99 @@
+"""
+El motor "xml" de `fill_excel_en_memoria` debe producir el mismo libro que openpyxl.
+
+Se llena la plantilla SIVICOF real con los dos motores y se comparan, celda por
+celda y en todas las hojas, los valores y los estilos que ve Excel.
+"""
+
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from src.util.fill_excel import HOJA_SIVICOF, PLANTILLA_EXCEL, _hoja_sivicof, escribir_resultados
+from src.util.xlsx_patch import HojaXml, PlantillaXlsx
+
+
+def _resultado(indice):
+    return {
+        "filename": f"extracto_{indice}.pdf",
+        "data": {
+            "SALDO ANTERIOR": f"$ {10000 + indice:,.2f}",
+            "TOTAL ABONOS": f"$ {5000.5 * indice:,.2f}",
+            "TOTAL CARGOS": f"$ {3000.25 + indice:,.2f}",
+            "SALDO ACTUAL": f"$ {12000 - indice:,.2f}",
+            "Valor de movimiento maximo en el mes en pesos": f"{1234.5 * indice:,.2f}",
+        },
+    }
+
+
+RESULTADOS = [_resultado(i) for i in range(1, 8)] + [
+    {"filename": "con_error.pdf", "data": {"error": "No se pudo extraer"}},
+    {"filename": "caracteres.pdf", "data": dict(_resultado(9)["data"], **{"SALDO ANTERIOR": "<A & B> \"ñ\""})},
+]
+
+
+def _con_openpyxl():
+    libro = load_workbook(PLANTILLA_EXCEL)
+    escribir_resultados(_hoja_sivicof(libro), RESULTADOS)
+    buffer = BytesIO()
+    libro.save(buffer)
+    return buffer.getvalue()
+
+
+def _con_xml():
+    with open(PLANTILLA_EXCEL, "rb") as archivo:
+        plantilla = PlantillaXlsx(archivo.read(), HOJA_SIVICOF)
+    hoja = plantilla.hoja()
+    escribir_resultados(hoja, RESULTADOS)
+    return plantilla.generar(hoja)
+
+
+def _valor(celda):
+    # Al guardar, openpyxl convierte las cadenas vacías de la plantilla en celdas sin valor;
+    # el motor "xml" deja intactas las hojas que no escribe
+    return None if celda.value == "" else celda.value
+
+
+def _estilo(celda):
+    return (celda.number_format, repr(celda.font), repr(celda.fill), repr(celda.border),
+            repr(celda.alignment), repr(celda.protection))
+
+
+def test_motor_xml_igual_a_openpyxl():
+    esperado = load_workbook(BytesIO(_con_openpyxl()))
+    obtenido = load_workbook(BytesIO(_con_xml()))
+
+    assert obtenido.sheetnames == esperado.sheetnames
+    for nombre in esperado.sheetnames:
+        hoja_esperada, hoja_obtenida = esperado[nombre], obtenido[nombre]
+        filas = max(hoja_esperada.max_row, hoja_obtenida.max_row)
+        columnas = max(hoja_esperada.max_column, hoja_obtenida.max_column)
+        for fila in range(1, filas + 1):
+            for columna in range(1, columnas + 1):
+                celda_esperada = hoja_esperada.cell(fila, columna)
+                celda_obtenida = hoja_obtenida.cell(fila, columna)
+                referencia = f"'{nombre}'!{celda_esperada.coordinate}"
+                assert _valor(celda_obtenida) == _valor(celda_esperada), referencia
+                assert _estilo(celda_obtenida) == _estilo(celda_esperada), referencia
+
+
+def test_conserva_atributos_y_amplia_dimension():
+    """Los atributos antes o después de `r` se conservan, y `<dimension>` y `spans` cubren lo escrito."""
+    xml = ('<worksheet><dimension ref="B2:C3"/><sheetData>'
+           '<row spans="2:3" r="2" ht="20" customHeight="1"><c s="4" r="B2" t="s"><v>0</v></c>'
+           '<c r="C2" s="5"/></row>'
+           '</sheetData></worksheet>')
+    hoja = HojaXml(xml, lambda referencia: None)
+    hoja["B2"] = "texto"
+    hoja["C2"] = 7
+    hoja["E2"] = 1.5
+    hoja["A5"] = "nueva"
+
+    resultado = hoja.xml()
+
+    assert '<dimension ref="A2:E5"/>' in resultado
+    assert '<row spans="2:5" r="2" ht="20" customHeight="1">' in resultado
+    assert '<c r="B2" s="4" t="inlineStr"><is><t xml:space="preserve">texto</t></is></c>' in resultado
+    assert '<c r="C2" s="5"><v>7</v></c>' in resultado
+    assert resultado.index('r="C2"') < resultado.index('r="E2"') < resultado.index('<row r="5">')
+    assert '<row r="5"><c r="A5" t="inlineStr">' in resultado